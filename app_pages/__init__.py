@@ -0,0 +1,20 @@
+import importlib
+
+# Page title -> module in this package. A page module, and the libraries it uses, is only imported
+# the first time that page is shown, so the markdown pages never pay for pandas or the plotting stack.
+PAGES = {
+    "Project Introduction": "introduction",
+    "View Tables": "view_tables",
+    "CRUD Operations": "crud_operations",
+    "SQL Queries": "predefined_queries",
+    "New Query": "new_query",
+    "Food Matching": "food_matching",
+    "Visualization": "visualization",
+    "User Introduction": "user_introduction",
+    "Statistics Dashboard": "statistics",
+    "Admin": "admin",
+}
+
+
+def load_page(title):
+    return importlib.import_module(f"{__name__}.{PAGES[title]}")
@@ -0,0 +1,73 @@
+import sqlite3
+
+import streamlit as st
+
+from archive import CLAIM_RETENTION_DAYS, archive_cold_rows, archive_status, describe_space
+from connection_pool import get_pool
+from instrumentation import (CALL_KINDS, METRICS_FILE, METRICS_INTERVAL, RING_SIZE, explain_plan, page_latency, prometheus_text,
+                             query_latency, reset, section, section_latency, slow_queries, write_metrics)
+
+
+def render():
+    st.title("Admin")
+    st.caption(f"Timings of the last {RING_SIZE} database calls, page runs and page sections in this app process. "
+               f"Prometheus metrics are written to `{METRICS_FILE}` at most every {METRICS_INTERVAL}s.")
+    col1, col2, col3 = st.columns(3)
+    if col1.button("Write metrics file now"):
+        try:
+            write_metrics()
+            st.success(f"Metrics written to {METRICS_FILE}")
+        except OSError as e:
+            st.error(f"Error writing metrics: {e}")
+    col2.download_button("Download metrics", prometheus_text(), file_name="metrics.prom", mime="text/plain")
+    if col3.button("Clear timings"):
+        reset()
+    section("Query Latency")
+    st.subheader("Query Latency")
+    kinds = st.multiselect("Kinds", CALL_KINDS, default=list(CALL_KINDS))
+    st.dataframe(query_latency(kinds), hide_index=True, use_container_width=True)
+    section("Slowest Queries")
+    st.subheader("Slowest Queries")
+    slow_limit = st.number_input("Show", min_value=1, max_value=50, value=10)
+    slow = slow_queries(int(slow_limit))
+    if slow.empty:
+        st.info("No queries recorded yet.")
+    for query in slow.itertuples():
+        with st.expander(f"{query.ms:.1f} ms · {query.kind} · {query.page} · {query.name[:100]}"):
+            st.code(query.name, language="sql")
+            st.caption(f"Rows: {query.rows} · Params: {query.params} · Error: {query.error or 'none'}")
+            try:
+                with get_pool().reader() as conn:
+                    plan = explain_plan(conn, query.name, query.params)
+                st.code("\n".join(plan) or "(no plan)")
+            except sqlite3.Error as e:
+                st.caption(f"No query plan: {e}")
+    section("Page Render Time")
+    st.subheader("Page Render Time")
+    st.dataframe(page_latency(), hide_index=True, use_container_width=True)
+    st.dataframe(section_latency(), hide_index=True, use_container_width=True)
+    section("Archive")
+    st.subheader("Archive")
+    st.caption(f"Completed and Cancelled claims older than {CLAIM_RETENTION_DAYS} days, and expired listings with no "
+               "remaining claims, are moved to the archive database. Query `all_food_listings` / `all_claims` "
+               "on the New Query page for hot and archived rows together.")
+    if st.button("Archive cold rows now"):
+        with st.spinner("Archiving..."):
+            run = archive_cold_rows()
+        if run["Error"] and not run["Skipped_Keys"]:
+            st.error(f"Archival stopped: {run['Error']}")
+        else:
+            st.success(f"Archived {run['Claims_Archived']} claims and {run['Listings_Archived']} listings; "
+                       f"{describe_space(run)}")
+            if run["Skipped_Keys"]:
+                st.warning(f"Skipped {run['Skipped_Keys']} row(s): {run['Error']}")
+    try:
+        counts, sizes, runs = archive_status()
+    except sqlite3.Error as e:
+        st.error(f"Error reading the archive: {e}")
+        return
+    st.dataframe([dict(Table=table, Hot_Rows=hot, Archived_Rows=archived) for table, (hot, archived) in counts.items()],
+                 hide_index=True)
+    st.caption(" · ".join(f"{name}: {total / 1024:.0f} KiB ({free / 1024:.0f} KiB free)" for name, (total, free) in sizes.items()))
+    if runs:
+        st.dataframe(runs, hide_index=True, use_container_width=True)
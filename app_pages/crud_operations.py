@@ -0,0 +1,146 @@
+import sqlite3
+
+import pandas as pd
+import streamlit as st
+
+from crud import create_record, update_record, delete_record, create_records, update_records, delete_records, recent_batches, undo_batch
+from database import PRIMARY_KEYS
+from instrumentation import section
+from pagination import show_table_page
+from query_builder import Eq
+
+
+def render():
+    st.title("CRUD Operations")
+    tables = ["providers", "receivers", "food_listings", "claims"]
+    for table in tables:
+        section(table.capitalize())
+        st.subheader(table.capitalize())
+        if table == "providers":
+            with st.form(f"{table}_create"):
+                data = {
+                    "Provider_ID": st.number_input("Provider ID", min_value=1),
+                    "Name": st.text_input("Name"),
+                    "Type": st.text_input("Type"),
+                    "Address": st.text_input("Address"),
+                    "City": st.text_input("City"),
+                    "Contact": st.text_input("Contact")
+                }
+                if st.form_submit_button("Create"):
+                    create_record(table, data)
+            with st.form(f"{table}_update"):
+                update_id = st.number_input("Provider ID to Update", min_value=1)
+                new_city = st.text_input("New City")
+                new_contact = st.text_input("New Contact")
+                if st.form_submit_button("Update"):
+                    update_record(table, {"City": new_city, "Contact": new_contact}, [Eq("Provider_ID", update_id)])
+            with st.form(f"{table}_delete"):
+                delete_id = st.number_input("Provider ID to Delete", min_value=1)
+                if st.form_submit_button("Delete"):
+                    delete_record(table, [Eq("Provider_ID", delete_id)])
+            show_table_page(table, f"crud_{table}", columns=["Provider_ID", "Name", "Type", "City", "Contact"])
+        elif table == "receivers":
+            with st.form(f"{table}_create"):
+                data = {
+                    "Receiver_ID": st.number_input("Receiver ID", min_value=1),
+                    "Name": st.text_input("Name"),
+                    "Type": st.text_input("Type"),
+                    "City": st.text_input("City"),
+                    "Contact": st.text_input("Contact")
+                }
+                if st.form_submit_button("Create"):
+                    create_record(table, data)
+            with st.form(f"{table}_update"):
+                update_id = st.number_input("Receiver ID to Update", min_value=1)
+                new_city = st.text_input("New City")
+                if st.form_submit_button("Update City"):
+                    update_record(table, {"City": new_city}, [Eq("Receiver_ID", update_id)])
+            with st.form(f"{table}_delete"):
+                delete_id = st.number_input("Receiver ID to Delete", min_value=1)
+                if st.form_submit_button("Delete"):
+                    delete_record(table, [Eq("Receiver_ID", delete_id)])
+            show_table_page(table, f"crud_{table}")
+        elif table == "food_listings":
+            with st.form(f"{table}_create"):
+                data = {
+                    "Food_ID": st.number_input("Food ID", min_value=1),
+                    "Food_Name": st.text_input("Food Name"),
+                    "Quantity": st.number_input("Quantity", min_value=0),
+                    "Expiry_Date": st.text_input("Expiry Date (YYYY-MM-DD)"),
+                    "Provider_ID": st.number_input("Provider ID", min_value=1),
+                    "Provider_Type": st.text_input("Provider Type"),
+                    "Location": st.text_input("Location"),
+                    "Food_Type": st.text_input("Food Type"),
+                    "Meal_Type": st.text_input("Meal Type")
+                }
+                if st.form_submit_button("Create"):
+                    create_record(table, data)
+            with st.form(f"{table}_update"):
+                update_id = st.number_input("Food ID to Update", min_value=1)
+                new_quantity = st.number_input("New Quantity", min_value=0)
+                if st.form_submit_button("Update Quantity"):
+                    update_record(table, {"Quantity": new_quantity}, [Eq("Food_ID", update_id)])
+            with st.form(f"{table}_delete"):
+                delete_id = st.number_input("Food ID to Delete", min_value=1)
+                if st.form_submit_button("Delete"):
+                    delete_record(table, [Eq("Food_ID", delete_id)])
+            show_table_page(table, f"crud_{table}")
+        elif table == "claims":
+            with st.form(f"{table}_create"):
+                data = {
+                    "Claim_ID": st.number_input("Claim ID", min_value=1),
+                    "Food_ID": st.number_input("Food ID", min_value=1),
+                    "Receiver_ID": st.number_input("Receiver ID", min_value=1),
+                    "Status": st.text_input("Status"),
+                    "Timestamp": st.text_input("Timestamp (YYYY-MM-DD HH:MM:SS)")
+                }
+                if st.form_submit_button("Create"):
+                    create_record(table, data)
+            with st.form(f"{table}_update"):
+                update_id = st.number_input("Claim ID to Update", min_value=1)
+                new_status = st.text_input("New Status")
+                if st.form_submit_button("Update Status"):
+                    update_record(table, {"Status": new_status}, [Eq("Claim_ID", update_id)])
+            with st.form(f"{table}_delete"):
+                delete_id = st.number_input("Claim ID to Delete", min_value=1)
+                if st.form_submit_button("Delete"):
+                    delete_record(table, [Eq("Claim_ID", delete_id)])
+            show_table_page(table, f"crud_{table}")
+        # Batch edits from a CSV file: one transaction, journaled for undo
+        with st.expander(f"Batch edit {table} from CSV"):
+            batch_action = st.radio("Action", ["Insert", "Update", "Delete"], horizontal=True, key=f"{table}_batch_action",
+                                    help=f"Update needs {PRIMARY_KEYS[table]} plus the columns to change; Delete only reads {PRIMARY_KEYS[table]}")
+            batch_file = st.file_uploader("CSV file", type="csv", key=f"{table}_batch_file")
+            if batch_file is not None:
+                batch_df = pd.read_csv(batch_file)
+                st.caption(f"{len(batch_df)} row(s), columns: {', '.join(batch_df.columns)}")
+                st.dataframe(batch_df.head(), hide_index=True, use_container_width=True)
+                if st.button(f"{batch_action} {len(batch_df)} row(s)", key=f"{table}_batch_apply"):
+                    batch_rows = batch_df.astype(object).where(batch_df.notna(), None).to_dict("records")
+                    try:
+                        if batch_action == "Insert":
+                            batch_id, written = create_records(table, batch_rows)
+                        elif batch_action == "Update":
+                            batch_id, written = update_records(table, batch_rows)
+                        else:
+                            batch_id, written = delete_records(table, [row.get(PRIMARY_KEYS[table]) for row in batch_rows])
+                        st.success(f"Batch {batch_id}: {len(written)} row(s) written to {table}.")
+                    except (sqlite3.Error, ValueError) as e:
+                        st.error(f"Batch not applied, nothing was changed: {e}")
+
+    section("Batch History")
+    st.subheader("Batch History")
+    batches = recent_batches()
+    if batches.empty:
+        st.info("No batch edits yet.")
+    else:
+        st.dataframe(batches, hide_index=True, use_container_width=True)
+        open_batches = batches[batches["Undone_At"].isna()]["Batch_ID"].tolist()
+        if open_batches:
+            col1, col2 = st.columns([3, 1])
+            undo_id = col1.selectbox("Batch to undo", open_batches)
+            if col2.button("Undo batch"):
+                try:
+                    st.success(f"Batch {undo_id} undone: {undo_batch(undo_id)} row(s) restored.")
+                except (sqlite3.Error, ValueError) as e:
+                    st.error(f"Error undoing batch {undo_id}: {e}")
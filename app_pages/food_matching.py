@@ -0,0 +1,83 @@
+import sqlite3
+from datetime import date
+
+import pandas as pd
+import streamlit as st
+
+from geo import DEFAULT_RADIUS_KM, ensure_coordinates, providers_near_receiver, receivers_near_listing, timed
+from instrumentation import section
+from matching import get_engine, timed_suggest, create_claims
+from pagination import PAGE_SIZE
+
+
+def render():
+    st.title("Food Matching")
+    engine = get_engine()
+    # Open (unclaimed or only-cancelled) listings that have not expired, soonest expiry first
+    today = date.today().isoformat()
+    col1, col2, col3 = st.columns(3)
+    match_city = col1.text_input("City")
+    match_food_type = col2.selectbox("Food Type", ["All"] + sorted({key[1] for key in engine.queues}))
+    match_meal_type = col3.selectbox("Meal Type", ["All"] + sorted({key[2] for key in engine.queues}))
+    open_listings = engine.expiring(
+        city=match_city or None,
+        food_type=None if match_food_type == "All" else match_food_type,
+        meal_type=None if match_meal_type == "All" else match_meal_type,
+        on_or_after=today,
+        limit=PAGE_SIZE)
+    section("Expiring Soonest")
+    st.subheader("Expiring Soonest")
+    if not open_listings:
+        st.info("No open listings match.")
+    else:
+        st.dataframe(pd.DataFrame(open_listings), hide_index=True, use_container_width=True)
+        food_id = st.selectbox("Suggest receivers for Food ID", [listing["Food_ID"] for listing in open_listings])
+        suggestions, elapsed_ms = timed_suggest(food_id)
+        if suggestions:
+            st.dataframe(pd.DataFrame(suggestions), hide_index=True, use_container_width=True)
+        else:
+            st.info("No receivers in this listing's city.")
+        st.caption(f"Ranked in {elapsed_ms:.3f} ms")
+
+    # Batch mode: assign every open listing expiring on one day
+    section("Assign a Day's Listings")
+    st.subheader("Assign a Day's Listings")
+    first_open = engine.expiring(on_or_after=today, limit=1)
+    with st.form("assign_day_form"):
+        col1, col2 = st.columns(2)
+        assign_day = col1.text_input("Expiry Date (YYYY-MM-DD)", first_open[0]["Expiry_Date"] if first_open else "")
+        per_receiver = col2.number_input("Listings per receiver", min_value=1, value=1)
+        commit_plan = st.checkbox("Create Pending claims for the plan")
+        planned = st.form_submit_button("Assign")
+    if planned and assign_day < today:
+        st.warning(f"Listings expiring {assign_day} have expired and are not assigned.")
+    elif planned:
+        assignments, total = engine.assign_day(assign_day, int(per_receiver))
+        st.caption(f"{len(assignments)} of {total} open listing(s) expiring {assign_day} assigned")
+        if assignments:
+            st.dataframe(pd.DataFrame(assignments), hide_index=True, use_container_width=True)
+            if commit_plan:
+                try:
+                    st.success(f"{create_claims(assignments)} claim(s) created.")
+                except sqlite3.Error as e:
+                    st.error(f"Error creating claims: {e}")
+
+    # Distance search over the city R*Tree (see geo.py)
+    section("Nearby")
+    st.subheader("Nearby")
+    ensure_coordinates()
+    col1, col2, col3 = st.columns(3)
+    nearby_of = col1.radio("Find", ["Receivers near a listing", "Providers near a receiver"])
+    nearby_id = col2.number_input("Food ID" if nearby_of.startswith("Receivers") else "Receiver ID", min_value=1)
+    radius_km = col3.number_input("Within (km)", min_value=1, max_value=5000, value=DEFAULT_RADIUS_KM)
+    try:
+        function = receivers_near_listing if nearby_of.startswith("Receivers") else providers_near_receiver
+        nearby, elapsed_ms = timed(function, int(nearby_id), radius_km)
+    except ValueError as e:
+        st.warning(str(e))
+    else:
+        if nearby.empty:
+            st.info(f"Nothing within {radius_km} km.")
+        else:
+            st.dataframe(nearby, hide_index=True, use_container_width=True)
+        st.caption(f"{len(nearby)} found in {elapsed_ms:.1f} ms")
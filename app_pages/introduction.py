@@ -0,0 +1,29 @@
+import streamlit as st
+
+
+def render():
+    st.title("Project Introduction")
+    st.markdown("""
+        ### Food Wastage Management System
+        The Food Wastage Management System is a comprehensive web-based application designed to address the critical issue of food wastage. Built using Streamlit and powered by a SQLite database, this app aims to minimize food waste, promote sustainability, and ensure efficient distribution of surplus food.
+
+        #### **Objectives**
+        - **Reduce Food Waste**: Enable providers to list surplus food and receivers to claim it before it expires.
+        - **Enhance Efficiency**: Streamline the process of food donation and claiming with real-time data management.
+        - **Promote Transparency**: Provide detailed insights and visualizations to track food movement and wastage patterns.
+        - **Support Decision Making**: Offer statistical dashboards and custom query tools for stakeholders to analyze data.
+
+        #### **Key Features**
+        - **CRUD Operations**: Create, read, update, and delete records for providers, receivers, food listings, and claims.
+        - **Data Visualization**: Interactive charts to visualize provider distribution, claim statuses, and food quantities.
+        - **SQL Queries**: Predefined and custom SQL queries with auto-generated visualizations.
+        - **Statistics Dashboard**: Real-time insights into record counts and recent activities.
+
+        #### **Database Structure**
+        The system uses a SQLite database named `food_wastage_system (1).db` with the following tables:
+        - **providers**: Stores details like Provider_ID, Name, Type, Address, City, and Contact.
+        - **receivers**: Contains Receiver_ID, Name, Type, City, and Contact.
+        - **food_listings**: Tracks Food_ID, Food_Name, Quantity, Expiry_Date, Provider_ID, and other attributes.
+        - **claims**: Manages Claim_ID, Food_ID, Receiver_ID, Status, and Timestamp.
+
+    """)
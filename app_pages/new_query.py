@@ -0,0 +1,46 @@
+import sqlite3
+
+import streamlit as st
+
+from export import download_buttons
+from sandbox import DEFAULT_TIMEOUT, DEFAULT_ROW_CAP, MAX_ROW_CAP, explain, run_with_cancel
+
+
+def render():
+    st.title("New Query")
+    # Custom queries run sandboxed: own read-only connection, wall-clock timeout, row cap, cancel button
+    with st.form("new_query_form"):
+        custom_query = st.text_area("Enter New Custom Query", "SELECT * FROM providers")
+        col1, col2 = st.columns(2)
+        timeout = col1.number_input("Timeout (seconds)", min_value=1.0, max_value=300.0, value=DEFAULT_TIMEOUT)
+        row_cap = col2.number_input("Row cap", min_value=1, max_value=MAX_ROW_CAP, value=DEFAULT_ROW_CAP)
+        allow_scans = st.checkbox("Run even if the plan shows full table scans")
+        submitted = st.form_submit_button("Execute")
+    if submitted:
+        try:
+            plan, scan_warnings = explain(custom_query)
+        except sqlite3.Error as e:
+            st.error(f"Error executing query: {e}")
+        else:
+            with st.expander("Query plan", expanded=bool(scan_warnings)):
+                st.code("\n".join(plan) or "(no plan)")
+            for warning in scan_warnings:
+                st.warning(warning)
+            if scan_warnings and not allow_scans:
+                st.info("Not run: the plan scans a large table. Tick the box above to run it anyway.")
+            else:
+                guarded = run_with_cancel(custom_query, timeout, int(row_cap))
+                if guarded.timed_out:
+                    st.error(f"Query stopped after the {timeout:.0f}s timeout.")
+                elif guarded.error is not None:
+                    st.error(f"Error executing query: {guarded.error}")
+                else:
+                    df = guarded.result
+                    st.write("Query Result:", df)
+                    st.caption(f"{len(df)} rows in {guarded.elapsed:.2f}s")
+                    if guarded.truncated:
+                        st.warning(f"Result truncated to the first {int(row_cap)} rows.")
+                    if df.empty:
+                        st.warning("No data returned from query.")
+                    # The download streams the whole result, not just the capped rows shown above
+                    download_buttons(custom_query, "query_result", timeout=timeout, key="custom")
@@ -0,0 +1,36 @@
+import sqlite3
+
+import streamlit as st
+
+from columnar import ensure_snapshot, describe_snapshot
+from export import download_buttons
+from materialized import MODES, MATERIALIZED, SHARDED, SNAPSHOT, named_query_sql, run_named_query, has_materialized, ensure_fresh, describe_staleness
+from queries import PREDEFINED_QUERIES
+from sharding import describe_shards
+
+
+def render():
+    st.title("SQL Queries")
+    with st.form("sql_query_form"):
+        selected_query = st.selectbox("Select a Predefined Query", list(PREDEFINED_QUERIES.keys()))
+        mode = st.radio("Mode", MODES, horizontal=True, help="Materialized queries read pre-aggregated summary tables; Live recomputes from the base tables; Columnar snapshot answers from a periodic memory-mapped export; Sharded fans out over the per-region shards")
+        if st.form_submit_button("Execute"):
+            try:
+                if mode == MATERIALIZED and has_materialized(selected_query):
+                    st.caption(describe_staleness(ensure_fresh()))
+                elif mode == MATERIALIZED:
+                    st.caption("This query has no materialized form; running it live.")
+                elif mode == SNAPSHOT:
+                    st.caption(describe_snapshot(ensure_snapshot()))
+                elif mode == SHARDED:
+                    st.caption(describe_shards())
+                df = run_named_query(selected_query, mode)
+                st.write("Query Result:", df)
+                if df.empty:
+                    st.warning("No data returned from query.")
+            except sqlite3.Error as e:
+                st.error(f"Error executing query: {e}")
+    # Full result, streamed from the database when a button is clicked (download buttons cannot sit in a form);
+    # exports read the single-file database, so there are none for the shards
+    if mode != SHARDED:
+        download_buttons(named_query_sql(selected_query, mode), selected_query, key="predefined")
@@ -0,0 +1,106 @@
+from functools import partial
+
+import pandas as pd
+import streamlit as st
+
+from change_notifications import current_version, get_notifier, refresh_every
+from claim_events import trend_table
+from connection_pool import get_pool
+from crud import run_query
+from dashboard import summary_metrics, claims_by_status, expiring_listings, refresh_recent_claims
+from instrumentation import section
+from parallel_queries import get_parallel_queries
+from queries import RECENT_CLAIMS_QUERY
+from query_cache import get_cache
+
+
+def show_insights(metrics, expiring):
+    tables = ["providers", "receivers", "food_listings", "claims"]
+    for table in tables:
+        st.write(f"Total {table.capitalize()}: {metrics.get(f'{table}_rows', 0)}")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Quantity Listed", metrics.get("quantity_listed", 0))
+    col2.metric("Quantity Claimed (Completed)", metrics.get("quantity_claimed", 0))
+    col3.metric("Listings Expiring in 24h", int(expiring["Listing_Count"][0]), f"{int(expiring['Total_Quantity'][0])} units", delta_color="off")
+
+
+def show_todays_claims(todays_claims):
+    if todays_claims.empty:
+        st.info("No claims recorded today.")
+    else:
+        st.write(todays_claims)
+
+
+def show_trend(claim_trend):
+    if claim_trend.empty:
+        st.info("No claim events recorded yet.")
+    else:
+        st.line_chart(claim_trend)
+
+
+@st.fragment(run_every=refresh_every())
+def show_recent_claims():
+    # Re-run on its own every few seconds; reads only the claims changed since it last drew
+    state = st.session_state["recent_claims"]
+    state["version"], state["rows"] = refresh_recent_claims(state["rows"], state["version"])
+    st.write(state["rows"])
+
+
+def render():
+    st.title("Statistics Dashboard")
+    # Lay out the sections first; their reads are independent, so they run in parallel and each
+    # section fills in as soon as its data arrives
+    slots = {}
+    st.subheader("Quick Insights")
+    # Server-side aggregates from the trigger-maintained summary tables; no table is loaded into pandas
+    slots["insights"] = st.empty()
+    st.subheader("Today's Claims by Status")
+    slots["todays_claims"] = st.empty()
+    st.subheader("Claim Trend")
+    # Status transitions per bucket, read from the event-log rollups rather than the claims table
+    granularity = st.radio("Granularity", ["day", "hour"], horizontal=True, format_func=str.capitalize)
+    slots["trend"] = st.empty()
+    st.subheader("Recent Claims")
+    slots["recent_claims"] = st.empty()
+    claims_version = current_version("claims")
+    tasks = {
+        "metrics": summary_metrics,
+        "expiring": partial(expiring_listings, hours=24),
+        "todays_claims": claims_by_status,
+        "trend": partial(trend_table, granularity),
+        "recent_claims": partial(run_query, RECENT_CLAIMS_QUERY),
+    }
+    renderers = {"todays_claims": show_todays_claims, "trend": show_trend}
+    section("Parallel Reads")
+    results = {}
+    for name, result, error in get_parallel_queries().run(tasks):
+        slot = slots.get(name, slots["insights"])
+        if error is not None:
+            slot.error(f"Error loading {name.replace('_', ' ')}: {error}")
+            continue
+        results[name] = result
+        if name == "recent_claims":
+            st.session_state["recent_claims"] = {"version": claims_version, "rows": result}
+            with slot.container():
+                show_recent_claims()
+        elif name in renderers:
+            with slot.container():
+                renderers[name](result)
+        elif "metrics" in results and "expiring" in results:
+            with slot.container():
+                show_insights(results["metrics"], results["expiring"])
+    section("Connection Pool")
+    st.subheader("Connection Pool")
+    st.write(pd.DataFrame([get_pool().metrics()]).T.rename(columns={0: "Value"}))
+    section("Query Cache")
+    st.subheader("Query Cache")
+    cache_stats = get_cache().stats()
+    table_versions = cache_stats.pop("table_versions")
+    st.write(pd.DataFrame([cache_stats]).T.rename(columns={0: "Value"}))
+    st.write(pd.DataFrame([table_versions], index=["Version"]))
+    section("Change Notifications")
+    st.subheader("Change Notifications")
+    # Table versions from the change counters (migration 8), as last published to the pages
+    change_rows, change_stats = get_notifier().status()
+    st.write(pd.DataFrame(change_rows))
+    st.caption(" · ".join(f"{name.replace('_', ' ')}: {value}" for name, value in change_stats.items()))
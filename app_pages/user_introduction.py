@@ -0,0 +1,34 @@
+import streamlit as st
+
+
+def render():
+    st.title("User Introduction")
+    st.markdown("""
+        ### How to Use This App: A Step-by-Step Guide
+
+        Welcome to the Food Wastage Management System! This app is designed to be user-friendly for both providers and receivers. Below is a detailed guide to help you navigate and utilize all features effectively:
+
+        #### **Getting Started**
+        - **Navigation**: Use the sidebar on the left to switch between sections like "Project Introduction," "View Tables," "CRUD Operations," etc.
+
+        #### **Key Sections and Usage**
+        1. **Project Introduction**
+           - Explore the purpose, objectives, and database structure of the app to understand its mission.
+        2. **View Tables**
+           - View all records in the `providers`, `receivers`, `food_listings`, and `claims` tables.
+           - No action is required; simply browse the data displayed.
+        3. **CRUD Operations**
+           - **Create**: Fill out the form for the respective table and click "Create" to add a new record.
+           - **Update**: Enter the ID of the record to update, input the new value, and click "Update City" or similar.
+           - **Delete**: Input the ID of the record to delete and click "Delete" to remove it.
+           - Tip: Ensure unique IDs and valid foreign keys.
+        4. **SQL Queries**
+           - Select a predefined query from the dropdown and click "Execute" to see results and an auto-generated visualization.
+        5. **New Query**
+           - Write a custom SQL query in the text area  and click "Execute" to view results with visualization.
+        6. **Visualization**
+           - View pre-built charts to analyze data trends.
+        7. **Statistics Dashboard**
+           - Check total records per table and the latest 5 claims for quick insights.
+
+    """)
@@ -0,0 +1,45 @@
+import streamlit as st
+
+from crud import run_query
+from instrumentation import section
+from pagination import show_table_page
+from query_builder import Eq, FullText, applicable
+from search import search, fts_query
+
+
+def render():
+    st.title("View All Tables")
+    tables = ["providers", "receivers", "food_listings", "claims"]
+    # Unified full-text search (FTS5, ranked, prefix matching)
+    search_text = st.text_input("Search providers, receivers and food listings", placeholder="e.g. bread new jes")
+    if search_text:
+        results = search(search_text)
+        if results is None or results.empty:
+            st.info("No matches.")
+        else:
+            st.dataframe(results.drop(columns=["Rank"]), hide_index=True, use_container_width=True)
+    # Filters
+    filter_city = st.sidebar.text_input("Filter by City")
+    filter_provider = st.sidebar.text_input("Filter by Provider Name")
+    filter_food_type = st.sidebar.selectbox("Filter by Food Type", ["All"] + list(run_query("SELECT DISTINCT Food_Type FROM food_listings")["Food_Type"].dropna()))
+    filter_meal_type = st.sidebar.selectbox("Filter by Meal Type", ["All"] + list(run_query("SELECT DISTINCT Meal_Type FROM food_listings")["Meal_Type"].dropna()))
+    # Bound-parameter predicates; each table only gets the ones for columns it actually has
+    predicates = []
+    if filter_city:
+        predicates += [Eq("City", filter_city), Eq("Location", filter_city)]
+    if filter_provider and fts_query(filter_provider):
+        # Matches providers by name through the FTS index; also narrows food_listings by Provider_ID
+        predicates.append(FullText("Provider_ID", "providers_fts", fts_query(filter_provider, ["Name"])))
+    if filter_food_type != "All":
+        predicates.append(Eq("Food_Type", filter_food_type))
+    if filter_meal_type != "All":
+        predicates.append(Eq("Meal_Type", filter_meal_type))
+
+    for table in tables:
+        section(table.capitalize())
+        st.subheader(table.capitalize())
+        table_predicates = applicable(table, predicates) if table in ["providers", "food_listings"] else []
+        if table == "providers":
+            show_table_page(table, f"view_{table}", columns=["Provider_ID", "Name", "Type", "City", "Contact"], predicates=table_predicates)
+        else:
+            show_table_page(table, f"view_{table}", predicates=table_predicates)
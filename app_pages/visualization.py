@@ -0,0 +1,82 @@
+from functools import partial
+
+import streamlit as st
+
+from change_notifications import refresh_every
+from charts import CHARTS, get_chart_cache
+from columnar import ensure_snapshot, describe_snapshot
+from geo import DEFAULT_CELL_DEGREES, MAP_LAYERS, ensure_coordinates, map_points
+from instrumentation import section
+from materialized import MODES, MATERIALIZED, SHARDED, SNAPSHOT, ensure_fresh, describe_staleness, run_named_query
+from parallel_queries import get_parallel_queries
+from sharding import describe_shards
+
+
+@st.fragment(run_every=refresh_every())
+def show_chart(chart_name, chart_mode):
+    # Re-runs on its own every few seconds. Images are cached per version of the tables the chart
+    # reads, so only a chart whose tables changed queries and draws again.
+    chart_cache = get_chart_cache()
+    image = chart_cache.cached(chart_name, chart_mode)
+    if image is None:
+        try:
+            if chart_mode == MATERIALIZED:
+                ensure_fresh()
+            image = chart_cache.image(chart_name, chart_mode)
+        except Exception as e:
+            st.error(f"Error loading {chart_name}: {e}")
+            return
+    st.image(image)
+
+
+def render():
+    st.title("Data Visualization")
+    chart_mode = st.sidebar.radio("Chart data", MODES)
+    if chart_mode == MATERIALIZED:
+        st.caption(describe_staleness(ensure_fresh()))
+    elif chart_mode == SNAPSHOT:
+        st.caption(describe_snapshot(ensure_snapshot()))
+    elif chart_mode == SHARDED:
+        st.caption(describe_shards())
+    lazy_charts = st.sidebar.checkbox("Render charts on demand", value=False)
+    chart_cache = get_chart_cache()
+    section("Charts")
+    slots, keys, queued = {}, {}, {}
+    for chart_name in CHARTS:
+        st.subheader(chart_name)
+        image = chart_cache.cached(chart_name, chart_mode)
+        wanted = image is None and (not lazy_charts or st.toggle("Render chart", key=f"render_{chart_name}"))
+        slots[chart_name] = st.empty()
+        if image is not None:
+            with slots[chart_name].container():
+                show_chart(chart_name, chart_mode)
+        elif wanted:
+            slots[chart_name].caption("Loading…")
+            keys[chart_name] = chart_cache.key(chart_name, chart_mode)
+            queued[chart_name] = partial(run_named_query, chart_name, chart_mode)
+        else:
+            slots[chart_name].caption("Not rendered yet.")
+    # Uncached charts: their queries run in parallel and each chart is drawn as soon as its data arrives
+    for chart_name, df, error in get_parallel_queries().run(queued):
+        if error is not None:
+            slots[chart_name].error(f"Error loading {chart_name}: {error}")
+        else:
+            chart_cache.image(chart_name, chart_mode, df, keys[chart_name])
+            with slots[chart_name].container():
+                show_chart(chart_name, chart_mode)
+    chart_stats = chart_cache.stats()
+    st.caption(f"Chart cache: {chart_stats['hits']} hits · {chart_stats['renders']} renders · {chart_stats['entries']} cached")
+
+    # Map: rows are grouped into grid cells in SQL, so one point per cell is sent to the browser
+    section("Map")
+    st.subheader("Map")
+    ensure_coordinates()
+    col1, col2 = st.columns(2)
+    map_layer = col1.selectbox("Show", list(MAP_LAYERS))
+    cell_degrees = col2.select_slider("Grid cell (degrees)", [0.25, 0.5, 1.0, 2.0, 5.0], value=DEFAULT_CELL_DEGREES)
+    points = map_points(map_layer, cell_degrees)
+    if points.empty:
+        st.info("No coordinates loaded; run `python geo.py load`.")
+    else:
+        st.map(points, latitude="Latitude", longitude="Longitude", size="Size")
+        st.caption(f"{len(points)} cells · {int(points['Cities'].sum())} cities · total {points['Value'].sum():,.0f}")
@@ -0,0 +1,343 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.request import pathname2url
+
+from database import ARCHIVE_PATH, DB_PATH, PRIMARY_KEYS
+from migrations import apply_migrations
+from query_cache import register_derived_table
+
+# Expiry-driven archival: cold rows are moved, in batches, from the hot tables into a separate
+# archive database. The app's queries read only the hot tables; the all_* views (created on every
+# pooled read connection) add the archived rows back for historical analytics.
+CLAIM_RETENTION_DAYS = 30      # closed claims stay hot this long after their Timestamp
+LISTING_GRACE_DAYS = 0         # expired listings without hot claims stay hot this long past Expiry_Date
+BATCH_SIZE = 500               # rows moved per transaction
+BUSY_TIMEOUT = 5               # seconds
+ARCHIVE_EVERY_HOURS = os.environ.get("FOOD_WASTAGE_ARCHIVE_EVERY")  # run in the app on this schedule when set
+CLOSED_STATUSES = ("Completed", "Cancelled")
+
+# Archived copies of the hot tables, with the time each row was moved
+ARCHIVED_COLUMNS = {
+    "claims": ["Claim_ID", "Food_ID", "Receiver_ID", "Status", "Timestamp"],
+    "food_listings": ["Food_ID", "Food_Name", "Quantity", "Expiry_Date", "Provider_ID", "Provider_Type", "Location",
+                      "Food_Type", "Meal_Type"],
+}
+ARCHIVE_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS archived_claims (
+        Claim_ID INTEGER PRIMARY KEY,
+        Food_ID INTEGER,
+        Receiver_ID INTEGER,
+        Status TEXT,
+        Timestamp TEXT,
+        Archived_At TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_archived_claims_food ON archived_claims (Food_ID)",
+    "CREATE INDEX IF NOT EXISTS idx_archived_claims_timestamp ON archived_claims (Timestamp)",
+    """CREATE TABLE IF NOT EXISTS archived_food_listings (
+        Food_ID INTEGER PRIMARY KEY,
+        Food_Name TEXT,
+        Quantity INTEGER,
+        Expiry_Date TEXT,
+        Provider_ID INTEGER,
+        Provider_Type TEXT,
+        Location TEXT,
+        Food_Type TEXT,
+        Meal_Type TEXT,
+        Archived_At TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_archived_food_listings_expiry ON archived_food_listings (Expiry_Date)",
+    """CREATE TABLE IF NOT EXISTS archive_runs (
+        Run_ID INTEGER PRIMARY KEY,
+        Started_At TEXT NOT NULL,
+        Seconds REAL,
+        Claims_Archived INTEGER NOT NULL DEFAULT 0,
+        Listings_Archived INTEGER NOT NULL DEFAULT 0,
+        Batches INTEGER NOT NULL DEFAULT 0,
+        Db_Bytes_Before INTEGER,
+        Db_Bytes_After INTEGER,
+        Free_Bytes_Before INTEGER,
+        Free_Bytes_After INTEGER,
+        Error TEXT,
+        Skipped_Keys INTEGER NOT NULL DEFAULT 0
+    )""",
+]
+
+# Cold rows after a given key, oldest key first. A listing is cold once it has expired and none of its
+# claims are still hot, so every hot claim keeps its listing (Location, Meal_Type) in the hot tables.
+COLD_ROWS = {
+    "claims": f"""SELECT Claim_ID FROM live.claims
+        WHERE Status IN ({', '.join(f"'{status}'" for status in CLOSED_STATUSES)}) AND Timestamp < ? AND Claim_ID > ?
+        ORDER BY Claim_ID LIMIT ?""",
+    "food_listings": """SELECT f.Food_ID FROM live.food_listings f
+        WHERE f.Expiry_Date < ? AND f.Food_ID > ? AND NOT EXISTS (SELECT 1 FROM live.claims c WHERE c.Food_ID = f.Food_ID)
+        ORDER BY f.Food_ID LIMIT ?""",
+}
+
+# Archived keys stay taken: the live database lists them (migration 10, whose triggers refuse to insert
+# them again) and keeps the highest one per table (migration 9) for crud.assign_keys
+RECORD_ARCHIVED_KEY = "INSERT OR IGNORE INTO live.archived_keys (Table_Name, Row_Key) VALUES (?, ?)"
+RAISE_KEY_FLOOR = """INSERT INTO live.key_floors (Table_Name, Max_Key) VALUES (?, ?)
+    ON CONFLICT (Table_Name) DO UPDATE SET Max_Key = MAX(Max_Key, excluded.Max_Key)"""
+
+for _table in ARCHIVED_COLUMNS:
+    register_derived_table(f"archived_{_table}", [_table])
+    register_derived_table(f"all_{_table}", [_table])
+
+
+def history_views(schema="archive"):
+    # Hot and archived rows together; Archived_At is NULL for hot rows. TEMP, because a view in the
+    # main database cannot refer to an attached one.
+    return [
+        f"""CREATE TEMP VIEW IF NOT EXISTS all_{table} AS
+            SELECT {', '.join(columns)}, NULL AS Archived_At FROM main.{table}
+            UNION ALL
+            SELECT {', '.join(columns)}, Archived_At FROM {schema}.archived_{table}"""
+        for table, columns in ARCHIVED_COLUMNS.items()
+    ]
+
+
+def ensure_archive(archive_path=ARCHIVE_PATH):
+    conn = sqlite3.connect(archive_path, timeout=BUSY_TIMEOUT)
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")
+        for statement in ARCHIVE_SCHEMA:
+            conn.execute(statement)
+        if "Skipped_Keys" not in [row[1] for row in conn.execute("PRAGMA table_info(archive_runs)")]:
+            conn.execute("ALTER TABLE archive_runs ADD COLUMN Skipped_Keys INTEGER NOT NULL DEFAULT 0")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def attach_archive(conn, archive_path=ARCHIVE_PATH):
+    # For read-only connections opened with uri=True: attach the archive and add the all_* views
+    if not os.path.exists(archive_path):
+        return False
+    conn.execute("ATTACH DATABASE ? AS archive", (f"file:{pathname2url(os.path.abspath(archive_path))}?mode=ro",))
+    for statement in history_views():
+        conn.execute(statement)
+    return True
+
+
+def open_archive(db_path=DB_PATH, archive_path=ARCHIVE_PATH):
+    # The archive is the main database of this connection and the live one is attached, so when a
+    # batch commits the archive's copy is committed before the live rows are deleted: a crash in
+    # between leaves the batch in both, never in neither. The next run finds those rows already
+    # archived, identical, and only deletes them from the hot table (see _move_batch).
+    ensure_archive(archive_path)
+    conn = sqlite3.connect(archive_path, timeout=BUSY_TIMEOUT, isolation_level=None)
+    conn.execute("ATTACH DATABASE ? AS live", (db_path,))
+    return conn
+
+
+def space(conn, schema="live"):
+    page_size, page_count, free = (conn.execute(f"PRAGMA {schema}.{name}").fetchone()[0]
+                                   for name in ("page_size", "page_count", "freelist_count"))
+    return page_count * page_size, free * page_size
+
+
+def _move_batch(conn, table, cutoff, batch_size, archived_at, after=0):
+    # One transaction: copy the batch of cold rows after key `after` to the archive, delete them from
+    # the hot table (the hot table's triggers update the summaries, FTS index and change logs).
+    # Returns (deleted rows, keys skipped, last key looked at, or None when there are no more).
+    # A row already in the archive is skipped when the archived copy differs from it: archived
+    # history is never overwritten, and the hot row stays for someone to look at.
+    pk = PRIMARY_KEYS[table]
+    columns = ARCHIVED_COLUMNS[table]
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        keys = [row[0] for row in conn.execute(COLD_ROWS[table], (cutoff, after, batch_size))]
+        if not keys:
+            conn.rollback()
+            return [], [], None
+        marks = ", ".join("?" * len(keys))
+        archived = {row[0] for row in conn.execute(f"SELECT {pk} FROM archived_{table} WHERE {pk} IN ({marks})", keys)}
+        if archived:
+            # Identical copies were left by a run interrupted between the two commits
+            same = " AND ".join(f"a.{column} IS h.{column}" for column in columns)
+            copied = {row[0] for row in conn.execute(
+                f"SELECT h.{pk} FROM live.{table} h JOIN archived_{table} a ON a.{pk} = h.{pk} WHERE h.{pk} IN ({marks}) AND {same}",
+                keys)}
+            skipped = sorted(archived - copied)
+        else:
+            skipped = []
+        moving = [key for key in keys if key not in skipped]
+        rows = []
+        if moving:
+            marks = ", ".join("?" * len(moving))
+            conn.execute(f"""INSERT INTO archived_{table} ({", ".join(columns)}, Archived_At)
+                SELECT {", ".join(columns)}, ? FROM live.{table} WHERE {pk} IN ({marks}) AND {pk} NOT IN (SELECT {pk} FROM archived_{table})""",
+                         (archived_at, *moving))
+            conn.executemany(RECORD_ARCHIVED_KEY, [(table, key) for key in moving])
+            conn.execute(RAISE_KEY_FLOOR, (table, max(moving)))
+            cursor = conn.execute(f"DELETE FROM live.{table} WHERE {pk} IN ({marks}) RETURNING *", moving)
+            names = [d[0] for d in cursor.description]
+            rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return rows, skipped, keys[-1]
+
+
+def record_archived_keys(conn):
+    # For rows archived before migrations 9 and 10 kept track of their keys
+    for table, pk in PRIMARY_KEYS.items():
+        if table not in ARCHIVED_COLUMNS:
+            continue
+        recorded = conn.execute("SELECT COUNT(*) FROM live.archived_keys WHERE Table_Name = ?", (table,)).fetchone()[0]
+        if recorded < conn.execute(f"SELECT COUNT(*) FROM archived_{table}").fetchone()[0]:
+            conn.execute(f"INSERT OR IGNORE INTO live.archived_keys (Table_Name, Row_Key) SELECT ?, {pk} FROM archived_{table}", (table,))
+        archived = conn.execute(f"SELECT MAX({pk}) FROM archived_{table}").fetchone()[0]
+        if archived is not None:
+            conn.execute(RAISE_KEY_FLOOR, (table, archived))
+
+
+def reclaim(conn, full=False):
+    # Give the free pages left by archived rows back to the file system. Incremental when the live
+    # database uses auto_vacuum = INCREMENTAL; `full` runs one VACUUM that also switches it to that
+    # mode, so later runs need no full VACUUM.
+    if conn.execute("PRAGMA live.auto_vacuum").fetchone()[0] == 2:
+        conn.execute("PRAGMA live.incremental_vacuum").fetchall()
+    elif full:
+        conn.execute("PRAGMA live.auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM live")
+    conn.execute("PRAGMA live.wal_checkpoint(TRUNCATE)").fetchall()
+
+
+def archive_cold_rows(now=None, claim_days=CLAIM_RETENTION_DAYS, listing_days=LISTING_GRACE_DAYS,
+                      batch_size=BATCH_SIZE, full_vacuum=False, db_path=DB_PATH, archive_path=ARCHIVE_PATH):
+    # One archival run; returns its archive_runs row as a dict. Claims go first, so listings whose
+    # last hot claims were just archived are cold in the same run.
+    from crud import notify_write   # pandas and Streamlit; kept out of the app's entry-point imports
+    now = now or datetime.now()
+    cutoffs = {
+        "claims": (now - timedelta(days=claim_days)).strftime("%Y-%m-%d %H:%M:%S"),
+        "food_listings": (now - timedelta(days=listing_days)).strftime("%Y-%m-%d"),
+    }
+    archived_at = now.strftime("%Y-%m-%d %H:%M:%S")
+    run = dict(Started_At=archived_at, Claims_Archived=0, Listings_Archived=0, Batches=0, Skipped_Keys=0, Error=None)
+    started = time.perf_counter()
+    live = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+    try:
+        apply_migrations(live)
+    finally:
+        live.close()
+    conn = open_archive(db_path, archive_path)
+    try:
+        run["Db_Bytes_Before"], run["Free_Bytes_Before"] = space(conn)
+        record_archived_keys(conn)
+        first = None
+        for table, counter in [("claims", "Claims_Archived"), ("food_listings", "Listings_Archived")]:
+            last = 0
+            while True:
+                rows, skipped, last = _move_batch(conn, table, cutoffs[table], batch_size, archived_at, last)
+                if last is None:
+                    break
+                if rows:
+                    notify_write(table, "delete", rows)
+                    run[counter] += len(rows)
+                    run["Batches"] += 1
+                run["Skipped_Keys"] += len(skipped)
+                if skipped:
+                    first = first or f"{table} {PRIMARY_KEYS[table]} {skipped[0]}"
+                    run["Error"] = (f"{first} and {run['Skipped_Keys'] - 1} other key(s) already archived with a different "
+                                    f"row; left in the hot table" if run["Skipped_Keys"] > 1 else
+                                    f"{first} already archived with a different row; left in the hot table")
+        reclaim(conn, full_vacuum)
+    except sqlite3.Error as e:
+        run["Error"] = str(e)
+    run["Db_Bytes_After"], run["Free_Bytes_After"] = space(conn)
+    run["Seconds"] = round(time.perf_counter() - started, 3)
+    conn.execute(f"INSERT INTO archive_runs ({', '.join(run)}) VALUES ({', '.join('?' * len(run))})", list(run.values()))
+    conn.close()
+    return run
+
+
+def archive_status(db_path=DB_PATH, archive_path=ARCHIVE_PATH, runs=10):
+    # Hot and archived row counts, file sizes and the latest runs
+    conn = open_archive(db_path, archive_path)
+    try:
+        counts = {table: (conn.execute(f"SELECT COUNT(*) FROM live.{table}").fetchone()[0],
+                          conn.execute(f"SELECT COUNT(*) FROM archived_{table}").fetchone()[0])
+                  for table in ARCHIVED_COLUMNS}
+        sizes = {"live": space(conn, "live"), "archive": space(conn, "main")}
+        cursor = conn.execute("SELECT * FROM archive_runs ORDER BY Run_ID DESC LIMIT ?", (runs,))
+        names = [d[0] for d in cursor.description]
+        recent = [dict(zip(names, row)) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+    return counts, sizes, recent
+
+
+def describe_space(run):
+    # Archived rows leave free pages, which later writes reuse; only the vacuum step shrinks the file
+    return (f"database {run['Db_Bytes_Before'] / 1024:.0f} KiB -> {run['Db_Bytes_After'] / 1024:.0f} KiB, "
+            f"{run['Free_Bytes_After'] / 1024:.0f} KiB free for reuse")
+
+
+_scheduler = []
+
+
+def start_archive_scheduler(every_hours=ARCHIVE_EVERY_HOURS):
+    # Archive in a daemon thread of the app process every `every_hours`; started at most once, and
+    # not at all unless FOOD_WASTAGE_ARCHIVE_EVERY is set (otherwise run `python archive.py run` from cron)
+    if not every_hours or _scheduler:
+        return None
+
+    def loop():
+        while True:
+            time.sleep(float(every_hours) * 3600)
+            archive_cold_rows()
+    thread = threading.Thread(target=loop, daemon=True, name="archive-scheduler")
+    _scheduler.append(thread)
+    thread.start()
+    return thread
+
+
+def _print_run(run):
+    print(f"{run['Claims_Archived']} claims and {run['Listings_Archived']} listings archived in {run['Batches']} "
+          f"batch(es), {run['Seconds']:.2f}s; {describe_space(run)}")
+    if run["Skipped_Keys"]:
+        print(f"Skipped {run['Skipped_Keys']} key(s): {run['Error']}")
+    elif run["Error"]:
+        print(f"Stopped by an error: {run['Error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move expired listings and closed claims into the archive database")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="archive the cold rows now")
+    run_parser.add_argument("--claim-days", type=int, default=CLAIM_RETENTION_DAYS,
+                            help="keep Completed/Cancelled claims hot for this many days")
+    run_parser.add_argument("--listing-days", type=int, default=LISTING_GRACE_DAYS,
+                            help="keep expired listings hot for this many days past Expiry_Date")
+    run_parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    run_parser.add_argument("--full-vacuum", action="store_true",
+                            help="VACUUM the database and switch it to incremental auto-vacuum")
+    sub.add_parser("status", help="row counts, sizes and recent runs")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run = archive_cold_rows(claim_days=args.claim_days, listing_days=args.listing_days,
+                                batch_size=args.batch_size, full_vacuum=args.full_vacuum)
+        _print_run(run)
+        if run["Error"]:
+            parser.exit(1)
+        return
+    counts, sizes, recent = archive_status()
+    for table, (hot, archived) in counts.items():
+        print(f"{table:<15} {hot:>10} hot {archived:>10} archived")
+    for name, (total, free) in sizes.items():
+        print(f"{name:<15} {total / 1024:>10.0f} KiB ({free / 1024:.0f} KiB free)")
+    for run in recent:
+        print(f"Run {run['Run_ID']} at {run['Started_At']}:")
+        _print_run(run)
+
+
+if __name__ == "__main__":
+    main()
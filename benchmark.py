@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from columnar import ensure_snapshot, has_columnar, run_columnar
+from crud import create_records, delete_records, run_query, undo_batch, update_records_by_id
+from dashboard import claims_by_status, expiring_listings, summary_metrics
+from database import DB_PATH, TABLES, create_schema
+from ingest import SEED_FILES, insert_statement
+from materialized import has_materialized, named_query_sql, refresh_now
+from migrations import apply_migrations
+from queries import CHART_QUERIES, PREDEFINED_QUERIES, RECENT_CLAIMS_QUERY
+from query_cache import get_cache
+
+DEFAULT_SCALE = 10
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.25   # allowed slowdown before a result counts as a regression
+MIN_DELTA_MS = 1.0         # ignore regressions smaller than this; timer noise on fast queries
+CRUD_ROWS = 1000
+GENERATE_CHUNK = 50000
+
+
+# Synthetic data: every column is sampled from the empirical distribution of the shipped
+# cleaned_*_data.csv files, so cities, types, statuses and quantities keep their frequencies.
+# Listings copy Provider_Type and Location from their provider, as in the real data.
+
+def _sample(rng, series, n):
+    values, counts = np.unique(series.dropna().astype(str).to_numpy(), return_counts=True)
+    return values[rng.choice(len(values), size=n, p=counts / counts.sum())]
+
+
+def _uniform_times(rng, series, n, fmt):
+    moments = pd.to_datetime(series, format=fmt)
+    start, end = moments.min().value // 10**9, moments.max().value // 10**9
+    seconds = rng.integers(start, end + 1, size=n)
+    return pd.to_datetime(seconds, unit="s").strftime(fmt).to_numpy()
+
+
+def _generate_table(table, source, n, rng, counts, providers=None):
+    ids = np.arange(1, n + 1)
+    if table == "providers":
+        return pd.DataFrame({
+            "Provider_ID": ids, "Name": _sample(rng, source["Name"], n), "Type": _sample(rng, source["Type"], n),
+            "Address": _sample(rng, source["Address"], n), "City": _sample(rng, source["City"], n),
+            "Contact": _sample(rng, source["Contact"], n)})
+    if table == "receivers":
+        return pd.DataFrame({
+            "Receiver_ID": ids, "Name": _sample(rng, source["Name"], n), "Type": _sample(rng, source["Type"], n),
+            "City": _sample(rng, source["City"], n), "Contact": _sample(rng, source["Contact"], n)})
+    if table == "food_listings":
+        provider_ids = rng.integers(1, counts["providers"] + 1, size=n)
+        return pd.DataFrame({
+            "Food_ID": ids, "Food_Name": _sample(rng, source["Food_Name"], n),
+            "Quantity": _sample(rng, source["Quantity"], n).astype(int),
+            "Expiry_Date": _uniform_times(rng, source["Expiry_Date"], n, "%Y-%m-%d"),
+            "Provider_ID": provider_ids,
+            "Provider_Type": providers["Type"].to_numpy()[provider_ids - 1],
+            "Location": providers["City"].to_numpy()[provider_ids - 1],
+            "Food_Type": _sample(rng, source["Food_Type"], n), "Meal_Type": _sample(rng, source["Meal_Type"], n)})
+    return pd.DataFrame({
+        "Claim_ID": ids, "Food_ID": rng.integers(1, counts["food_listings"] + 1, size=n),
+        "Receiver_ID": rng.integers(1, counts["receivers"] + 1, size=n),
+        "Status": _sample(rng, source["Status"], n),
+        "Timestamp": _uniform_times(rng, source["Timestamp"], n, "%Y-%m-%d %H:%M:%S")})
+
+
+def generate(db_path, scale, seed=0, log=print):
+    # Build a fresh database at `scale` times the shipped row counts, then apply the migrations once
+    rng = np.random.default_rng(seed)
+    sources = {table: pd.read_csv(csv_path) for table, csv_path in SEED_FILES}
+    counts = {table: int(len(sources[table]) * scale) for table in TABLES}
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    create_schema(conn)
+    providers = None
+    for table in TABLES:
+        started = time.perf_counter()
+        df = _generate_table(table, sources[table], counts[table], rng, counts, providers)
+        if table == "providers":
+            providers = df
+        query = insert_statement(table, list(df.columns), "error")
+        for start in range(0, len(df), GENERATE_CHUNK):
+            conn.executemany(query, df.iloc[start:start + GENERATE_CHUNK].itertuples(index=False, name=None))
+            conn.commit()
+        log(f"  {table}: {len(df):,} rows in {time.perf_counter() - started:.1f}s")
+    started = time.perf_counter()
+    apply_migrations(conn)
+    log(f"  migrations: {time.perf_counter() - started:.1f}s")
+    conn.close()
+    return counts
+
+
+# Timing
+
+def _timings(fn, repeat, before=None):
+    samples = []
+    for _ in range(repeat):
+        if before:
+            before()
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "min_ms": round(samples[0], 3),
+    }
+
+
+def _throughput(fn, rows):
+    started = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - started
+    return {"rows": rows, "seconds": round(seconds, 4), "rows_per_sec": round(rows / seconds if seconds else 0.0, 1)}
+
+
+def run_benchmarks(repeat=DEFAULT_REPEAT, crud_rows=CRUD_ROWS, log=print):
+    # Runs against DB_PATH, i.e. the database named by FOOD_WASTAGE_DB
+    results = {}
+    clear_cache = get_cache().clear
+
+    def record(key, value):
+        results[key] = value
+        log(f"  {key}: {value}")
+
+    refresh_now()
+    snapshot = ensure_snapshot(max_age=0)
+    for name in list(PREDEFINED_QUERIES) + list(CHART_QUERIES):
+        kind = "query" if name in PREDEFINED_QUERIES else "chart"
+        sql = PREDEFINED_QUERIES.get(name) or CHART_QUERIES[name]
+        record(f"{kind}/live/{name}", _timings(lambda: run_query(sql, cache=False), repeat))
+        if has_materialized(name):
+            mv_sql = named_query_sql(name)
+            record(f"{kind}/materialized/{name}", _timings(lambda: run_query(mv_sql, cache=False), repeat))
+        if has_columnar(name):
+            record(f"{kind}/columnar/{name}", _timings(lambda: run_columnar(name, snapshot), repeat))
+
+    record("dashboard/summary_metrics", _timings(summary_metrics, repeat, clear_cache))
+    record("dashboard/claims_by_status", _timings(claims_by_status, repeat, clear_cache))
+    record("dashboard/expiring_listings", _timings(expiring_listings, repeat, clear_cache))
+    record("dashboard/recent_claims", _timings(lambda: run_query(RECENT_CLAIMS_QUERY, cache=False), repeat))
+
+    # CRUD throughput; every batch is undone afterwards so the database ends as it started
+    claim_ids = [int(i) for i in run_query("SELECT Claim_ID FROM claims ORDER BY Claim_ID LIMIT ?", (crud_rows,),
+                                           cache=False)["Claim_ID"]]
+    food_id = int(run_query("SELECT MIN(Food_ID) as v FROM food_listings", cache=False)["v"][0])
+    receiver_id = int(run_query("SELECT MIN(Receiver_ID) as v FROM receivers", cache=False)["v"][0])
+    new_claims = [{"Food_ID": food_id, "Receiver_ID": receiver_id, "Status": "Pending",
+                   "Timestamp": "2025-03-20 12:00:00"} for _ in range(crud_rows)]
+    batch = {}
+    record("crud/create_records", _throughput(lambda: batch.update(insert=create_records("claims", new_claims)[0]),
+                                              crud_rows))
+    record("crud/update_records_by_id", _throughput(
+        lambda: batch.update(update=update_records_by_id("claims", {"Status": "Completed"}, claim_ids)[0]),
+        len(claim_ids)))
+    record("crud/undo_batch", _throughput(lambda: undo_batch(batch["update"]), len(claim_ids)))
+    inserted = [int(i) for i in run_query("SELECT Row_Key FROM undo_journal WHERE Batch_ID = ?", (batch["insert"],),
+                                          cache=False)["Row_Key"]]
+    record("crud/delete_records", _throughput(lambda: batch.update(delete=delete_records("claims", inserted)[0]),
+                                              len(inserted)))
+    return results
+
+
+def report_meta(db_path, repeat):
+    conn = sqlite3.connect(db_path)
+    rows = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLES}
+    conn.close()
+    return {
+        "db": os.path.basename(db_path),
+        "rows": rows,
+        "repeat": repeat,
+        "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "machine": platform.machine(),
+    }
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE, min_delta_ms=MIN_DELTA_MS):
+    # Regressions: best-of-N latency up by more than `tolerance` (and min_delta_ms), or throughput down by it.
+    # The minimum is compared rather than the median because it is the least disturbed by other load.
+    regressions = []
+    for key, result in report["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            continue
+        if "min_ms" in result:
+            if (result["min_ms"] > base["min_ms"] * (1 + tolerance)
+                    and result["min_ms"] - base["min_ms"] > min_delta_ms):
+                regressions.append((key, f"{base['min_ms']} ms -> {result['min_ms']} ms"))
+        elif result["rows_per_sec"] < base["rows_per_sec"] / (1 + tolerance):
+            regressions.append((key, f"{base['rows_per_sec']} rows/s -> {result['rows_per_sec']} rows/s"))
+    if report["meta"]["rows"] != baseline["meta"]["rows"]:
+        regressions.insert(0, ("meta/rows", "row counts differ from the baseline; timings are not comparable"))
+    return regressions
+
+
+def _print_regressions(regressions, tolerance):
+    if not regressions:
+        print(f"No regressions beyond {tolerance:.0%}")
+        return 0
+    print(f"{len(regressions)} regression(s) beyond {tolerance:.0%}:")
+    for key, change in regressions:
+        print(f"  {key}: {change}")
+    return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks on synthetic data at 10x-1000x the shipped size")
+    sub = parser.add_subparsers(dest="command", required=True)
+    gen = sub.add_parser("generate", help="create a synthetic database")
+    gen.add_argument("--scale", type=float, default=DEFAULT_SCALE, help="multiple of the shipped row counts")
+    gen.add_argument("--out", help="database file (default bench_<scale>x.db)")
+    gen.add_argument("--seed", type=int, default=0)
+    gen.add_argument("--force", action="store_true", help="overwrite an existing file")
+    run = sub.add_parser("run", help="time queries, dashboard and CRUD against the database in FOOD_WASTAGE_DB")
+    run.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    run.add_argument("--crud-rows", type=int, default=CRUD_ROWS)
+    run.add_argument("--report", default="benchmark_report.json")
+    run.add_argument("--baseline", help="report to compare against; exits 1 on regressions")
+    run.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    cmp = sub.add_parser("compare", help="compare two reports")
+    cmp.add_argument("report")
+    cmp.add_argument("baseline")
+    cmp.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        out = args.out or f"bench_{args.scale:g}x.db"
+        if os.path.exists(out):
+            if not args.force:
+                parser.error(f"{out} exists; pass --force to overwrite it")
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(out + suffix):
+                    os.remove(out + suffix)
+        print(f"Generating {out} at {args.scale:g}x")
+        generate(out, args.scale, args.seed)
+        return 0
+
+    if args.command == "compare":
+        with open(args.report) as f:
+            report = json.load(f)
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        return _print_regressions(compare(report, baseline, args.tolerance), args.tolerance)
+
+    # The benchmark writes (and then undoes) CRUD batches, so it never runs against the app's database
+    if "FOOD_WASTAGE_DB" not in os.environ:
+        parser.error("set FOOD_WASTAGE_DB to a database made with `benchmark.py generate`")
+    if not os.path.exists(DB_PATH):
+        parser.error(f"{DB_PATH} does not exist; create it with `benchmark.py generate`")
+    print(f"Benchmarking {DB_PATH}")
+    report = {"meta": report_meta(DB_PATH, args.repeat), "results": run_benchmarks(args.repeat, args.crud_rows)}
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Wrote {args.report}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        return _print_regressions(compare(report, baseline, args.tolerance), args.tolerance)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
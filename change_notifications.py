@@ -0,0 +1,202 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from urllib.request import pathname2url
+
+from connection_pool import get_pool
+from database import DB_PATH, TABLES
+from query_cache import get_cache
+
+# Change notifications: one read-only connection polls PRAGMA data_version, which moves whenever any
+# other connection or process commits. Only then are the trigger-maintained change_counters read
+# (migration 8), and each table whose counter moved is published as "table changed at version N":
+# its cached query results are evicted and the pages' auto-refreshing widgets pick the new version up.
+POLL_SECONDS = 1.0                # data_version checks in the app process
+REFRESH_SECONDS = float(os.environ.get("FOOD_WASTAGE_REFRESH_SECONDS", 5))  # page widgets; 0 turns auto-refresh off
+CHANGE_LOG_KEEP = 20000           # change_log rows kept; widgets further behind re-read instead of applying a delta
+PRUNE_EVERY = 60                  # seconds between change_log prunes
+DELTA_LIMIT = 500                 # changed keys fetched by primary key; more than this and the widget re-reads
+
+
+def refresh_every():
+    # run_every for st.fragment, or None when auto-refresh is off
+    return REFRESH_SECONDS or None
+
+
+class ChangeNotifier:
+
+    def __init__(self, db_path=DB_PATH, poll_seconds=POLL_SECONDS):
+        self.db_path = db_path
+        self.poll_seconds = poll_seconds
+        self._conn = None
+        self._data_version = None
+        self._versions = {table: 0 for table in TABLES}
+        self._changed_at = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._stats = {"polls": 0, "data_version_changes": 0, "tables_published": 0, "pruned_rows": 0}
+        self._thread = None
+
+    def _connection(self):
+        # Its own connection: data_version is per connection, and it must see every other connection's commits
+        if self._conn is None:
+            uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        return self._conn
+
+    def poll(self, bump_cache=True):
+        # Returns {table: version} for the tables that changed since the last poll. bump_cache=False
+        # when the caller's own write has already evicted its cached results (see crud.notify_write).
+        with self._lock:
+            conn = self._connection()
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            self._stats["polls"] += 1
+            if data_version == self._data_version:
+                return {}
+            first = self._data_version is None
+            self._data_version = data_version
+            self._stats["data_version_changes"] += 1
+            try:
+                counters = conn.execute("SELECT Table_Name, Version, Changed_At FROM change_counters").fetchall()
+            except sqlite3.OperationalError:
+                # Not migrated yet
+                return {}
+        changed = {}
+        with self._changed:
+            for table, version, changed_at in counters:
+                if version != self._versions.get(table):
+                    changed[table] = version
+                    self._versions[table] = version
+                    self._changed_at[table] = changed_at
+            if changed and not first:
+                self._stats["tables_published"] += len(changed)
+                self._changed.notify_all()
+        if changed and not first and bump_cache:
+            get_cache().bump(*changed)
+        return {} if first else changed
+
+    def versions(self):
+        with self._changed:
+            return dict(self._versions)
+
+    def status(self):
+        with self._changed:
+            rows = [{"Table": table, "Version": version, "Changed_At": self._changed_at.get(table)}
+                    for table, version in self._versions.items()]
+            return rows, dict(self._stats)
+
+    def wait(self, seen, timeout=None):
+        # Block until some table's version differs from seen ({table: version}); returns the changed ones
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while True:
+                changed = {table: version for table, version in self._versions.items() if seen.get(table) != version}
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if changed or (remaining is not None and remaining <= 0):
+                    return changed
+                self._changed.wait(remaining)
+
+    def prune(self, keep=CHANGE_LOG_KEEP):
+        with get_pool().writer() as conn:
+            cursor = conn.execute(
+                "DELETE FROM change_log WHERE Change_ID <= (SELECT MAX(Change_ID) FROM change_log) - ?", (keep,))
+            conn.commit()
+        with self._lock:
+            self._stats["pruned_rows"] += cursor.rowcount
+        return cursor.rowcount
+
+    def _loop(self):
+        last_prune = time.monotonic()
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                self.poll()
+                if time.monotonic() - last_prune >= PRUNE_EVERY:
+                    last_prune = time.monotonic()
+                    self.prune()
+            except sqlite3.Error:
+                # Locked or mid-migration; the next poll tries again
+                pass
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True, name="change-notifier")
+                self._thread.start()
+        self.poll()
+        return self._thread
+
+
+_notifier = ChangeNotifier()
+
+
+def get_notifier():
+    return _notifier
+
+
+def start_change_notifier():
+    return _notifier.start()
+
+
+def changed_keys(table, since, limit=DELTA_LIMIT):
+    # Primary keys of the table's rows inserted, updated or deleted after version `since`, or None when
+    # the change log no longer reaches back that far or there are more than `limit` of them
+    with get_pool().reader() as conn:
+        oldest = conn.execute("SELECT MIN(Change_ID) FROM change_log").fetchone()[0]
+        if oldest is None or since < oldest - 1:
+            return None
+        keys = [row[0] for row in conn.execute(
+            "SELECT DISTINCT Row_Key FROM change_log WHERE Table_Name = ? AND Change_ID > ? LIMIT ?",
+            (table, since, limit + 1))]
+    return keys if len(keys) <= limit else None
+
+
+def current_version(table):
+    # Taken before a widget reads the table, so a write made during the read shows up on its next refresh
+    _notifier.poll()
+    return _notifier.versions().get(table, 0)
+
+
+def delta(table, since):
+    # (version, changed keys or None) for a widget that last read the table at version `since`;
+    # keys is [] when nothing changed and None when the widget should read everything again
+    version = current_version(table)
+    if version == since:
+        return version, []
+    return version, changed_keys(table, since)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch the database for changes to the app's tables")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="show each table's change version")
+    watch_parser = sub.add_parser("watch", help="print each change as it is committed, by any process")
+    watch_parser.add_argument("--interval", type=float, default=POLL_SECONDS)
+    args = parser.parse_args()
+
+    notifier = ChangeNotifier()
+    try:
+        notifier.poll()
+        if args.command == "status":
+            for row in notifier.status()[0]:
+                print(f"{row['Table']:<15} version {row['Version']:>10}  changed {row['Changed_At'] or '-'}")
+            return
+        seen = notifier.versions()
+        while True:
+            time.sleep(args.interval)
+            for table, version in notifier.poll(bump_cache=False).items():
+                with get_pool().reader() as conn:
+                    count = conn.execute("SELECT COUNT(DISTINCT Row_Key) FROM change_log WHERE Table_Name = ? AND Change_ID > ?",
+                                         (table, seen[table])).fetchone()[0]
+                print(f"{time.strftime('%H:%M:%S')} {table} changed at version {version} ({count} rows)", flush=True)
+                seen[table] = version
+    except sqlite3.Error as e:
+        parser.exit(1, f"{e}\n")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
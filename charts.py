@@ -0,0 +1,179 @@
+import io
+import threading
+from collections import OrderedDict
+
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.figure import Figure
+import seaborn as sns
+
+from columnar import ensure_snapshot, has_columnar
+from crud import register_write_hook
+from instrumentation import track
+from materialized import MATERIALIZED, MODES, SHARDED, SNAPSHOT, named_query_sql, run_named_query
+from query_cache import get_cache, referenced_tables
+from sharding import get_store
+
+MAX_CACHED_CHARTS = 64
+IMAGE_FORMAT = "png"
+DPI = 100
+
+# Charts on the "Visualization" page, in display order; each is named after its query in CHART_QUERIES
+CHARTS = OrderedDict([
+    ("Providers per City (Top 10)", dict(
+        kind="bar", x="City", y="Provider_Count", palette="Blues_d", top=10,
+        title="Top 10 Cities by Number of Providers", xlabel="City", ylabel="Provider Count")),
+    ("Claim Status Distribution", dict(
+        kind="pie", values="Percentage", labels="Status", figsize=(8, 8),
+        colors=["#ff9999", "#66b3ff", "#99ff99"], textprops={"fontsize": 12},
+        title="Claim Status Distribution")),
+    ("Total Quantity Donated by Provider (Top 5)", dict(
+        kind="bar", x="Name", y="Total_Donated", palette="Greens_d",
+        title="Top 5 Providers by Total Quantity Donated", xlabel="Provider Name", ylabel="Total Quantity")),
+    ("Avg Quantity Claimed per Receiver (Top 5)", dict(
+        kind="bar", x="Name", y="Avg_Quantity_Claimed", palette="Reds_d",
+        title="Top 5 Receivers by Avg Quantity Claimed", xlabel="Receiver Name", ylabel="Avg Quantity")),
+    ("Claims by City (Top 10)", dict(
+        kind="bar", x="Location", y="Claim_Count", palette="Purples_d",
+        title="Top 10 Cities by Number of Claims", xlabel="City", ylabel="Claim Count")),
+    ("Most Common Food Types (Top 5)", dict(
+        kind="pie", values="Listing_Count", labels="Food_Type", figsize=(10, 6),
+        colors=["#ff9999", "#66b3ff", "#99ff99", "#ffcc99", "#cc99ff"],
+        title="Top 5 Most Common Food Types")),
+    ("Providers with Highest Avg Quantity (Top 5)", dict(
+        kind="bar", x="Name", y="Avg_Quantity", palette="Oranges_d",
+        title="Top 5 Providers by Avg Quantity", xlabel="Provider Name", ylabel="Avg Quantity")),
+    ("Claims by Meal Type (Top 5)", dict(
+        kind="bar", x="Meal_Type", y="Claim_Count", palette="YlOrBr",
+        title="Top 5 Meal Types by Claim Count", xlabel="Meal Type", ylabel="Claim Count")),
+    ("Unclaimed Food Listings by Quantity (Top 5)", dict(
+        kind="bar", x="Food_Name", y="Quantity", palette="Greys_d",
+        title="Top 5 Unclaimed Food Listings by Quantity", xlabel="Food Name", ylabel="Quantity")),
+    ("Receivers per City by Breakfast Claims (Top 5)", dict(
+        kind="bar", x="City", y="Breakfast_Receivers", palette="BuPu",
+        title="Top 5 Cities by Breakfast Receivers", xlabel="City", ylabel="Breakfast Receivers")),
+])
+
+
+def draw(spec, df):
+    # Build the figure with the object-oriented API (no pyplot state, safe off the script thread)
+    fig = Figure(figsize=spec.get("figsize", (12, 6)))
+    ax = fig.subplots()
+    if spec["kind"] == "bar":
+        if spec.get("top"):
+            df = df.nlargest(spec["top"], spec["y"])
+        sns.barplot(data=df, x=spec["x"], y=spec["y"], palette=spec["palette"], ax=ax)
+        ax.set_xlabel(spec["xlabel"])
+        ax.set_ylabel(spec["ylabel"])
+        ax.tick_params(axis="x", labelrotation=45)
+        for label in ax.get_xticklabels():
+            label.set_horizontalalignment("right")
+    else:
+        ax.pie(df[spec["values"]], labels=df[spec["labels"]], autopct="%1.1f%%",
+               colors=spec["colors"], textprops=spec.get("textprops"))
+    ax.set_title(spec["title"])
+    return fig
+
+
+class ChartCache:
+    # Rendered chart images keyed by (chart, mode, versions of the tables its query reads, the snapshot
+    # generation, or the shards' change counters), so a chart is drawn once per data version
+
+    def __init__(self, max_entries=MAX_CACHED_CHARTS):
+        self.max_entries = max_entries
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "renders": 0}
+
+    def key(self, name, mode):
+        if mode == SNAPSHOT and has_columnar(name):
+            return name, mode, ensure_snapshot().generation
+        if mode == SHARDED:
+            return name, mode, get_store().version()
+        tables = referenced_tables(named_query_sql(name, mode))
+        return name, mode, tuple(sorted(get_cache().versions(tables).items()))
+
+    def cached(self, name, mode):
+        with self._lock:
+            return self._images.get(self.key(name, mode))
+
+    def image(self, name, mode=MATERIALIZED, df=None, key=None):
+        # df: the chart's data if already fetched (see parallel_queries), with the key taken before fetching
+        key = key or self.key(name, mode)
+        with self._lock:
+            if key in self._images:
+                self._images.move_to_end(key)
+                self._stats["hits"] += 1
+                return self._images[key]
+        image = render(name, mode, df=df)
+        with self._lock:
+            self._images[key] = image
+            self._stats["renders"] += 1
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+        return image
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._images))
+
+
+def render(name, mode=MATERIALIZED, image_format=IMAGE_FORMAT, df=None):
+    # Query (unless df is given), draw, encode and always close the figure
+    with track("chart", f"{name} ({mode})") as call:
+        df = run_named_query(name, mode) if df is None else df
+        fig = draw(CHARTS[name], df)
+        try:
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format=image_format, dpi=DPI, bbox_inches="tight")
+            call["rows"], call["bytes"] = len(df), buffer.tell()
+            return buffer.getvalue()
+        finally:
+            fig.clear()
+
+
+_charts = ChartCache()
+
+
+def get_chart_cache():
+    return _charts
+
+
+# Background pre-rendering after writes; at most one worker runs, and a write during a run schedules one more
+_prerender_lock = threading.Lock()
+_prerender = {"running": False, "again": False}
+
+
+def prerender_all(modes=MODES):
+    for mode in modes:
+        for name in CHARTS:
+            try:
+                _charts.image(name, mode)
+            except Exception:
+                # A failed chart is simply rendered (and reported) on the next page view
+                pass
+
+
+def _prerender_worker(modes):
+    while True:
+        prerender_all(modes)
+        with _prerender_lock:
+            if not _prerender["again"]:
+                _prerender["running"] = False
+                return
+            _prerender["again"] = False
+
+
+def prerender_in_background(modes=MODES):
+    with _prerender_lock:
+        if _prerender["running"]:
+            _prerender["again"] = True
+            return
+        _prerender["running"] = True
+    threading.Thread(target=_prerender_worker, args=(modes,), daemon=True, name="chart-prerender").start()
+
+
+# After a write, only the modes that read the live tables: keying a Columnar snapshot chart would start a
+# full snapshot export for every write, and the shards only see it once they catch up (see sharding.py)
+WRITE_PRERENDER_MODES = [mode for mode in MODES if mode not in (SNAPSHOT, SHARDED)]
+register_write_hook(lambda table, action, rows: prerender_in_background(WRITE_PRERENDER_MODES))
@@ -0,0 +1,85 @@
+import argparse
+import re
+import sqlite3
+import sys
+
+from database import DB_PATH, TABLES
+from migrations import apply_migrations
+from queries import PREDEFINED_QUERIES, CHART_QUERIES, RECENT_CLAIMS_QUERY
+
+# Tables that are too big to read end to end on a page view
+LARGE_TABLES = ["claims", "food_listings"]
+
+# Queries that return one row per row of a large table, so reading all of it is the result size
+ALLOWED_FULL_SCANS = {
+    ("Q9: Claims per food item", "food_listings"),
+}
+
+SQL_KEYWORDS = {"ON", "WHERE", "JOIN", "LEFT", "INNER", "CROSS", "GROUP", "ORDER", "LIMIT", "USING"}
+
+
+def table_aliases(query):
+    # Map every alias (and bare table name) in FROM/JOIN clauses to its table
+    aliases = {}
+    for table, alias in re.findall(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", query, re.IGNORECASE):
+        aliases[table] = table
+        if alias and alias.upper() not in SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+
+def full_scans(conn, query, large_tables):
+    # Yield (table, plan line) for every SCAN of a large table that does not go through an index
+    aliases = table_aliases(query)
+    for _, _, _, detail in conn.execute(f"EXPLAIN QUERY PLAN {query}"):
+        match = re.match(r"SCAN (\w+)(.*)", detail)
+        if match and "INDEX" not in match.group(2):
+            table = aliases.get(match.group(1), match.group(1))
+            if table in large_tables:
+                yield table, detail
+
+
+def check_queries(conn, large_tables):
+    named_queries = list(PREDEFINED_QUERIES.items())
+    named_queries += [(f"Chart: {name}", query) for name, query in CHART_QUERIES.items()]
+    named_queries.append(("Recent Claims", RECENT_CLAIMS_QUERY))
+    failures = []
+    for name, query in named_queries:
+        scans = [(table, detail) for table, detail in full_scans(conn, query, large_tables)
+                 if (name, table) not in ALLOWED_FULL_SCANS]
+        print(f"{'FAIL' if scans else 'ok  '}  {name}")
+        for table, detail in scans:
+            print(f"        {detail}")
+            failures.append((name, table))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when a predefined or chart query falls back to a full table scan.")
+    parser.add_argument("db_path", nargs="?", default=DB_PATH)
+    parser.add_argument("--large-tables", default=",".join(LARGE_TABLES),
+                        help="comma-separated tables that must never be scanned without an index")
+    parser.add_argument("--min-rows", type=int, default=None,
+                        help="also treat any table with at least this many rows as large")
+    parser.add_argument("--migrate", action="store_true", help="apply pending migrations before checking")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_path)
+    if args.migrate:
+        apply_migrations(conn)
+    large_tables = {table.strip() for table in args.large_tables.split(",") if table.strip()}
+    if args.min_rows is not None:
+        for table in TABLES:
+            if conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] >= args.min_rows:
+                large_tables.add(table)
+    failures = check_queries(conn, large_tables)
+    conn.close()
+    if failures:
+        print(f"\n{len(failures)} full table scan(s) on large tables")
+        return 1
+    print("\nNo full table scans on large tables")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import argparse
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from crud import run_query
+from migrations import CLAIM_ROLLUPS
+from query_cache import register_derived_table
+
+# Event log and rollups are written by the claims triggers from migration 5
+register_derived_table("claim_events", ["claims"])
+for _table, _ in CLAIM_ROLLUPS:
+    register_derived_table(_table, ["claims"])
+
+GRANULARITIES = {"hour": "claim_rollup_hourly", "day": "claim_rollup_daily"}
+
+
+def to_epoch(value):
+    # datetime, date string or epoch seconds -> epoch seconds (naive values are UTC, like the triggers)
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def claim_history(claim_id):
+    df = run_query('''
+        SELECT Event_ID, Old_Status, New_Status, Event_Time, City, Meal_Type
+        FROM claim_events
+        WHERE Claim_ID = ?
+        ORDER BY Event_ID
+    ''', (claim_id,))
+    df["Event_Time"] = pd.to_datetime(df["Event_Time"], unit="s", utc=True)
+    return df
+
+
+def trend(granularity="day", start=None, end=None, city=None, status=None, meal_type=None):
+    # Status transitions per time bucket from the rollup tables, summed over whatever is not filtered.
+    # start is inclusive and end exclusive.
+    conditions, params = [], []
+    for column, op, value in [("Bucket", ">=", to_epoch(start)), ("Bucket", "<", to_epoch(end)),
+                              ("City", "=", city), ("Status", "=", status), ("Meal_Type", "=", meal_type)]:
+        if value is not None:
+            conditions.append(f"{column} {op} ?")
+            params.append(value)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    df = run_query(f'''
+        SELECT Bucket, Status, SUM(Event_Count) as Event_Count
+        FROM {GRANULARITIES[granularity]}
+        {where}
+        GROUP BY Bucket, Status
+        ORDER BY Bucket
+    ''', params)
+    df["Bucket"] = pd.to_datetime(df["Bucket"], unit="s", utc=True)
+    return df
+
+
+def trend_table(granularity="day", **filters):
+    # One row per bucket, one column per status; ready for st.line_chart
+    df = trend(granularity, **filters)
+    return df.pivot_table(index="Bucket", columns="Status", values="Event_Count", aggfunc="sum", fill_value=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Claim status transitions over time")
+    parser.add_argument("--granularity", choices=list(GRANULARITIES), default="day")
+    parser.add_argument("--start", help="inclusive, e.g. 2025-03-01")
+    parser.add_argument("--end", help="exclusive")
+    parser.add_argument("--city")
+    parser.add_argument("--status")
+    parser.add_argument("--meal-type")
+    parser.add_argument("--claim", type=int, help="show the event history of one claim instead")
+    args = parser.parse_args()
+    if args.claim is not None:
+        print(claim_history(args.claim).to_string(index=False))
+        return
+    table = trend_table(args.granularity, start=args.start, end=args.end, city=args.city,
+                        status=args.status, meal_type=args.meal_type)
+    print(table.to_string())
+
+
+if __name__ == "__main__":
+    main()
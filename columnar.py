@@ -0,0 +1,517 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from connection_pool import get_pool
+from database import DB_PATH, PRIMARY_KEYS, TABLES
+from instrumentation import track
+
+# Columnar snapshot of the four tables: one .npy file per column, memory-mapped read-only, so every
+# Streamlit process on the machine shares the same pages. Text columns are dictionary-encoded
+# (int32 codes, -1 = NULL, plus a sorted dictionary), Expiry_Date is stored as days since 1970-01-01 and
+# Timestamp as epoch seconds. Integer columns with NULLs are stored as float64 with NaN.
+SNAPSHOT_DIR = os.path.abspath(DB_PATH) + ".snapshot"   # one per database file
+SNAPSHOT_MAX_AGE = 300     # seconds before the pages re-export a snapshot
+KEEP_GENERATIONS = 2       # older generations are deleted; processes still mapping them keep their pages
+NULL_DATE = np.iinfo(np.int32).min
+NULL_EPOCH = np.iinfo(np.int64).min
+
+DATE_COLUMNS = {"Expiry_Date"}
+EPOCH_COLUMNS = {"Timestamp"}
+
+
+def _column_kind(column, dtype):
+    if column in DATE_COLUMNS:
+        return "date"
+    if column in EPOCH_COLUMNS:
+        return "epoch"
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "int"
+    return "dict"
+
+
+def _encode(series, kind):
+    # Returns (array, dictionary or None)
+    if kind == "dict":
+        codes, uniques = pd.factorize(series.astype("string"), sort=True, use_na_sentinel=True)
+        dictionary = np.array(uniques.astype(str), dtype=str) if len(uniques) else np.array([], dtype="<U1")
+        return codes.astype(np.int32), dictionary
+    if kind == "date":
+        days = pd.to_datetime(series, format="%Y-%m-%d", errors="coerce")
+        values = (days - pd.Timestamp("1970-01-01")).dt.days
+        return values.fillna(NULL_DATE).to_numpy(np.int32), None
+    if kind == "epoch":
+        moments = pd.to_datetime(series, format="mixed", errors="coerce")
+        values = (moments - pd.Timestamp("1970-01-01")) // pd.Timedelta(seconds=1)
+        return values.fillna(NULL_EPOCH).to_numpy(np.int64), None
+    if series.isna().any():
+        return series.to_numpy(np.float64, na_value=np.nan), None
+    return series.to_numpy(np.int64), None
+
+
+def export(conn, snapshot_dir=SNAPSHOT_DIR):
+    # Write a new generation from one consistent read of all four tables, then switch CURRENT to it
+    generation = f"{time.time_ns()}-{os.getpid()}"
+    target = os.path.join(snapshot_dir, generation)
+    os.makedirs(target)
+    manifest = {"created_at": time.time(), "tables": {}}
+    conn.execute("BEGIN")
+    try:
+        with track("read", "columnar export") as call:
+            call["rows"] = 0
+            for table in TABLES:
+                df = pd.read_sql_query(f"SELECT * FROM {table} ORDER BY {PRIMARY_KEYS[table]}", conn)
+                call["rows"] += len(df)
+                columns = {}
+                for column in df.columns:
+                    kind = _column_kind(column, df[column].dtype)
+                    values, dictionary = _encode(df[column], kind)
+                    np.save(os.path.join(target, f"{table}.{column}.npy"), values)
+                    if dictionary is not None:
+                        np.save(os.path.join(target, f"{table}.{column}.dict.npy"), dictionary)
+                    columns[column] = kind
+                manifest["tables"][table] = {"rows": len(df), "columns": columns}
+    finally:
+        conn.rollback()
+    with open(os.path.join(target, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    current = os.path.join(snapshot_dir, "CURRENT")
+    with open(current + ".tmp", "w") as f:
+        f.write(generation)
+    os.replace(current + ".tmp", current)
+    generations = sorted(name for name in os.listdir(snapshot_dir) if os.path.isdir(os.path.join(snapshot_dir, name)))
+    for name in generations[:-KEEP_GENERATIONS]:
+        if name != generation:
+            shutil.rmtree(os.path.join(snapshot_dir, name), ignore_errors=True)
+    return generation
+
+
+class Snapshot:
+    # Read-only view of one generation; arrays are np.memmap objects backed by the .npy files
+
+    def __init__(self, path):
+        self.path = path
+        self.generation = os.path.basename(path)
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        self.created_at = self.manifest["created_at"]
+        self._arrays = {}
+        self._positions = {}
+
+    def column(self, table, column):
+        key = (table, column)
+        if key not in self._arrays:
+            self._arrays[key] = np.load(os.path.join(self.path, f"{table}.{column}.npy"), mmap_mode="r")
+        return self._arrays[key]
+
+    def dictionary(self, table, column):
+        key = (table, column, "dict")
+        if key not in self._arrays:
+            self._arrays[key] = np.load(os.path.join(self.path, f"{table}.{column}.dict.npy"), mmap_mode="r")
+        return self._arrays[key]
+
+    def code(self, table, column, value):
+        # Code of a dictionary value, or -2 (matches nothing) when it is absent
+        dictionary = self.dictionary(table, column)
+        position = np.searchsorted(dictionary, value)
+        return int(position) if position < len(dictionary) and dictionary[position] == value else -2
+
+    def decode(self, table, column, values):
+        values = np.asarray(values)
+        kind = self.manifest["tables"][table]["columns"][column]
+        if kind == "dict":
+            labels = np.concatenate([np.array([None], dtype=object), self.dictionary(table, column).astype(object)])
+            return labels[values + 1]
+        if kind == "date":
+            dates = (np.datetime64("1970-01-01") + values.astype("timedelta64[D]")).astype(str).astype(object)
+            dates[values == NULL_DATE] = None
+            return dates
+        if kind == "epoch":
+            missing = values == NULL_EPOCH
+            moments = pd.to_datetime(np.where(missing, 0, values), unit="s").strftime("%Y-%m-%d %H:%M:%S").to_numpy(object)
+            moments[missing] = None
+            return moments
+        return values
+
+    def rows(self, table, keys):
+        # Row positions of primary-key values in `table` (-1 where absent); the export writes rows in key order
+        pk = self.column(table, PRIMARY_KEYS[table])
+        keys = np.asarray(keys)
+        valid = ~np.isnan(keys) if keys.dtype.kind == "f" else np.ones(len(keys), dtype=bool)
+        probe = np.where(valid, keys, 0).astype(pk.dtype)
+        positions = np.minimum(np.searchsorted(pk, probe), max(len(pk) - 1, 0))
+        found = valid & (len(pk) > 0)
+        if len(pk):
+            found &= pk[positions] == probe
+        return np.where(found, positions, -1)
+
+    def join(self, table, column, target):
+        # Row positions in `target` for every row of table.column (cached per snapshot)
+        key = (table, column, target)
+        if key not in self._positions:
+            self._positions[key] = self.rows(target, self.column(table, column))
+        return self._positions[key]
+
+
+_snapshot = None
+
+
+def current_generation(snapshot_dir=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(snapshot_dir, "CURRENT")) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def load(snapshot_dir=SNAPSHOT_DIR):
+    # The current snapshot, re-opened only when another process (or export) switched generations
+    global _snapshot
+    generation = current_generation(snapshot_dir)
+    if generation is None:
+        return None
+    if _snapshot is None or _snapshot.generation != generation:
+        _snapshot = Snapshot(os.path.join(snapshot_dir, generation))
+    return _snapshot
+
+
+def ensure_snapshot(max_age=SNAPSHOT_MAX_AGE, snapshot_dir=SNAPSHOT_DIR):
+    snapshot = load(snapshot_dir)
+    if snapshot is None or time.time() - snapshot.created_at > max_age:
+        with get_pool().reader() as conn:
+            export(conn, snapshot_dir)
+        snapshot = load(snapshot_dir)
+    return snapshot
+
+
+def describe_snapshot(snapshot):
+    return f"Columnar snapshot taken {int(time.time() - snapshot.created_at)}s ago"
+
+
+# Vectorized query engine. Each function takes a Snapshot and returns the same columns as the SQL in
+# queries.py; rows with equal sort keys may come out in a different order than SQLite's.
+
+def _sorted(df, by, limit=None, ascending=False, tie_break=None):
+    # tie_break: a key column that orders tied rows (ascending) like the SQL's ORDER BY; dropped after
+    if tie_break:
+        df = df.sort_values([by, tie_break], ascending=[ascending, True], kind="stable").drop(columns=tie_break)
+    else:
+        df = df.sort_values(by, ascending=ascending, kind="stable")
+    return (df.head(limit) if limit else df).reset_index(drop=True)
+
+
+def _count_by(s, table, column, mask=None, name="Count"):
+    codes = s.column(table, column) if mask is None else s.column(table, column)[mask]
+    counts = np.bincount(codes + 1, minlength=len(s.dictionary(table, column)) + 1)
+    present = np.flatnonzero(counts)
+    return pd.DataFrame({column: s.decode(table, column, present - 1), name: counts[present]})
+
+
+def _claims_food(s):
+    # claims JOIN food_listings: (claim row mask, food row of each matching claim)
+    food_rows = s.join("claims", "Food_ID", "food_listings")
+    mask = food_rows >= 0
+    return mask, food_rows[mask]
+
+
+def _claims_receiver_food(s):
+    # claims JOIN receivers JOIN food_listings
+    food_rows = s.join("claims", "Food_ID", "food_listings")
+    receiver_rows = s.join("claims", "Receiver_ID", "receivers")
+    mask = (food_rows >= 0) & (receiver_rows >= 0)
+    return receiver_rows[mask], food_rows[mask]
+
+
+def _claims_per_listing(s):
+    food_rows = s.join("claims", "Food_ID", "food_listings")
+    return np.bincount(food_rows[food_rows >= 0], minlength=len(s.column("food_listings", "Food_ID")))
+
+
+def _quantity(s):
+    return s.column("food_listings", "Quantity").astype(np.float64)
+
+
+def _group_stats(groups, values, size):
+    # Per-group sum, non-NULL count and row count of values (SQL SUM/AVG/COUNT semantics)
+    notnull = ~np.isnan(values)
+    sums = np.bincount(groups[notnull], weights=values[notnull], minlength=size)
+    counts = np.bincount(groups[notnull], minlength=size)
+    rows = np.bincount(groups, minlength=size)
+    return sums, counts, rows
+
+
+def _as_sql_sum(sums, counts):
+    # SUM of integers is an integer, and NULL when every value is NULL
+    values = pd.array(sums.astype(np.int64), dtype="Int64")
+    values[counts == 0] = pd.NA
+    return values
+
+
+def _city_count(s, table, name, limit=None):
+    return _sorted(_count_by(s, table, "City", name=name), name, limit)
+
+
+def q_providers_in(city):
+    def query(s):
+        mask = s.column("providers", "City") == s.code("providers", "City", city)
+        return pd.DataFrame({column: s.decode("providers", column, s.column("providers", column)[mask])
+                             for column in ["Name", "Contact", "Address"]})
+    return query
+
+
+def q5(s):
+    receiver_rows = s.join("claims", "Receiver_ID", "receivers")
+    counts = np.bincount(receiver_rows[receiver_rows >= 0], minlength=len(s.column("receivers", "Receiver_ID")))
+    present = np.flatnonzero(counts)
+    df = pd.DataFrame({"Name": s.decode("receivers", "Name", s.column("receivers", "Name")[present]),
+                       "Claim_Count": counts[present]})
+    return _sorted(df, "Claim_Count", 8)
+
+
+def q6(s):
+    quantity = _quantity(s)
+    notnull = ~np.isnan(quantity)
+    return pd.DataFrame({"Total_Quantity": [int(quantity[notnull].sum()) if notnull.any() else None]})
+
+
+def q9(s):
+    df = pd.DataFrame({"Food_Name": s.decode("food_listings", "Food_Name", s.column("food_listings", "Food_Name")),
+                       "Claim_Count": _claims_per_listing(s)})
+    return _sorted(df, "Claim_Count")
+
+
+def q10(s):
+    mask, food_rows = _claims_food(s)
+    completed = s.column("claims", "Status")[mask] == s.code("claims", "Status", "Completed")
+    provider_rows = s.join("food_listings", "Provider_ID", "providers")[food_rows[completed]]
+    provider_rows = provider_rows[provider_rows >= 0]
+    counts = np.bincount(provider_rows, minlength=len(s.column("providers", "Provider_ID")))
+    present = np.flatnonzero(counts)
+    df = pd.DataFrame({"Name": s.decode("providers", "Name", s.column("providers", "Name")[present]),
+                       "Completed_Claims": counts[present]})
+    return _sorted(df, "Completed_Claims", 1)
+
+
+def q11(s):
+    df = _count_by(s, "claims", "Status", name="Claim_Count")
+    df["Percentage"] = df["Claim_Count"] * 100.0 / len(s.column("claims", "Claim_ID"))
+    return _sorted(df, "Claim_Count")
+
+
+def _avg_quantity_per_receiver(s, limit=None):
+    receiver_rows, food_rows = _claims_receiver_food(s)
+    sums, counts, rows = _group_stats(receiver_rows, _quantity(s)[food_rows], len(s.column("receivers", "Receiver_ID")))
+    present = np.flatnonzero(rows)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        averages = np.where(counts[present] > 0, sums[present] / counts[present], np.nan)
+    df = pd.DataFrame({"Name": s.decode("receivers", "Name", s.column("receivers", "Name")[present]),
+                       "Avg_Quantity_Claimed": averages})
+    return _sorted(df, "Avg_Quantity_Claimed", limit)
+
+
+def _claims_by_listing_column(s, column, limit=None):
+    mask, food_rows = _claims_food(s)
+    codes = s.column("food_listings", column)[food_rows]
+    counts = np.bincount(codes + 1, minlength=len(s.dictionary("food_listings", column)) + 1)
+    present = np.flatnonzero(counts)
+    df = pd.DataFrame({column: s.decode("food_listings", column, present - 1), "Claim_Count": counts[present]})
+    return _sorted(df, "Claim_Count", limit)
+
+
+def _provider_quantity(s, aggregate, name, limit=None):
+    provider_rows = s.join("food_listings", "Provider_ID", "providers")
+    mask = provider_rows >= 0
+    sums, counts, rows = _group_stats(provider_rows[mask], _quantity(s)[mask], len(s.column("providers", "Provider_ID")))
+    present = np.flatnonzero(rows)
+    if aggregate == "sum":
+        values = _as_sql_sum(sums[present], counts[present])
+    else:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = np.where(counts[present] > 0, sums[present] / counts[present], np.nan)
+    df = pd.DataFrame({"Name": s.decode("providers", "Name", s.column("providers", "Name")[present]), name: values})
+    return _sorted(df, name, limit)
+
+
+def q15(s):
+    unclaimed = _claims_per_listing(s) == 0
+    provider_rows = s.join("food_listings", "Provider_ID", "providers")[unclaimed]
+    present = np.unique(provider_rows[provider_rows >= 0])
+    return pd.DataFrame({"Name": s.decode("providers", "Name", s.column("providers", "Name")[present])})
+
+
+def q16(s):
+    claimed = s.column("claims", "Receiver_ID")
+    # NOT IN over a list containing NULL matches nothing
+    if claimed.dtype.kind == "f" and np.isnan(claimed).any():
+        return pd.DataFrame({"Name": pd.Series([], dtype=object)})
+    mask = ~np.isin(s.column("receivers", "Receiver_ID"), claimed)
+    return pd.DataFrame({"Name": s.decode("receivers", "Name", s.column("receivers", "Name")[mask])})
+
+
+def q17(s):
+    mask, food_rows = _claims_food(s)
+    df = pd.DataFrame({"Meal_Type": s.column("food_listings", "Meal_Type")[food_rows],
+                       "Status": s.column("claims", "Status")[mask]})
+    df = df.groupby(["Meal_Type", "Status"], sort=False).size().reset_index(name="Claim_Count")
+    df["Meal_Type"] = s.decode("food_listings", "Meal_Type", df["Meal_Type"].to_numpy())
+    df["Status"] = s.decode("claims", "Status", df["Status"].to_numpy())
+    return _sorted(df, "Claim_Count")
+
+
+def _unclaimed(s, columns):
+    rows = np.flatnonzero(_claims_per_listing(s) == 0)
+    return pd.DataFrame({column: s.decode("food_listings", column, s.column("food_listings", column)[rows])
+                         for column in columns})
+
+
+def _receivers_per_city_by_meal(s, meals):
+    receiver_rows, food_rows = _claims_receiver_food(s)
+    cities = s.column("receivers", "City")
+    n_cities = len(s.dictionary("receivers", "City")) + 1
+    groups = np.unique(cities[receiver_rows] + 1)
+    df = pd.DataFrame({"City": s.decode("receivers", "City", groups - 1)})
+    meal_codes = s.column("food_listings", "Meal_Type")[food_rows]
+    for meal in meals:
+        receivers = np.unique(receiver_rows[meal_codes == s.code("food_listings", "Meal_Type", meal)])
+        df[f"{meal}_Receivers"] = np.bincount(cities[receivers] + 1, minlength=n_cities)[groups]
+    return df
+
+
+def q19(s):
+    meals = ["Breakfast", "Lunch", "Dinner", "Snacks"]
+    return _sorted(_receivers_per_city_by_meal(s, meals), [f"{meal}_Receivers" for meal in meals])
+
+
+def q20(s):
+    receiver_rows, food_rows = _claims_receiver_food(s)
+    df = pd.DataFrame({"Type": s.column("receivers", "Type")[receiver_rows],
+                       "Food_Type": s.column("food_listings", "Food_Type")[food_rows],
+                       "Total_Quantity": _quantity(s)[food_rows]})
+    df = df.groupby(["Type", "Food_Type"], sort=False)["Total_Quantity"].sum(min_count=1).reset_index()
+    df["Type"] = s.decode("receivers", "Type", df["Type"].to_numpy())
+    df["Food_Type"] = s.decode("food_listings", "Food_Type", df["Food_Type"].to_numpy())
+    df["Total_Quantity"] = df["Total_Quantity"].astype("Int64")
+    return _sorted(df, "Total_Quantity", 1)
+
+
+def q21(s):
+    receiver_rows, food_rows = _claims_receiver_food(s)
+    df = pd.DataFrame({"Receiver": receiver_rows,
+                       "Food_Type": s.column("food_listings", "Food_Type")[food_rows],
+                       "Meal_Type": s.column("food_listings", "Meal_Type")[food_rows]})
+    df = df.groupby(["Receiver", "Food_Type", "Meal_Type"], sort=False).size().reset_index(name="Claim_Count")
+    return _sorted(pd.DataFrame({
+        "Name": s.decode("receivers", "Name", s.column("receivers", "Name")[df["Receiver"].to_numpy()]),
+        "Food_Type": s.decode("food_listings", "Food_Type", df["Food_Type"].to_numpy()),
+        "Meal_Type": s.decode("food_listings", "Meal_Type", df["Meal_Type"].to_numpy()),
+        "Claim_Count": df["Claim_Count"].to_numpy(),
+    }), "Claim_Count")
+
+
+def q24(s):
+    # LEFT JOIN repeats a listing once per claim (and keeps it once when it has none)
+    claims = _claims_per_listing(s)
+    quantity = _quantity(s)
+    df = pd.DataFrame({"Food_Type": s.column("food_listings", "Food_Type"),
+                       "Total_Quantity": quantity * np.maximum(claims, 1),
+                       "Claimed_Quantity": np.where(np.isnan(quantity), 0, quantity) * claims})
+    df = df.groupby("Food_Type", sort=True).agg(Total_Quantity=("Total_Quantity", lambda v: v.sum(min_count=1)),
+                                                Claimed_Quantity=("Claimed_Quantity", "sum")).reset_index()
+    return pd.DataFrame({
+        "Food_Type": s.decode("food_listings", "Food_Type", df["Food_Type"].to_numpy()),
+        "Total_Quantity": df["Total_Quantity"].astype("Int64"),
+        "Claimed_Percentage": df["Claimed_Quantity"] * 100.0 / df["Total_Quantity"],
+    })
+
+
+# Query name (from queries.py) -> vectorized implementation
+COLUMNAR_QUERIES = {
+    "Q1: Providers per city": lambda s: _city_count(s, "providers", "Provider_Count"),
+    "Q2: Receivers per city": lambda s: _city_count(s, "receivers", "Receiver_Count"),
+    "Q3: Top 3 provider types by listings": lambda s: _sorted(
+        _count_by(s, "food_listings", "Provider_Type", name="Listing_Count"), "Listing_Count", 3),
+    "Q4_1: Providers in New Jessica": q_providers_in("New Jessica"),
+    "Q4_2: Providers in Mendezmouth": q_providers_in("Mendezmouth"),
+    "Q5: Top 8 receivers by claims": q5,
+    "Q6: Total food quantity": q6,
+    "Q7: City with most listings": lambda s: _sorted(
+        _count_by(s, "food_listings", "Location", name="Listing_Count"), "Listing_Count", 1),
+    "Q8: Most common food types": lambda s: _sorted(
+        _count_by(s, "food_listings", "Food_Type", name="Listing_Count"), "Listing_Count"),
+    "Q9: Claims per food item": q9,
+    "Q10: Top provider by completed claims": q10,
+    "Q11: Claim status percentages": q11,
+    "Q12: Avg quantity claimed per receiver": _avg_quantity_per_receiver,
+    "Q13: Most claimed meal type": lambda s: _claims_by_listing_column(s, "Meal_Type", 1),
+    "Q14: Total quantity donated by provider": lambda s: _provider_quantity(s, "sum", "Total_Donated"),
+    "Q15: Providers with no claims": q15,
+    "Q16: Receivers with no claims": q16,
+    "Q17: Claims by meal type and status": q17,
+    "Q18: Unclaimed food listings": lambda s: _unclaimed(s, ["Food_Name", "Quantity", "Expiry_Date"]),
+    "Q19: Receivers per city by meal type": q19,
+    "Q20: Receiver type with most food": q20,
+    "Q21: Receivers by food and meal type": q21,
+    "Q22: Claims by city": lambda s: _claims_by_listing_column(s, "Location"),
+    "Q23: Providers with highest avg quantity": lambda s: _provider_quantity(s, "avg", "Avg_Quantity", 5),
+    "Q24: Percentage of quantity claimed per food type": q24,
+    "Providers per City (Top 10)": lambda s: _city_count(s, "providers", "Provider_Count"),
+    "Claim Status Distribution": q11,
+    "Total Quantity Donated by Provider (Top 5)": lambda s: _provider_quantity(s, "sum", "Total_Donated", 5),
+    "Avg Quantity Claimed per Receiver (Top 5)": lambda s: _avg_quantity_per_receiver(s, 5),
+    "Claims by City (Top 10)": lambda s: _claims_by_listing_column(s, "Location", 10),
+    "Most Common Food Types (Top 5)": lambda s: _sorted(
+        _count_by(s, "food_listings", "Food_Type", name="Listing_Count"), "Listing_Count", 5),
+    "Providers with Highest Avg Quantity (Top 5)": lambda s: _provider_quantity(s, "avg", "Avg_Quantity", 5),
+    "Claims by Meal Type (Top 5)": lambda s: _claims_by_listing_column(s, "Meal_Type", 5),
+    "Unclaimed Food Listings by Quantity (Top 5)": lambda s: _sorted(
+        _unclaimed(s, ["Food_ID", "Food_Name", "Quantity"]), "Quantity", 5, tie_break="Food_ID"),
+    "Receivers per City by Breakfast Claims (Top 5)": lambda s: _sorted(
+        _receivers_per_city_by_meal(s, ["Breakfast"]), "Breakfast_Receivers", 5),
+}
+
+
+def has_columnar(name):
+    return name in COLUMNAR_QUERIES
+
+
+def run_columnar(name, snapshot=None):
+    snapshot = snapshot or ensure_snapshot()
+    with track("columnar", name) as call:
+        call["result"] = COLUMNAR_QUERIES[name](snapshot)
+    return call["result"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar snapshot of the food wastage database")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("export", help="write a new snapshot generation")
+    sub.add_parser("status", help="show the current snapshot")
+    query_parser = sub.add_parser("query", help="answer a predefined query from the snapshot")
+    query_parser.add_argument("name", help='e.g. "Q22: Claims by city"')
+    args = parser.parse_args()
+
+    if args.command == "export":
+        with get_pool().reader() as conn:
+            started = time.perf_counter()
+            generation = export(conn)
+        print(f"Wrote snapshot {generation} in {time.perf_counter() - started:.2f}s")
+    elif args.command == "status":
+        snapshot = load()
+        if snapshot is None:
+            print("No snapshot yet; run `python columnar.py export`")
+            return
+        print(describe_snapshot(snapshot))
+        for table, info in snapshot.manifest["tables"].items():
+            encodings = ", ".join(f"{column}:{kind}" for column, kind in info["columns"].items())
+            print(f"  {table}: {info['rows']} rows ({encodings})")
+    else:
+        print(run_columnar(args.name).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+from archive import attach_archive, ensure_archive
+from database import ARCHIVE_PATH, DB_PATH
+
+# Connection tuning
+READ_POOL_SIZE = 8
+CHECKOUT_TIMEOUT = 30          # seconds a reader waits for a free connection
+BUSY_TIMEOUT_MS = 5000         # how long SQLite retries on a locked database
+CACHE_SIZE_KIB = 32 * 1024     # page cache per connection
+MMAP_SIZE = 256 * 1024 * 1024  # memory-mapped I/O per connection
+STATEMENT_CACHE_SIZE = 256     # prepared statements kept per connection, keyed by SQL text
+PROGRESS_STEPS = 10000         # SQLite VM instructions between timeout/cancel checks
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    pass
+
+
+class ConnectionPool:
+    # A bounded pool of read-only connections plus one serialized writer connection.
+    # The database runs in WAL mode so readers never block on the writer and vice versa.
+
+    def __init__(self, db_path=DB_PATH, size=READ_POOL_SIZE, busy_timeout_ms=BUSY_TIMEOUT_MS,
+                 cache_size_kib=CACHE_SIZE_KIB, mmap_size=MMAP_SIZE, archive_path=ARCHIVE_PATH):
+        self.db_path = db_path
+        self.archive_path = archive_path
+        self.size = size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._write_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "read_checkouts": 0,
+            "read_wait_seconds": 0.0,
+            "read_max_wait_seconds": 0.0,
+            "read_in_use": 0,
+            "read_connections": 0,
+            "write_checkouts": 0,
+            "write_wait_seconds": 0.0,
+            "write_max_wait_seconds": 0.0,
+            "write_in_use": 0,
+        }
+        # The writer is opened first so WAL mode is set before any reader attaches
+        self._writer = self._connect(read_only=False)
+        # Readers attach the archive database (see archive.py), so it must exist before the first one
+        ensure_archive(self.archive_path)
+
+    def _connect(self, read_only):
+        if read_only:
+            uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                                   timeout=self.busy_timeout_ms / 1000, cached_statements=STATEMENT_CACHE_SIZE)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                   timeout=self.busy_timeout_ms / 1000, cached_statements=STATEMENT_CACHE_SIZE)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kib)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        if read_only:
+            attach_archive(conn, self.archive_path)
+        return conn
+
+    def _record(self, kind, waited):
+        with self._metrics_lock:
+            self._metrics[f"{kind}_checkouts"] += 1
+            self._metrics[f"{kind}_wait_seconds"] += waited
+            self._metrics[f"{kind}_max_wait_seconds"] = max(self._metrics[f"{kind}_max_wait_seconds"], waited)
+            self._metrics[f"{kind}_in_use"] += 1
+
+    def _release_slot(self, kind):
+        with self._metrics_lock:
+            self._metrics[f"{kind}_in_use"] -= 1
+
+    @contextmanager
+    def reader(self, timeout=CHECKOUT_TIMEOUT):
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolTimeout(f"No read connection free after {timeout}s ({self.size} in use)")
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                conn = self._connect(read_only=True)
+            except sqlite3.Error:
+                self._slots.release()
+                raise
+            with self._metrics_lock:
+                self._metrics["read_connections"] += 1
+        self._record("read", time.perf_counter() - started)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+            self._release_slot("read")
+            self._slots.release()
+
+    @contextmanager
+    def writer(self):
+        started = time.perf_counter()
+        with self._write_lock:
+            self._record("write", time.perf_counter() - started)
+            try:
+                yield self._writer
+            except BaseException:
+                if self._writer.in_transaction:
+                    self._writer.rollback()
+                raise
+            finally:
+                self._release_slot("write")
+
+    def metrics(self):
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        metrics["read_pool_size"] = self.size
+        metrics["read_avg_wait_seconds"] = (
+            metrics["read_wait_seconds"] / metrics["read_checkouts"] if metrics["read_checkouts"] else 0.0)
+        return metrics
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._write_lock:
+            self._writer.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    # One pool per process, shared by every Streamlit session and rerun
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
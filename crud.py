@@ -0,0 +1,375 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+from change_notifications import get_notifier
+from connection_pool import PROGRESS_STEPS, get_pool
+from database import PRIMARY_KEYS
+from instrumentation import track
+from query_builder import In, check_columns, where_clause
+from query_cache import get_cache, referenced_tables, register_derived_table
+
+# Callbacks run after every committed write as hook(table, action, rows): action is "insert",
+# "update" or "delete" and rows are dicts of the written rows (old values for deletes)
+_write_hooks = []
+
+
+def register_write_hook(hook):
+    _write_hooks.append(hook)
+
+
+def notify_write(table, action, rows):
+    get_cache().bump(table)
+    # Publish the new table version to the auto-refreshing widgets now rather than at the next poll.
+    # The poll also takes in commits by other processes since the last one, so their tables are evicted too.
+    others = set(get_notifier().poll(bump_cache=False)) - {table}
+    if others:
+        get_cache().bump(*others)
+    for hook in _write_hooks:
+        hook(table, action, rows)
+
+
+def _returned_rows(cursor):
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+# Deadline for reads on the current thread, set with read_deadline() (used by parallel_queries workers)
+_deadline = threading.local()
+
+
+@contextmanager
+def read_deadline(seconds):
+    # Reads started on this thread inside the block are interrupted by SQLite once `seconds` have passed
+    previous = getattr(_deadline, "at", None)
+    _deadline.at = time.perf_counter() + seconds
+    try:
+        yield
+    finally:
+        _deadline.at = previous
+
+
+def _read_sql(conn, query, params):
+    deadline = getattr(_deadline, "at", None)
+    if deadline is None:
+        return pd.read_sql_query(query, conn, params=params)
+    conn.set_progress_handler(lambda: time.perf_counter() > deadline, PROGRESS_STEPS)
+    try:
+        return pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.set_progress_handler(None, PROGRESS_STEPS)
+
+
+def run_query(query, params=None, cache=True):
+    # Read-only query on a pooled reader connection, served from the shared result cache when possible
+    with track("read", query, params) as call:
+        if not cache:
+            with get_pool().reader() as conn:
+                call["result"] = _read_sql(conn, query, params)
+            return call["result"]
+        query_cache = get_cache()
+        key = query_cache.make_key(query, params)
+        df = query_cache.get(key)
+        call["cached"] = df is not None
+        if df is None:
+            versions = query_cache.versions(referenced_tables(query))
+            with get_pool().reader() as conn:
+                df = _read_sql(conn, query, params)
+            query_cache.put(key, df, versions)
+        call["result"] = df
+        return df.copy(deep=False)
+
+
+# CRUD Functions
+def create_record(table, data):
+    try:
+        check_columns(table, data.keys())
+    except ValueError as e:
+        st.error(f"Error creating record: {e}")
+        return False
+    columns = ', '.join(data.keys())
+    placeholders = ', '.join(['?'] * len(data))
+    query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders}) RETURNING *"
+    try:
+        with track("write", query, tuple(data.values())) as call, get_pool().writer() as conn:
+            cursor = conn.execute(query, tuple(data.values()))
+            rows = call["result"] = _returned_rows(cursor)
+            conn.commit()
+        notify_write(table, "insert", rows)
+        st.success(f"New record inserted into {table}!")
+        if rows:
+            st.text(f"New Record: {tuple(rows[0].values())}")
+        return True
+    except sqlite3.Error as e:
+        st.error(f"Error creating record: {e}")
+        return False
+
+def read_records(table, predicates=None):
+    # predicates is a list of query_builder predicates, ANDed together
+    try:
+        condition, params = where_clause(table, predicates)
+        query = f"SELECT * FROM {table}"
+        if condition:
+            query += f" WHERE {condition}"
+        df = run_query(query, params)
+        return df
+    except (sqlite3.Error, pd.errors.DatabaseError, ValueError) as e:
+        st.error(f"Error reading {table}: {e}")
+        return pd.DataFrame()
+
+def rows_by_key(table, keys, columns="*", predicates=()):
+    # The current rows for these primary keys that match the predicates; deleted rows are simply absent
+    where, params = where_clause(table, [In(PRIMARY_KEYS[table], keys), *predicates])
+    return run_query(f"SELECT {columns} FROM {table} WHERE {where}", params, cache=False)
+
+def update_record(table, updates, predicates):
+    try:
+        check_columns(table, updates.keys())
+        condition, params = where_clause(table, predicates)
+        if not condition:
+            raise ValueError("refusing to update without a filter")
+    except ValueError as e:
+        st.error(f"Error updating {table}: {e}")
+        return False
+    set_clause = ', '.join([f"{col} = ?" for col in updates.keys()])
+    query = f"UPDATE {table} SET {set_clause} WHERE {condition} RETURNING *"
+    try:
+        with track("write", query, (*updates.values(), *params)) as call, get_pool().writer() as conn:
+            rows = call["result"] = _returned_rows(conn.execute(query, (*updates.values(), *params)))
+            conn.commit()
+        notify_write(table, "update", rows)
+        st.success(f"Record(s) updated in {table}!")
+        return True
+    except sqlite3.Error as e:
+        st.error(f"Error updating {table}: {e}")
+        return False
+
+def delete_record(table, predicates):
+    try:
+        condition, params = where_clause(table, predicates)
+        if not condition:
+            raise ValueError("refusing to delete without a filter")
+    except ValueError as e:
+        st.error(f"Error deleting from {table}: {e}")
+        return False
+    query = f"DELETE FROM {table} WHERE {condition} RETURNING *"
+    try:
+        with track("write", query, params) as call, get_pool().writer() as conn:
+            rows = call["result"] = _returned_rows(conn.execute(query, params))
+            conn.commit()
+        notify_write(table, "delete", rows)
+        st.success(f"Record(s) deleted from {table}!")
+        return True
+    except sqlite3.Error as e:
+        st.error(f"Error deleting from {table}: {e}")
+        return False
+
+
+# Batch operations: one transaction per batch, journaled so the whole batch can be undone.
+# They raise ValueError / sqlite3.Error instead of reporting to the page.
+BATCH_CHUNK = 500   # rows per multi-row statement, well under SQLite's bound-parameter limit
+
+register_derived_table("undo_batches", ["undo_batches"])
+
+
+def _chunks(items, size=BATCH_CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _check_batch(table, rows, required=()):
+    if not rows:
+        raise ValueError("the batch is empty")
+    columns = list(rows[0].keys())
+    check_columns(table, columns)
+    for column in required:
+        if column not in columns:
+            raise ValueError(f"the batch needs a {column} column")
+    if any(list(row.keys()) != columns for row in rows):
+        raise ValueError("every row in the batch must have the same columns")
+    return columns
+
+
+def _unique_keys(table, keys):
+    if len(set(keys)) != len(keys):
+        raise ValueError(f"duplicate {PRIMARY_KEYS[table]} values in the batch")
+    if any(key is None for key in keys):
+        raise ValueError(f"every row needs a {PRIMARY_KEYS[table]}")
+    return keys
+
+
+def _journal(conn, table, action, entries):
+    # entries: (row key, old row dict or None)
+    batch_id = conn.execute(
+        "INSERT INTO undo_batches (Table_Name, Action, Row_Count) VALUES (?, ?, ?)",
+        (table, action, len(entries))).lastrowid
+    conn.executemany(
+        "INSERT INTO undo_journal (Batch_ID, Row_Key, Old_Row) VALUES (?, ?, ?)",
+        [(batch_id, key, None if old is None else json.dumps(old)) for key, old in entries])
+    return batch_id
+
+
+def assign_keys(conn, table, rows):
+    # Give rows without a primary key the next free ones (max + 1, as SQLite would, but also above any
+    # archived key; see archive.py) before inserting. RETURNING cannot report keys SQLite picks when
+    # the insert goes through a view (see normalize.py).
+    pk = PRIMARY_KEYS[table]
+    given = [row[pk] for row in rows if row.get(pk) is not None]
+    if len(given) == len(rows):
+        return rows
+    stored = conn.execute(f"""SELECT MAX(COALESCE((SELECT MAX({pk}) FROM {table}), 0),
+        COALESCE((SELECT Max_Key FROM key_floors WHERE Table_Name = ?), 0))""", (table,)).fetchone()[0]
+    next_key = max([stored, *given]) + 1
+    keyed = []
+    for row in rows:
+        if row.get(pk) is None:
+            row = {**row, pk: next_key}
+            next_key += 1
+        keyed.append(row)
+    return keyed
+
+
+def _insert_rows(conn, table, columns, rows):
+    returned = []
+    for chunk in _chunks(rows, max(1, BATCH_CHUNK // len(columns))):
+        values = ", ".join([f"({', '.join(['?'] * len(columns))})"] * len(chunk))
+        params = [row[column] for row in chunk for column in columns]
+        returned += _returned_rows(conn.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES {values} RETURNING *", params))
+    return returned
+
+
+def _select_keys(conn, table, keys):
+    pk = PRIMARY_KEYS[table]
+    found = []
+    for chunk in _chunks(keys):
+        found += _returned_rows(conn.execute(
+            f"SELECT * FROM {table} WHERE {pk} IN ({', '.join(['?'] * len(chunk))})", chunk))
+    return found
+
+
+def _run_batch(table, action, work):
+    # work(conn) -> (returned rows, journal entries); commits once and notifies after the commit
+    with track("write", f"batch {action} {table}") as call, get_pool().writer() as conn:
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows, entries = work(conn)
+            call["rows"] = len(rows)
+            batch_id = _journal(conn, table, action, entries)
+            conn.commit()
+        except (sqlite3.Error, ValueError):
+            conn.rollback()
+            raise
+    get_cache().bump("undo_batches")
+    notify_write(table, action, rows)
+    return batch_id, rows
+
+
+def create_records(table, rows):
+    _check_batch(table, rows)
+
+    def work(conn):
+        keyed = assign_keys(conn, table, rows)
+        inserted = _insert_rows(conn, table, list(keyed[0]), keyed)
+        return inserted, [(row[PRIMARY_KEYS[table]], None) for row in inserted]
+    return _run_batch(table, "insert", work)
+
+
+def update_records(table, rows):
+    # rows: dicts holding the primary key plus the columns to change (which may differ per batch, not per row)
+    pk = PRIMARY_KEYS[table]
+    columns = _check_batch(table, rows, required=[pk])
+    keys = _unique_keys(table, [row[pk] for row in rows])
+    changed = [column for column in columns if column != pk]
+    if not changed:
+        raise ValueError("the batch has no columns to update")
+
+    def work(conn):
+        old_rows = {row[pk]: row for row in _select_keys(conn, table, keys)}
+        missing = [key for key in keys if key not in old_rows]
+        if missing:
+            raise ValueError(f"{len(missing)} {pk} value(s) not found, e.g. {missing[0]}")
+        conn.executemany(
+            f"UPDATE {table} SET {', '.join(f'{column} = ?' for column in changed)} WHERE {pk} = ?",
+            [[row[column] for column in changed] + [row[pk]] for row in rows])
+        new_rows = [{**old_rows[row[pk]], **row} for row in rows]
+        return new_rows, [(key, old_rows[key]) for key in keys]
+    return _run_batch(table, "update", work)
+
+
+def update_records_by_id(table, updates, keys):
+    # Same values for every listed key, e.g. marking thousands of claims Completed
+    pk = PRIMARY_KEYS[table]
+    return update_records(table, [{pk: key, **updates} for key in keys])
+
+
+def delete_records(table, keys):
+    pk = PRIMARY_KEYS[table]
+    keys = _unique_keys(table, list(keys))
+    if not keys:
+        raise ValueError("the batch is empty")
+
+    def work(conn):
+        deleted = []
+        for chunk in _chunks(keys):
+            deleted += _returned_rows(conn.execute(
+                f"DELETE FROM {table} WHERE {pk} IN ({', '.join(['?'] * len(chunk))}) RETURNING *", chunk))
+        return deleted, [(row[pk], row) for row in deleted]
+    return _run_batch(table, "delete", work)
+
+
+def recent_batches(limit=20):
+    return run_query('''
+        SELECT Batch_ID, Table_Name, Action, Row_Count, Created_At, Undone_At
+        FROM undo_batches
+        ORDER BY Batch_ID DESC
+        LIMIT ?
+    ''', (limit,))
+
+
+def undo_batch(batch_id):
+    # Put back every row a batch touched: inserted rows are deleted, updated rows get their old
+    # values, deleted rows are re-inserted. Later edits to the same rows are overwritten.
+    with track("write", "undo batch", (batch_id,)) as call, get_pool().writer() as conn:
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            batch = conn.execute(
+                "SELECT Table_Name, Action, Undone_At FROM undo_batches WHERE Batch_ID = ?", (batch_id,)).fetchone()
+            if batch is None:
+                raise ValueError(f"no batch {batch_id}")
+            table, action, undone_at = batch
+            if undone_at is not None:
+                raise ValueError(f"batch {batch_id} was already undone at {undone_at}")
+            pk = PRIMARY_KEYS[table]
+            entries = conn.execute(
+                "SELECT Row_Key, Old_Row FROM undo_journal WHERE Batch_ID = ?", (batch_id,)).fetchall()
+            old_rows = [json.loads(old) for _, old in entries if old is not None]
+            if action == "insert":
+                undo_action, rows = "delete", []
+                for chunk in _chunks([key for key, _ in entries]):
+                    rows += _returned_rows(conn.execute(
+                        f"DELETE FROM {table} WHERE {pk} IN ({', '.join(['?'] * len(chunk))}) RETURNING *", chunk))
+            elif action == "update":
+                undo_action, rows = "update", old_rows
+                if old_rows:
+                    columns = [column for column in old_rows[0] if column != pk]
+                    conn.executemany(
+                        f"UPDATE {table} SET {', '.join(f'{column} = ?' for column in columns)} WHERE {pk} = ?",
+                        [[row[column] for column in columns] + [row[pk]] for row in old_rows])
+            else:
+                undo_action = "insert"
+                rows = _insert_rows(conn, table, list(old_rows[0]), old_rows) if old_rows else []
+            conn.execute("UPDATE undo_batches SET Undone_At = datetime('now') WHERE Batch_ID = ?", (batch_id,))
+            conn.commit()
+            call["rows"] = len(rows)
+        except (sqlite3.Error, ValueError):
+            conn.rollback()
+            raise
+    get_cache().bump("undo_batches")
+    notify_write(table, undo_action, rows)
+    return len(rows)
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from change_notifications import delta
+from crud import rows_by_key, run_query
+from database import TABLES
+from queries import RECENT_CLAIMS_LIMIT, RECENT_CLAIMS_QUERY
+from query_cache import register_derived_table
+
+# Summary tables maintained by the triggers from migration 2
+register_derived_table("dashboard_summary", TABLES)
+register_derived_table("dashboard_daily_claims", ["claims"])
+
+
+def summary_metrics():
+    df = run_query("SELECT Metric, Value FROM dashboard_summary")
+    return dict(zip(df["Metric"], df["Value"]))
+
+
+def claims_by_status(day=None):
+    day = day or datetime.now().strftime("%Y-%m-%d")
+    return run_query('''
+        SELECT Status, Claim_Count
+        FROM dashboard_daily_claims
+        WHERE Day = ? AND Claim_Count > 0
+        ORDER BY Claim_Count DESC
+    ''', (day,))
+
+
+def expiring_listings(hours=24, now=None):
+    # Expiry_Date is a plain YYYY-MM-DD date, taken to mean the end of that day: a listing expires
+    # within the window when its day ends by now + hours (for 24 hours, the listings expiring today)
+    now = now or datetime.now()
+    start = now.strftime("%Y-%m-%d")
+    end = (now + timedelta(hours=hours) - timedelta(days=1)).strftime("%Y-%m-%d")
+    return run_query('''
+        SELECT COUNT(*) as Listing_Count, COALESCE(SUM(Quantity), 0) as Total_Quantity
+        FROM food_listings
+        WHERE Expiry_Date BETWEEN ? AND ?
+    ''', (start, end))
+
+
+def merge_top(df, rows, keys, key_column, sort_column, limit, descending=True):
+    # Apply the changed rows (by key) to a "first `limit` rows by sort_column" result. Only the rows up
+    # to the old last sort value were read, so the merge stands only if the new first `limit` rows all
+    # lie within that range; None means read the result again.
+    merged = pd.concat([df[~df[key_column].isin(keys)], rows], ignore_index=True)
+    merged = merged.sort_values(sort_column, ascending=not descending, kind="stable")
+    if len(df) >= limit:
+        boundary = df[sort_column].min() if descending else df[sort_column].max()
+        merged = merged[merged[sort_column] >= boundary if descending else merged[sort_column] <= boundary]
+        if len(merged) < limit:
+            return None
+    return merged.head(limit).reset_index(drop=True)
+
+
+def refresh_recent_claims(df, since):
+    # Bring the Recent Claims rows read at version `since` up to date: (version, rows). Only the changed
+    # claims are fetched, by Claim_ID; the query runs again only when the merge cannot stand.
+    version, keys = delta("claims", since)
+    if not keys:
+        return version, df if keys == [] else run_query(RECENT_CLAIMS_QUERY)
+    merged = merge_top(df, rows_by_key("claims", keys), keys, "Claim_ID", "Timestamp", RECENT_CLAIMS_LIMIT)
+    return version, merged if merged is not None else run_query(RECENT_CLAIMS_QUERY)
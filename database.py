@@ -0,0 +1,65 @@
+# Shared database settings for the app and its command-line tools
+
+import os
+
+# FOOD_WASTAGE_DB points the app and tools at another database (e.g. a benchmark copy)
+DB_PATH = os.environ.get('FOOD_WASTAGE_DB', 'food_wastage_system (1).db')
+# Cold rows moved out of food_listings and claims (see archive.py); defaults to a file next to DB_PATH
+ARCHIVE_PATH = os.environ.get('FOOD_WASTAGE_ARCHIVE_DB', os.path.splitext(DB_PATH)[0] + '_archive.db')
+# Directory of a per-region sharded layout (see sharding.py); unset means single-file mode
+SHARD_DIR = os.environ.get('FOOD_WASTAGE_SHARDS')
+
+TABLES = ["providers", "receivers", "food_listings", "claims"]
+
+PRIMARY_KEYS = {
+    "providers": "Provider_ID",
+    "receivers": "Receiver_ID",
+    "food_listings": "Food_ID",
+    "claims": "Claim_ID",
+}
+
+# Base schema, as created by the notebook; used to set up new databases
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS providers (
+        Provider_ID INTEGER PRIMARY KEY,
+        Name TEXT,
+        Type TEXT,
+        Address TEXT,
+        City TEXT,
+        Contact TEXT
+    )''',
+    '''CREATE TABLE IF NOT EXISTS receivers (
+        Receiver_ID INTEGER PRIMARY KEY,
+        Name TEXT,
+        Type TEXT,
+        City TEXT,
+        Contact TEXT
+    )''',
+    '''CREATE TABLE IF NOT EXISTS food_listings (
+        Food_ID INTEGER PRIMARY KEY,
+        Food_Name TEXT,
+        Quantity INTEGER,
+        Expiry_Date TEXT,
+        Provider_ID INTEGER,
+        Provider_Type TEXT,
+        Location TEXT,
+        Food_Type TEXT,
+        Meal_Type TEXT,
+        FOREIGN KEY (Provider_ID) REFERENCES providers(Provider_ID)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS claims (
+        Claim_ID INTEGER PRIMARY KEY,
+        Food_ID INTEGER,
+        Receiver_ID INTEGER,
+        Status TEXT,
+        Timestamp TEXT,
+        FOREIGN KEY (Food_ID) REFERENCES food_listings(Food_ID),
+        FOREIGN KEY (Receiver_ID) REFERENCES receivers(Receiver_ID)
+    )''',
+]
+
+
+def create_schema(conn):
+    for statement in SCHEMA:
+        conn.execute(statement)
+    conn.commit()
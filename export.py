@@ -0,0 +1,264 @@
+import argparse
+import csv
+import gzip
+import importlib.util
+import io
+import os
+import re
+import sqlite3
+import tempfile
+import time
+from functools import partial
+
+import streamlit as st
+
+from connection_pool import PROGRESS_STEPS
+from database import DB_PATH
+from instrumentation import record
+from materialized import LIVE, named_query_sql
+from parallel_queries import MAX_PARALLEL_QUERIES, ParallelQueries
+from queries import PREDEFINED_QUERIES
+from query_cache import normalize_sql
+from sandbox import open_read_only
+
+# Streaming export: rows are fetched in batches and written straight to the output, so memory use
+# stays the same whatever the result size
+EXPORT_BATCH = 5000            # rows per fetchmany call
+ARTIFACT_DIR = "sql_queries"
+
+# Format name -> (file extension, MIME type)
+FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "CSV (gzip)": (".csv.gz", "application/gzip"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+# The CSVs in sql_queries/, first written by the notebook; Q12 never had one
+SQL_QUERY_FILES = {
+    "Q1: Providers per city": "query1_providers_per_city.csv",
+    "Q2: Receivers per city": "query2_receivers_per_city.csv",
+    "Q3: Top 3 provider types by listings": "query3_top_provider_type.csv",
+    "Q4_1: Providers in New Jessica": "query4_1_providers_new_jessica.csv",
+    "Q4_2: Providers in Mendezmouth": "query4_2_providers_mendezmouth.csv",
+    "Q5: Top 8 receivers by claims": "query5_top_receivers_claims.csv",
+    "Q6: Total food quantity": "query6_total_food_quantity.csv",
+    "Q7: City with most listings": "query7_city_most_listings.csv",
+    "Q8: Most common food types": "query8_common_food_types.csv",
+    "Q9: Claims per food item": "query9_claims_per_food_item.csv",
+    "Q10: Top provider by completed claims": "query10_top_provider_completed_claims.csv",
+    "Q11: Claim status percentages": "query11_claim_status_percentage.csv",
+    "Q13: Most claimed meal type": "query13_most_claimed_meal_type.csv",
+    "Q14: Total quantity donated by provider": "query14_total_quantity_donated.csv",
+    "Q15: Providers with no claims": "query15_providers_no_claims.csv",
+    "Q16: Receivers with no claims": "query16_receivers_no_claims.csv",
+    "Q17: Claims by meal type and status": "query17_claims_by_meal_status.csv",
+    "Q18: Unclaimed food listings": "query18_unclaimed_food_listings.csv",
+    "Q19: Receivers per city by meal type": "query19_receivers_by_meal_type_city.csv",
+    "Q20: Receiver type with most food": "query20_receiver_type_most_food.csv",
+    "Q21: Receivers by food and meal type": "query21_receivers_by_food_meal_type.csv",
+    "Q22: Claims by city": "query22_claims_by_city.csv",
+    "Q23: Providers with highest avg quantity": "query23_providers_highest_avg_quantity.csv",
+    "Q24: Percentage of quantity claimed per food type": "query24_percentage_claimed_food_type.csv",
+}
+
+
+def available_formats():
+    # Parquet needs pyarrow, which is optional
+    return [name for name in FORMATS if name != "Parquet" or importlib.util.find_spec("pyarrow") is not None]
+
+
+def format_for(path):
+    for name, (extension, _) in sorted(FORMATS.items(), key=lambda item: -len(item[1][0])):
+        if path.endswith(extension):
+            return name
+    raise ValueError(f"unknown export format for {path}; use one of {', '.join(extension for extension, _ in FORMATS.values())}")
+
+
+def file_name(title, fmt):
+    # "Q3: Top 3 provider types" -> q3_top_3_provider_types.csv
+    return re.sub(r"[^a-z0-9]+", "_", title.lower()).strip("_") + FORMATS[fmt][0]
+
+
+def stream_rows(sql, params=None, batch_size=EXPORT_BATCH, timeout=None, db_path=DB_PATH):
+    # Yields the column names, then lists of row tuples, from a read-only connection of its own
+    conn = open_read_only(db_path)
+    if timeout:
+        deadline = time.perf_counter() + timeout
+        conn.set_progress_handler(lambda: int(time.perf_counter() > deadline), PROGRESS_STEPS)
+    try:
+        cursor = conn.execute(sql, params or ())
+        yield [column[0] for column in cursor.description or []]
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            yield batch
+    finally:
+        conn.close()
+
+
+# Writers: (column names, iterator of row batches, binary file object) -> rows written
+def write_csv(columns, batches, out):
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+    writer = csv.writer(text, lineterminator="\n")
+    writer.writerow(columns)
+    rows = 0
+    for batch in batches:
+        writer.writerows(batch)
+        rows += len(batch)
+    text.detach()
+    return rows
+
+
+def write_csv_gzip(columns, batches, out):
+    with gzip.GzipFile(fileobj=out, mode="wb") as zipped:
+        return write_csv(columns, batches, zipped)
+
+
+def write_parquet(columns, batches, out):
+    # One row group per batch. Column types come from the first batch (all-NULL columns become
+    # strings); SQLite columns are dynamically typed, so a later value that does not fit is an error.
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export needs pyarrow (pip install pyarrow)")
+    writer = None
+    rows = 0
+    try:
+        for batch in batches:
+            values = list(zip(*batch))
+            if writer is None:
+                types = [pa.array(column).type for column in values]
+                schema = pa.schema([(name, pa.string() if pa.types.is_null(kind) else kind)
+                                    for name, kind in zip(columns, types)])
+                writer = pq.ParquetWriter(out, schema)
+            arrays = []
+            for field, column in zip(schema, values):
+                try:
+                    arrays.append(pa.array(column, type=field.type))
+                except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+                    if not pa.types.is_string(field.type):
+                        raise ValueError(f"column {field.name} changes type after row {rows}; export it as CSV instead")
+                    arrays.append(pa.array([None if value is None else str(value) for value in column], type=pa.string()))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(batch)
+        if writer is None:
+            writer = pq.ParquetWriter(out, pa.schema([(name, pa.string()) for name in columns]))
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+WRITERS = {"CSV": write_csv, "CSV (gzip)": write_csv_gzip, "Parquet": write_parquet}
+
+
+def export(sql, fmt, out, params=None, timeout=None, batch_size=EXPORT_BATCH, db_path=DB_PATH):
+    # Stream one query's result into a binary file object; returns the number of rows
+    started = time.perf_counter()
+    rows, error = None, None
+    try:
+        batches = stream_rows(sql, params, batch_size, timeout, db_path)
+        columns = next(batches)
+        rows = WRITERS[fmt](columns, batches, out)
+        return rows
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        record("export", normalize_sql(sql), time.perf_counter() - started, rows,
+               out.tell() if out.seekable() else None, params=params, error=error)
+
+
+def export_to_file(sql, path, fmt=None, params=None, timeout=None, db_path=DB_PATH):
+    # Written next to the target and renamed into place, so readers never see a half-written file
+    fmt = fmt or format_for(path)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            rows = export(sql, fmt, f, params, timeout, db_path=db_path)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return rows
+
+
+def export_to_temp(sql, fmt, params=None, timeout=None):
+    # For st.download_button: the result is streamed into an anonymous temporary file on disk,
+    # which Streamlit then reads back
+    f = tempfile.TemporaryFile()
+    try:
+        export(sql, fmt, f, params, timeout)
+    except BaseException:
+        f.close()
+        raise
+    f.seek(0)
+    return f
+
+
+def download_buttons(sql, title, params=None, timeout=None, key=None):
+    # One button per format; the export runs only when a button is clicked, without a rerun
+    formats = available_formats()
+    for column, fmt in zip(st.columns(len(formats)), formats):
+        column.download_button(f"Download {fmt}", data=partial(export_to_temp, sql, fmt, params, timeout),
+                               file_name=file_name(title, fmt), mime=FORMATS[fmt][1], on_click="ignore",
+                               key=f"{key or title}_{fmt}")
+
+
+def regenerate(out_dir=ARTIFACT_DIR, workers=MAX_PARALLEL_QUERIES, log=print):
+    # Rewrite every sql_queries/*.csv from the live tables, several queries at a time.
+    # Returns {query name: rows}.
+    started = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = {name: partial(export_to_file, named_query_sql(name, LIVE), os.path.join(out_dir, filename), "CSV")
+             for name, filename in SQL_QUERY_FILES.items()}
+    parallel = ParallelQueries(max_workers=workers)
+    results = {}
+    try:
+        for name, rows, error in parallel.run(tasks):
+            if error is not None:
+                raise error
+            results[name] = rows
+            log(f"{SQL_QUERY_FILES[name]:<45} {rows:>8} rows")
+    finally:
+        parallel.shutdown()
+    log(f"{len(results)} files written to {out_dir}/ in {time.perf_counter() - started:.2f}s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream query results to CSV, gzip-CSV or Parquet files")
+    sub = parser.add_subparsers(dest="command", required=True)
+    query_parser = sub.add_parser("query", help="export one SQL query; the format follows the file extension")
+    query_parser.add_argument("sql")
+    query_parser.add_argument("path")
+    named_parser = sub.add_parser("named", help="export a predefined query, e.g. Q3")
+    named_parser.add_argument("name")
+    named_parser.add_argument("path")
+    regenerate_parser = sub.add_parser("regenerate", help=f"rewrite the {ARTIFACT_DIR}/*.csv files")
+    regenerate_parser.add_argument("--out-dir", default=ARTIFACT_DIR)
+    regenerate_parser.add_argument("--workers", type=int, default=MAX_PARALLEL_QUERIES)
+    args = parser.parse_args()
+
+    try:
+        if args.command == "regenerate":
+            regenerate(args.out_dir, args.workers)
+            return
+        if args.command == "named":
+            names = [name for name in PREDEFINED_QUERIES if name.split(":")[0] == args.name or name == args.name]
+            if not names:
+                raise ValueError(f"no predefined query {args.name}")
+            sql = named_query_sql(names[0], LIVE)
+        else:
+            sql = args.sql
+        started = time.perf_counter()
+        rows = export_to_file(sql, args.path)
+        print(f"{rows} rows written to {args.path} in {time.perf_counter() - started:.2f}s")
+    except (sqlite3.Error, ValueError) as e:
+        parser.exit(1, f"{e}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from connection_pool import get_pool
+from crud import run_query
+from query_cache import get_cache, register_derived_table
+
+COORDINATES_FILE = "city_coordinates.csv"
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+DEFAULT_RADIUS_KM = 100
+DEFAULT_CELL_DEGREES = 1.0
+# The city names in the dataset are synthetic; cities without real coordinates get deterministic
+# placeholder ones inside this (south, north, west, east) box, the contiguous US
+PLACEHOLDER_BOX = (25.0, 49.0, -124.0, -67.0)
+
+# Loaded from COORDINATES_FILE; city_rtree is kept in step by the triggers from migration 7
+register_derived_table("city_coordinates", ["city_coordinates"])
+register_derived_table("city_rtree", ["city_coordinates"])
+
+# Tables searchable by distance: the columns returned and the column holding the city name
+NEARBY = {
+    "receivers": (["Receiver_ID", "Name", "Type", "City", "Contact"], "City"),
+    "providers": (["Provider_ID", "Name", "Type", "Address", "City", "Contact"], "City"),
+}
+
+# Map layers for the Visualization page: FROM clause, city column and the value summed per grid cell
+MAP_LAYERS = {
+    "Providers": ("providers t", "t.City", "COUNT(*)"),
+    "Receivers": ("receivers t", "t.City", "COUNT(*)"),
+    "Food listings (quantity)": ("food_listings t", "t.Location", "SUM(t.Quantity)"),
+    "Claims": ("claims cl JOIN food_listings t ON t.Food_ID = cl.Food_ID", "t.Location", "COUNT(*)"),
+}
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    # Great-circle distance; works on scalars and NumPy/pandas arrays
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def bounding_box(lat, lon, km):
+    # (south, north, west, east) around a point; longitudes are not wrapped at the antimeridian
+    dlat = km / KM_PER_DEGREE
+    dlon = km / (KM_PER_DEGREE * max(np.cos(np.radians(lat)), 0.01))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+# Coordinates file
+def read_coordinates(path=COORDINATES_FILE):
+    return pd.read_csv(path, dtype={"City": str, "Latitude": float, "Longitude": float})
+
+
+def load_coordinates(path=COORDINATES_FILE):
+    # Upsert every row of the file; the triggers update the R*Tree
+    df = read_coordinates(path).dropna()
+    with get_pool().writer() as conn:
+        try:
+            conn.executemany('''
+                INSERT INTO city_coordinates (City, Latitude, Longitude) VALUES (?, ?, ?)
+                ON CONFLICT (City) DO UPDATE SET Latitude = excluded.Latitude, Longitude = excluded.Longitude
+                WHERE Latitude != excluded.Latitude OR Longitude != excluded.Longitude
+            ''', df[["City", "Latitude", "Longitude"]].itertuples(index=False))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    get_cache().bump("city_coordinates")
+    return len(df)
+
+
+def ensure_coordinates(path=COORDINATES_FILE):
+    # Load the file into an empty table (first run after migration 7)
+    if run_query("SELECT COUNT(*) AS Cities FROM city_coordinates")["Cities"][0] == 0 and os.path.exists(path):
+        load_coordinates(path)
+
+
+def missing_cities():
+    # City names used in the data with no coordinates
+    return run_query('''
+        SELECT City FROM (SELECT City FROM providers UNION SELECT City FROM receivers UNION SELECT Location FROM food_listings)
+        WHERE City IS NOT NULL AND City NOT IN (SELECT City FROM city_coordinates)
+        ORDER BY City
+    ''')["City"].tolist()
+
+
+def placeholder_coordinates(city):
+    # Deterministic point in PLACEHOLDER_BOX derived from the name, so reruns give the same map
+    digest = hashlib.sha256(city.encode("utf-8")).digest()
+    south, north, west, east = PLACEHOLDER_BOX
+    u = int.from_bytes(digest[:8], "big") / 2 ** 64
+    v = int.from_bytes(digest[8:16], "big") / 2 ** 64
+    return round(south + u * (north - south), 5), round(west + v * (east - west), 5)
+
+
+def add_placeholders(path=COORDINATES_FILE):
+    # Append placeholder rows for every city missing from the file and the table, then load the file
+    cities = missing_cities()
+    existing = read_coordinates(path) if os.path.exists(path) else pd.DataFrame(columns=["City", "Latitude", "Longitude"])
+    cities = [city for city in cities if city not in set(existing["City"])]
+    rows = pd.DataFrame([(city, *placeholder_coordinates(city)) for city in cities],
+                        columns=["City", "Latitude", "Longitude"])
+    pd.concat([existing, rows]).to_csv(path, index=False)
+    load_coordinates(path)
+    return len(rows)
+
+
+# Distance queries
+def origin(table, key):
+    # (city, latitude, longitude) of one provider, receiver or food listing
+    pk, city_column = {"providers": ("Provider_ID", "City"), "receivers": ("Receiver_ID", "City"),
+                       "food_listings": ("Food_ID", "Location")}[table]
+    df = run_query(f'''
+        SELECT t.{city_column} AS City, c.Latitude, c.Longitude
+        FROM {table} t
+        LEFT JOIN city_coordinates c ON c.City = t.{city_column}
+        WHERE t.{pk} = ?
+    ''', (key,))
+    if df.empty:
+        raise ValueError(f"no {table} row with {pk} {key}")
+    city, lat, lon = df.iloc[0]
+    if pd.isna(lat):
+        raise ValueError(f"no coordinates for {city!r}; run `python geo.py placeholders` or add it to {COORDINATES_FILE}")
+    return city, float(lat), float(lon)
+
+
+def within(table, lat, lon, km, limit=None):
+    # Rows of `table` whose city lies within km of the point, nearest first. The R*Tree narrows
+    # the cities to a bounding box; exact distances are then computed for those cities only.
+    columns, city_column = NEARBY[table]
+    south, north, west, east = bounding_box(lat, lon, km)
+    df = run_query(f'''
+        SELECT {', '.join(f"t.{column}" for column in columns)}, c.Latitude, c.Longitude
+        FROM city_rtree b
+        JOIN city_coordinates c ON c.City_ID = b.City_ID
+        JOIN {table} t ON t.{city_column} = c.City
+        WHERE b.Max_Lat >= ? AND b.Min_Lat <= ? AND b.Max_Lon >= ? AND b.Min_Lon <= ?
+    ''', (south, north, west, east))
+    df["Distance_Km"] = haversine_km(lat, lon, df["Latitude"], df["Longitude"]).round(1)
+    df = df[df["Distance_Km"] <= km].sort_values(["Distance_Km", columns[0]]).drop(columns=["Latitude", "Longitude"])
+    return (df.head(limit) if limit else df).reset_index(drop=True)
+
+
+def receivers_near_listing(food_id, km=DEFAULT_RADIUS_KM, limit=None):
+    _, lat, lon = origin("food_listings", food_id)
+    return within("receivers", lat, lon, km, limit)
+
+
+def providers_near_receiver(receiver_id, km=DEFAULT_RADIUS_KM, limit=None):
+    _, lat, lon = origin("receivers", receiver_id)
+    return within("providers", lat, lon, km, limit)
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+# Map
+def map_points(layer, cell_degrees=DEFAULT_CELL_DEGREES):
+    # One point per grid cell, aggregated in SQL so only the cells (not every row) reach the browser
+    from_clause, city_column, value = MAP_LAYERS[layer]
+    df = run_query(f'''
+        SELECT AVG(c.Latitude) AS Latitude, AVG(c.Longitude) AS Longitude, {value} AS Value, COUNT(DISTINCT c.City) AS Cities
+        FROM {from_clause}
+        JOIN city_coordinates c ON c.City = {city_column}
+        GROUP BY CAST((c.Latitude + 90) / ? AS INTEGER), CAST((c.Longitude + 180) / ? AS INTEGER)
+    ''', (cell_degrees, cell_degrees))
+    if not df.empty:
+        # Circle area proportional to the value; the largest circle is about as wide as a cell
+        df["Size"] = np.sqrt(df["Value"] / df["Value"].max()) * cell_degrees * KM_PER_DEGREE * 500
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline city coordinates and distance queries")
+    sub = parser.add_subparsers(dest="command", required=True)
+    load_parser = sub.add_parser("load", help="load coordinates from a CSV file (City, Latitude, Longitude)")
+    load_parser.add_argument("--file", default=COORDINATES_FILE)
+    placeholder_parser = sub.add_parser("placeholders", help="add placeholder coordinates for cities missing from the file")
+    placeholder_parser.add_argument("--file", default=COORDINATES_FILE)
+    for name, key in [("receivers", "food_id"), ("providers", "receiver_id")]:
+        near_parser = sub.add_parser(name, help=f"{name} within --km of a " + ("food listing" if name == "receivers" else "receiver"))
+        near_parser.add_argument(key, type=int)
+        near_parser.add_argument("--km", type=float, default=DEFAULT_RADIUS_KM)
+        near_parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "load":
+        print(f"{load_coordinates(args.file)} cities loaded from {args.file}")
+    elif args.command == "placeholders":
+        print(f"{add_placeholders(args.file)} placeholder cities added to {args.file}")
+    else:
+        ensure_coordinates()
+        function = receivers_near_listing if args.command == "receivers" else providers_near_receiver
+        key = args.food_id if args.command == "receivers" else args.receiver_id
+        try:
+            df, elapsed_ms = timed(function, key, args.km, args.limit)
+        except ValueError as e:
+            parser.exit(1, f"{e}\n")
+        print(df.to_string(index=False) if not df.empty else f"Nothing within {args.km:g} km.")
+        print(f"{elapsed_ms:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
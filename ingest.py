@@ -0,0 +1,166 @@
+import argparse
+import csv
+import sqlite3
+import sys
+import time
+
+from database import DB_PATH, PRIMARY_KEYS, TABLES, create_schema
+from migrations import apply_migrations
+from normalize import is_normalized
+
+CHUNK_SIZE = 5000
+
+# The cleaned CSVs shipped with the repo, in foreign-key order
+SEED_FILES = [
+    ("providers", "cleaned_providers_data.csv"),
+    ("receivers", "cleaned_receivers_data.csv"),
+    ("food_listings", "cleaned_food_listings_data.csv"),
+    ("claims", "cleaned_claims_data.csv"),
+]
+
+ON_CONFLICT = {
+    "error": "INSERT INTO",
+    "skip": "INSERT OR IGNORE INTO",
+    "upsert": "INSERT INTO",
+}
+
+
+def read_chunks(csv_path, chunk_size=CHUNK_SIZE):
+    # Stream the CSV in chunks of row tuples; the csv module handles quoted multi-line fields (providers.Address)
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        yield header
+        chunk = []
+        for row in reader:
+            chunk.append(tuple(value if value != "" else None for value in row))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def insert_statement(table, columns, on_conflict):
+    pk = PRIMARY_KEYS[table]
+    query = f"{ON_CONFLICT[on_conflict]} {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    if on_conflict == "upsert":
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column != pk)
+        query += f" ON CONFLICT ({pk}) DO UPDATE SET {updates}" if updates else f" ON CONFLICT ({pk}) DO NOTHING"
+    return query
+
+
+def secondary_indexes(conn, table):
+    return conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (table,)).fetchall()
+
+
+def ingest(conn, table, csv_path, chunk_size=CHUNK_SIZE, on_conflict="error", drop_indexes=False, log=print):
+    # Load one CSV into one table, one transaction per chunk. Returns (rows, seconds).
+    if table not in TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    if on_conflict == "upsert" and is_normalized(conn, table):
+        raise ValueError(f"{table} is a view over normalized storage, which cannot upsert; use --on-conflict skip or error")
+    chunks = read_chunks(csv_path, chunk_size)
+    columns = next(chunks)
+    known = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    unknown = [column for column in columns if column not in known]
+    if unknown:
+        raise ValueError(f"{csv_path} has columns {unknown} that {table} does not have")
+    query = insert_statement(table, columns, on_conflict)
+    # Keys of archived rows are refused by a trigger (migration 10); "skip" leaves those rows out instead
+    pk = PRIMARY_KEYS[table]
+    archived = set()
+    if on_conflict == "skip" and pk in columns:
+        archived = {key for key, in conn.execute("SELECT Row_Key FROM archived_keys WHERE Table_Name = ?", (table,))}
+
+    # Index maintenance is skipped during the load and done once at the end.
+    # Only this table's secondary indexes are dropped; triggers on it use other tables' indexes.
+    indexes = secondary_indexes(conn, table) if drop_indexes else []
+    for name, _ in indexes:
+        conn.execute(f"DROP INDEX {name}")
+
+    started = time.perf_counter()
+    total = 0
+    try:
+        for chunk in chunks:
+            if archived:
+                position = columns.index(pk)
+                chunk = [row for row in chunk if row[position] is None or int(row[position]) not in archived]
+            conn.execute("BEGIN")
+            conn.execute("PRAGMA defer_foreign_keys = ON")
+            try:
+                conn.executemany(query, chunk)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            total += len(chunk)
+            elapsed = time.perf_counter() - started
+            log(f"  {table}: {total} rows, {total / elapsed:,.0f} rows/sec")
+    finally:
+        if indexes:
+            index_started = time.perf_counter()
+            for _, sql in indexes:
+                conn.execute(sql)
+            conn.commit()
+            log(f"  {table}: rebuilt {len(indexes)} indexes in {time.perf_counter() - index_started:.2f}s")
+    return total, time.perf_counter() - started
+
+
+def foreign_key_violations(conn, table):
+    return conn.execute(f"PRAGMA foreign_key_check({table})").fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load CSV files into the food wastage database.")
+    parser.add_argument("table", nargs="?", choices=TABLES, help="table to load (omit with --seed)")
+    parser.add_argument("csv_path", nargs="?", help="CSV file with a header row matching the table's columns")
+    parser.add_argument("--seed", action="store_true", help="load all four cleaned_*_data.csv files")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--on-conflict", choices=list(ON_CONFLICT), default="error",
+                        help="what to do when a primary key already exists")
+    parser.add_argument("--drop-indexes", action="store_true",
+                        help="drop the table's secondary indexes during the load and rebuild them afterwards")
+    args = parser.parse_args()
+
+    if args.seed:
+        jobs = SEED_FILES
+    elif args.table and args.csv_path:
+        jobs = [(args.table, args.csv_path)]
+    else:
+        parser.error("give a table and a CSV path, or --seed")
+
+    conn = sqlite3.connect(args.db)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA cache_size = -262144")
+    create_schema(conn)
+    apply_migrations(conn)
+
+    failed = False
+    for table, csv_path in jobs:
+        print(f"Loading {csv_path} into {table}")
+        try:
+            rows, seconds = ingest(conn, table, csv_path, args.chunk_size, args.on_conflict, args.drop_indexes)
+        except (sqlite3.Error, ValueError, OSError) as e:
+            print(f"  failed: {e}")
+            failed = True
+            break
+        print(f"  {table}: {rows} rows in {seconds:.2f}s ({rows / seconds if seconds else 0:,.0f} rows/sec)")
+
+    # Foreign keys are validated once, after everything is loaded
+    for table, _ in jobs:
+        violations = foreign_key_violations(conn, table)
+        if violations:
+            failed = True
+            print(f"{table}: {len(violations)} foreign key violation(s), e.g. rowid {violations[0][1]} -> {violations[0][2]}")
+    conn.execute("PRAGMA optimize")
+    conn.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
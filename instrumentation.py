@@ -0,0 +1,293 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from query_cache import frame_size, normalize_sql
+
+# Timings of database calls, page renders and page sections, kept in memory per process
+RING_SIZE = 5000               # most recent calls kept for percentiles and the slow-query list
+MAX_SERIES = 500               # distinct metric label sets; anything beyond is counted as "(other)"
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
+METRICS_FILE = os.environ.get("FOOD_WASTAGE_METRICS_FILE", "metrics.prom")
+METRICS_INTERVAL = 15          # seconds between metrics file writes from the app
+METRICS_PORT = os.environ.get("FOOD_WASTAGE_METRICS_PORT")  # also serve /metrics over HTTP when set
+NO_PAGE = "(background)"
+
+# Kinds of timed calls: SQL reads and writes, custom SQL, streamed exports, columnar snapshot queries,
+# chart renders, and whole pages and page sections
+SQL_KINDS = ("read", "write", "custom", "export")
+CALL_KINDS = SQL_KINDS + ("columnar", "chart")
+
+_lock = threading.Lock()
+_events = deque(maxlen=RING_SIZE)
+_series = {}       # (metric, labels) -> [count, seconds, rows, bytes, cache hits, errors, bucket counts]
+_local = threading.local()
+_last_write = [0.0]
+_server = []
+
+
+def result_size(result):
+    # (rows, approximate bytes) of a DataFrame or a list of row dicts
+    if isinstance(result, list):
+        return len(result), sum(len(str(value)) for row in result for value in row.values())
+    if hasattr(result, "memory_usage"):
+        return len(result), frame_size(result)
+    return None, None
+
+
+def current_page():
+    return getattr(_local, "page", NO_PAGE)
+
+
+@contextmanager
+def on_page(name):
+    # Attribute calls made on this (worker) thread to a page
+    previous = current_page()
+    _local.page = name
+    try:
+        yield
+    finally:
+        _local.page = previous
+
+
+def _observe(metric, labels, seconds, rows, nbytes, cached, error):
+    key = (metric, labels)
+    if key not in _series and len(_series) >= MAX_SERIES:
+        key = (metric, tuple((name, "(other)") for name, _ in labels))
+    series = _series.get(key)
+    if series is None:
+        series = _series[key] = [0, 0.0, 0, 0, 0, 0, [0] * len(LATENCY_BUCKETS)]
+    series[0] += 1
+    series[1] += seconds
+    series[2] += rows or 0
+    series[3] += nbytes or 0
+    series[4] += bool(cached)
+    series[5] += bool(error)
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if seconds <= bound:
+            series[6][i] += 1
+
+
+def record(kind, name, seconds, rows=None, nbytes=None, cached=False, params=None, page=None, error=None):
+    page = page or current_page()
+    event = dict(time=time.time(), kind=kind, name=name, page=page, ms=seconds * 1000, rows=rows,
+                 bytes=nbytes, cached=cached, params=params, error=error)
+    if kind == "page":
+        metric, labels = "page_render", (("page", name),)
+    elif kind == "section":
+        metric, labels = "page_section", (("page", page), ("section", name))
+    else:
+        metric, labels = "db_call", (("kind", kind), ("query", name))
+    with _lock:
+        _events.append(event)
+        _observe(metric, labels, seconds, rows, nbytes, cached, error)
+
+
+@contextmanager
+def track(kind, sql, params=None, page=None):
+    # Time one database call. The body fills in the yielded dict: "result" (a DataFrame or row dicts)
+    # or "rows"/"bytes" directly, and "cached" for cache hits.
+    info = {}
+    started = time.perf_counter()
+    error = None
+    try:
+        yield info
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        rows, nbytes = result_size(info.get("result"))
+        record(kind, normalize_sql(sql), time.perf_counter() - started,
+               info.get("rows", rows), info.get("bytes", nbytes), info.get("cached", False),
+               tuple(params) if params is not None and not isinstance(params, dict) else params,
+               page, error)
+
+
+# Page timing. The app calls start_page() at the top of every script run, section() at each
+# subheading and finish_page() at the end; a run stopped early by a rerun is simply not recorded.
+def start_page(name):
+    now = time.perf_counter()
+    _local.page = name
+    _local.page_started = now
+    _local.section = None
+    _local.section_started = now
+
+
+def _close_section(now):
+    section = getattr(_local, "section", None)
+    if section is not None:
+        record("section", section, now - _local.section_started)
+
+
+def section(name):
+    now = time.perf_counter()
+    _close_section(now)
+    _local.section = name
+    _local.section_started = now
+
+
+def finish_page():
+    now = time.perf_counter()
+    if getattr(_local, "page_started", None) is None:
+        return
+    _close_section(now)
+    record("page", _local.page, now - _local.page_started)
+    _local.page_started = None
+    _local.section = None
+    _local.page = NO_PAGE
+    if time.time() - _last_write[0] >= METRICS_INTERVAL:
+        try:
+            write_metrics()
+        except OSError:
+            # Metrics are best effort; a read-only working directory must not break the page
+            pass
+
+
+# Reports. pandas is imported here rather than at the top so the app's entry point
+# (which imports this module) stays light; see startup_budget.py.
+def events(kinds=None):
+    import pandas as pd
+    with _lock:
+        rows = list(_events)
+    df = pd.DataFrame(rows, columns=["time", "kind", "name", "page", "ms", "rows", "bytes", "cached", "params", "error"])
+    if kinds:
+        df = df[df["kind"].isin(kinds)]
+    return df
+
+
+def _latency_table(df, by):
+    import pandas as pd
+    if df.empty:
+        return pd.DataFrame(columns=by + ["Calls", "p50_ms", "p95_ms", "p99_ms", "Max_ms"])
+    grouped = df.groupby(by, sort=False)["ms"]
+    table = pd.DataFrame({
+        "Calls": grouped.size(),
+        "p50_ms": grouped.quantile(0.5),
+        "p95_ms": grouped.quantile(0.95),
+        "p99_ms": grouped.quantile(0.99),
+        "Max_ms": grouped.max(),
+    })
+    return table.sort_values("p95_ms", ascending=False).round(3).reset_index()
+
+
+def query_latency(kinds=None):
+    # p50/p95/p99 per query over the ring buffer, with average rows and bytes and the cache hit rate
+    df = events(kinds or CALL_KINDS)
+    table = _latency_table(df, ["kind", "name"])
+    if not df.empty:
+        import pandas as pd
+        grouped = df.groupby(["kind", "name"], sort=False)
+        extra = pd.DataFrame({
+            "Avg_Rows": grouped["rows"].mean(),
+            "Avg_Bytes": grouped["bytes"].mean(),
+            "Cache_Hit_Rate": grouped["cached"].mean(),
+        }).round(2).reset_index()
+        table = table.merge(extra, on=["kind", "name"])
+    return table.rename(columns={"kind": "Kind", "name": "Query"})
+
+
+def page_latency():
+    df = events(["page"])
+    return _latency_table(df, ["name"]).rename(columns={"name": "Page"})
+
+
+def section_latency():
+    df = events(["section"])
+    return _latency_table(df, ["page", "name"]).rename(columns={"page": "Page", "name": "Section"})
+
+
+def slow_queries(limit=10, kinds=SQL_KINDS):
+    # The slowest call of each distinct query, slowest first
+    df = events(kinds)
+    if df.empty:
+        return df
+    df = df.sort_values("ms", ascending=False).drop_duplicates(["kind", "name"])
+    return df.head(limit).reset_index(drop=True)
+
+
+def explain_plan(conn, sql, params=None):
+    # EXPLAIN QUERY PLAN lines; nothing is executed, so this is safe for recorded writes too
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params or ())]
+
+
+def reset():
+    with _lock:
+        _events.clear()
+        _series.clear()
+
+
+# Prometheus text exposition
+def _label_text(labels, extra=()):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    pairs = [f'{name}="{escape(value)}"' for name, value in (*labels, *extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+METRICS = {
+    "db_call": ("food_wastage_db_call", "Database calls by kind and normalized query"),
+    "page_render": ("food_wastage_page_render", "Full Streamlit script runs by page"),
+    "page_section": ("food_wastage_page_section", "Streamlit page sections"),
+}
+
+
+def prometheus_text():
+    with _lock:
+        series = {key: [*values[:6], list(values[6])] for key, values in _series.items()}
+    lines = []
+    for metric, (prefix, help_text) in METRICS.items():
+        items = [(labels, values) for (name, labels), values in sorted(series.items()) if name == metric]
+        lines += [f"# HELP {prefix}_seconds {help_text}", f"# TYPE {prefix}_seconds histogram"]
+        for labels, (count, seconds, _, _, _, _, buckets) in items:
+            for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                lines.append(f"{prefix}_seconds_bucket{_label_text(labels, [('le', bound)])} {bucket_count}")
+            lines.append(f"{prefix}_seconds_bucket{_label_text(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{prefix}_seconds_sum{_label_text(labels)} {seconds:.6f}")
+            lines.append(f"{prefix}_seconds_count{_label_text(labels)} {count}")
+        if metric == "db_call":
+            for column, suffix, text in [(2, "rows", "Rows returned or written"), (3, "bytes", "Approximate result bytes"),
+                                         (4, "cache_hits", "Calls answered from the query cache"),
+                                         (5, "errors", "Calls that raised")]:
+                lines += [f"# HELP {prefix}_{suffix}_total {text}", f"# TYPE {prefix}_{suffix}_total counter"]
+                lines += [f"{prefix}_{suffix}_total{_label_text(labels)} {values[column]}" for labels, values in items]
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path=METRICS_FILE):
+    # Written atomically, so a node_exporter textfile collector never reads half a file
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(prometheus_text())
+    os.replace(temp_path, path)
+    _last_write[0] = time.time()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=METRICS_PORT):
+    # Serve the metrics over HTTP from this process in a daemon thread; started at most once,
+    # and not at all unless a port is given or FOOD_WASTAGE_METRICS_PORT is set
+    if not port:
+        return None
+    with _lock:
+        if _server:
+            return _server[0]
+        server = ThreadingHTTPServer(("", int(port)), _MetricsHandler)
+        _server.append(server)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+    return server
+
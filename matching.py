@@ -0,0 +1,291 @@
+import argparse
+import bisect
+import heapq
+import itertools
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime
+
+import pandas as pd
+
+from connection_pool import get_pool
+from crud import assign_keys, notify_write, register_write_hook
+from instrumentation import track
+
+# Claims in these states hold a listing; a cancelled claim puts the listing back in the queue
+ACTIVE_STATUSES = ("Pending", "Completed")
+DEFAULT_SUGGESTIONS = 5
+LISTING_COLUMNS = ["Food_ID", "Food_Name", "Quantity", "Expiry_Date", "Location", "Food_Type", "Meal_Type"]
+RECEIVER_COLUMNS = ["Receiver_ID", "Name", "Type", "City"]
+
+
+class MatchingEngine:
+    # In-memory matcher for unclaimed food listings.
+    # Open listings sit in expiry-ordered queues keyed by (city, food type, meal type);
+    # receivers are indexed by city and ranked by how often they claimed the same food/meal type
+    # before, then by how many pending claims they already have.
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.loaded = False
+        self.listings = {}       # Food_ID -> listing dict
+        self.receivers = {}      # Receiver_ID -> receiver dict
+        self.claims = {}         # Claim_ID -> (Food_ID, Receiver_ID, Status)
+        self.claims_by_food = defaultdict(set)   # Food_ID -> Claim_IDs
+        self.active_claims = Counter()   # Food_ID -> active claims on it
+        self.pending = Counter()          # Receiver_ID -> pending claims
+        self.history = defaultdict(Counter)   # Receiver_ID -> Counter of ("food"|"meal", type)
+        self.receivers_by_city = defaultdict(set)
+        self.queues = defaultdict(list)   # (city, food type, meal type) -> sorted [(expiry, -quantity, Food_ID)]
+        self.queue_keys = defaultdict(set)    # city -> queue keys
+        self.entries = {}        # Food_ID -> (queue key, queue entry) for open listings
+
+    def load(self, conn):
+        frames = []
+        for sql in [f"SELECT {', '.join(LISTING_COLUMNS)} FROM food_listings",
+                    f"SELECT {', '.join(RECEIVER_COLUMNS)} FROM receivers",
+                    "SELECT Claim_ID, Food_ID, Receiver_ID, Status FROM claims"]:
+            with track("read", sql) as call:
+                call["result"] = pd.read_sql_query(sql, conn)
+            frames.append(call["result"])
+        listings, receivers, claims = frames
+        with self._lock:
+            self._reset()
+            for row in receivers.to_dict("records"):
+                self._put_receiver(row)
+            for row in listings.to_dict("records"):
+                self.listings[row["Food_ID"]] = row
+            for row in claims.to_dict("records"):
+                self._put_claim(row)
+            for food_id in self.listings:
+                self._requeue(food_id)
+            self.loaded = True
+
+    # Index maintenance
+    def _put_receiver(self, row):
+        self._drop_receiver(row["Receiver_ID"])
+        self.receivers[row["Receiver_ID"]] = row
+        self.receivers_by_city[row["City"]].add(row["Receiver_ID"])
+
+    def _drop_receiver(self, receiver_id):
+        old = self.receivers.pop(receiver_id, None)
+        if old is not None:
+            self.receivers_by_city[old["City"]].discard(receiver_id)
+
+    def _claim_effect(self, food_id, receiver_id, status, sign):
+        if status not in ACTIVE_STATUSES:
+            return
+        self.active_claims[food_id] += sign
+        if status == "Pending":
+            self.pending[receiver_id] += sign
+        self._history_effect(food_id, receiver_id, status, sign)
+
+    def _history_effect(self, food_id, receiver_id, status, sign):
+        # Counted under the listing's current types (see _put_listing); zero counts are dropped, so the
+        # state matches a fresh load
+        listing = self.listings.get(food_id)
+        if status in ACTIVE_STATUSES and listing is not None:
+            history = self.history[receiver_id]
+            for key in [("food", listing["Food_Type"]), ("meal", listing["Meal_Type"])]:
+                history[key] += sign
+                if not history[key]:
+                    del history[key]
+            if not history:
+                del self.history[receiver_id]
+
+    def _put_claim(self, row):
+        self._drop_claim(row["Claim_ID"])
+        self.claims[row["Claim_ID"]] = (row["Food_ID"], row["Receiver_ID"], row["Status"])
+        self.claims_by_food[row["Food_ID"]].add(row["Claim_ID"])
+        self._claim_effect(row["Food_ID"], row["Receiver_ID"], row["Status"], 1)
+
+    def _drop_claim(self, claim_id):
+        old = self.claims.pop(claim_id, None)
+        if old is not None:
+            self.claims_by_food[old[0]].discard(claim_id)
+            self._claim_effect(*old, -1)
+            return old[0]
+
+    def _put_listing(self, food_id, listing):
+        # Replace (or with None, drop) a listing. Its claims' history counts follow its types, so they
+        # are taken back under the old row and counted again under the new one.
+        claims = [self.claims[claim_id] for claim_id in self.claims_by_food.get(food_id, ())]
+        for claim in claims:
+            self._history_effect(*claim, -1)
+        if listing is None:
+            self.listings.pop(food_id, None)
+        else:
+            self.listings[food_id] = listing
+        for claim in claims:
+            self._history_effect(*claim, 1)
+
+    def _dequeue(self, food_id):
+        key, entry = self.entries.pop(food_id, (None, None))
+        if key is not None:
+            queue = self.queues[key]
+            del queue[bisect.bisect_left(queue, entry)]
+
+    def _requeue(self, food_id):
+        self._dequeue(food_id)
+        listing = self.listings.get(food_id)
+        if listing is None or self.active_claims[food_id] > 0:
+            return
+        key = (listing["Location"], listing["Food_Type"], listing["Meal_Type"])
+        entry = (listing["Expiry_Date"] or "", -(listing["Quantity"] or 0), food_id)
+        bisect.insort(self.queues[key], entry)
+        self.queue_keys[listing["Location"]].add(key)
+        self.entries[food_id] = (key, entry)
+
+    def apply_write(self, table, action, rows):
+        # Incremental update from a committed CRUD write (see crud.register_write_hook)
+        with self._lock:
+            if not self.loaded:
+                return
+            for row in rows:
+                if table == "claims":
+                    old_food = self._drop_claim(row["Claim_ID"])
+                    if action != "delete":
+                        self._put_claim(row)
+                    for food_id in {old_food, row["Food_ID"]} - {None}:
+                        self._requeue(food_id)
+                elif table == "food_listings":
+                    self._put_listing(row["Food_ID"], None if action == "delete" else
+                                      {column: row[column] for column in LISTING_COLUMNS})
+                    self._requeue(row["Food_ID"])
+                elif table == "receivers":
+                    if action == "delete":
+                        self._drop_receiver(row["Receiver_ID"])
+                    else:
+                        self._put_receiver({column: row[column] for column in RECEIVER_COLUMNS})
+
+    # Queries
+    def expiring(self, city=None, food_type=None, meal_type=None, on_or_after=None, limit=20):
+        # Open listings in expiry order, optionally narrowed by city, food type and meal type. Listings
+        # that expire before on_or_after (today by default) have expired and are never offered.
+        on_or_after = on_or_after or date.today().isoformat()
+        with self._lock:
+            keys = self.queue_keys.get(city, ()) if city else list(self.queues)
+            queues = [self.queues[key] for key in keys
+                      if (food_type is None or key[1] == food_type) and (meal_type is None or key[2] == meal_type)]
+            queues = [q[bisect.bisect_left(q, (on_or_after,)):] for q in queues]
+            entries = itertools.islice(heapq.merge(*queues), limit)
+            return [self.listings[food_id] for _, _, food_id in entries]
+
+    def suggest(self, food_id, limit=DEFAULT_SUGGESTIONS, extra_load=None):
+        # Ranked receivers in the listing's city: past claims of the same food and meal type first,
+        # then fewer pending claims (plus extra_load, used by batch assignment), then Receiver_ID
+        with self._lock:
+            listing = self.listings.get(food_id)
+            if listing is None:
+                return []
+            food_key = ("food", listing["Food_Type"])
+            meal_key = ("meal", listing["Meal_Type"])
+            ranked = []
+            for receiver_id in self.receivers_by_city.get(listing["Location"], ()):
+                history = self.history.get(receiver_id, {})
+                affinity = history.get(food_key, 0) + history.get(meal_key, 0)
+                load = self.pending[receiver_id] + (extra_load[receiver_id] if extra_load else 0)
+                ranked.append((-affinity, load, receiver_id))
+            ranked = heapq.nsmallest(limit, ranked) if limit else sorted(ranked)
+            return [dict(Receiver_ID=receiver_id, Name=self.receivers[receiver_id]["Name"],
+                         Type=self.receivers[receiver_id]["Type"], Affinity=-neg_affinity, Pending_Claims=load)
+                    for neg_affinity, load, receiver_id in ranked]
+
+    def assign_day(self, day, per_receiver=1):
+        # Batch mode: greedily give every open listing that expires on `day` (soonest/largest first)
+        # to its best-ranked receiver, at most per_receiver listings each. A day before today has no
+        # open listings left.
+        assignments = []
+        assigned = Counter()
+        with self._lock:
+            listings = [listing for listing in self.expiring(on_or_after=max(day, date.today().isoformat()), limit=None)
+                        if listing["Expiry_Date"] == day]
+            for listing in listings:
+                for suggestion in self.suggest(listing["Food_ID"], limit=None, extra_load=assigned):
+                    if assigned[suggestion["Receiver_ID"]] < per_receiver:
+                        assigned[suggestion["Receiver_ID"]] += 1
+                        assignments.append(dict(
+                            Food_ID=listing["Food_ID"], Food_Name=listing["Food_Name"],
+                            Quantity=listing["Quantity"], Location=listing["Location"],
+                            Receiver_ID=suggestion["Receiver_ID"], Receiver_Name=suggestion["Name"],
+                            Affinity=suggestion["Affinity"]))
+                        break
+            return assignments, len(listings)
+
+
+_engine = MatchingEngine()
+
+
+def get_engine():
+    # Shared engine, loaded from a pooled reader on first use
+    if not _engine.loaded:
+        with get_pool().reader() as conn:
+            _engine.load(conn)
+    return _engine
+
+
+def timed_suggest(food_id, limit=DEFAULT_SUGGESTIONS):
+    start = time.perf_counter()
+    suggestions = get_engine().suggest(food_id, limit)
+    return suggestions, (time.perf_counter() - start) * 1000
+
+
+def create_claims(assignments, status="Pending"):
+    # Record a batch plan as claims in one transaction, then update caches and the engine
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = []
+    with track("write", "create matched claims") as call, get_pool().writer() as conn:
+        try:
+            claims = assign_keys(conn, "claims", [dict(Food_ID=assignment["Food_ID"], Receiver_ID=assignment["Receiver_ID"])
+                                                  for assignment in assignments])
+            for claim in claims:
+                cursor = conn.execute(
+                    "INSERT INTO claims (Claim_ID, Food_ID, Receiver_ID, Status, Timestamp) VALUES (?, ?, ?, ?, ?) RETURNING *",
+                    (claim["Claim_ID"], claim["Food_ID"], claim["Receiver_ID"], status, timestamp))
+                columns = [d[0] for d in cursor.description]
+                rows.append(dict(zip(columns, cursor.fetchone())))
+            conn.commit()
+            call["result"] = rows
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    notify_write("claims", "insert", rows)
+    return len(rows)
+
+
+register_write_hook(_engine.apply_write)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suggest receivers for unclaimed food listings")
+    sub = parser.add_subparsers(dest="command", required=True)
+    suggest_parser = sub.add_parser("suggest", help="ranked receivers for one listing")
+    suggest_parser.add_argument("food_id", type=int)
+    suggest_parser.add_argument("--limit", type=int, default=DEFAULT_SUGGESTIONS)
+    assign_parser = sub.add_parser("assign", help="batch-assign the open listings expiring on a day")
+    assign_parser.add_argument("day", help="YYYY-MM-DD")
+    assign_parser.add_argument("--per-receiver", type=int, default=1)
+    assign_parser.add_argument("--commit", action="store_true", help="create Pending claims for the plan")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    if args.command == "suggest":
+        suggestions, elapsed_ms = timed_suggest(args.food_id, args.limit)
+        print(pd.DataFrame(suggestions).to_string(index=False) if suggestions else "No receivers in this listing's city.")
+        print(f"{elapsed_ms:.3f} ms")
+    else:
+        assignments, total = engine.assign_day(args.day, args.per_receiver)
+        if assignments:
+            print(pd.DataFrame(assignments).to_string(index=False))
+        print(f"{len(assignments)} of {total} open listing(s) expiring {args.day} assigned")
+        if args.commit and assignments:
+            print(f"{create_claims(assignments)} claim(s) created")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+import argparse
+import sqlite3
+import sys
+from datetime import datetime, timezone
+
+from columnar import has_columnar, run_columnar
+from connection_pool import get_pool
+from crud import run_query
+from database import DB_PATH
+from instrumentation import track
+from migrations import MATERIALIZED_VIEWS
+from normalize import ENCODED_QUERIES, normalized_storage
+from queries import PREDEFINED_QUERIES, CHART_QUERIES
+from query_cache import get_cache, register_derived_table
+from sharding import is_sharded, run_sharded
+
+LIVE = "Live"
+MATERIALIZED = "Materialized"
+SNAPSHOT = "Columnar snapshot"
+SHARDED = "Sharded"
+# Sharded runs against the per-region shards in FOOD_WASTAGE_SHARDS (see sharding.py), when there are any
+MODES = [MATERIALIZED, LIVE, SNAPSHOT] + ([SHARDED] if is_sharded() else [])
+
+# Materialized views are refreshed at most this often when a page reads them
+MAX_STALENESS_SECONDS = 60
+
+MV_TABLES = [table for table, *_ in MATERIALIZED_VIEWS]
+for _table in MV_TABLES:
+    register_derived_table(_table, [_table])
+
+_Q12 = '''
+    SELECT r.Name, SUM(m.Quantity_Sum) * 1.0 / SUM(m.Quantity_Count) as Avg_Quantity_Claimed
+    FROM mv_receiver_claims m
+    JOIN receivers r ON r.Receiver_ID = m.Receiver_ID
+    WHERE m.Listed
+    GROUP BY r.Receiver_ID, r.Name
+    ORDER BY Avg_Quantity_Claimed DESC
+'''
+_Q13 = '''
+    SELECT Meal_Type, SUM(Claim_Count) as Claim_Count
+    FROM mv_food_claims
+    WHERE Claim_Count > 0
+    GROUP BY Meal_Type
+    ORDER BY Claim_Count DESC
+'''
+_Q22 = '''
+    SELECT Location, SUM(Claim_Count) as Claim_Count
+    FROM mv_food_claims
+    WHERE Claim_Count > 0
+    GROUP BY Location
+    ORDER BY Claim_Count DESC
+'''
+_Q11 = '''
+    SELECT Status, SUM(Claim_Count) as Claim_Count,
+           SUM(Claim_Count) * 100.0 / (SELECT SUM(Claim_Count) FROM mv_food_status) as Percentage
+    FROM mv_food_status
+    GROUP BY Status
+    ORDER BY Claim_Count DESC
+'''
+
+# The same result columns as the live query, computed from the mv_* summary tables
+MATERIALIZED_QUERIES = {
+    "Q5: Top 8 receivers by claims": '''
+        SELECT r.Name, SUM(m.Claim_Count) as Claim_Count
+        FROM mv_receiver_claims m
+        JOIN receivers r ON r.Receiver_ID = m.Receiver_ID
+        GROUP BY r.Receiver_ID, r.Name
+        ORDER BY Claim_Count DESC
+        LIMIT 8
+    ''',
+    "Q9: Claims per food item": '''
+        SELECT Food_Name, Claim_Count
+        FROM mv_food_claims
+        ORDER BY Claim_Count DESC
+    ''',
+    "Q10: Top provider by completed claims": '''
+        SELECT p.Name, SUM(m.Claim_Count) as Completed_Claims
+        FROM mv_food_status m
+        JOIN providers p ON p.Provider_ID = m.Provider_ID
+        WHERE m.Status = 'Completed' AND m.Listed
+        GROUP BY p.Provider_ID, p.Name
+        ORDER BY Completed_Claims DESC
+        LIMIT 1
+    ''',
+    "Q11: Claim status percentages": _Q11,
+    "Q12: Avg quantity claimed per receiver": _Q12,
+    "Q13: Most claimed meal type": _Q13 + "LIMIT 1",
+    "Q15: Providers with no claims": '''
+        SELECT p.Name
+        FROM providers p
+        JOIN mv_food_claims m ON p.Provider_ID = m.Provider_ID
+        WHERE m.Claim_Count = 0
+        GROUP BY p.Provider_ID, p.Name
+    ''',
+    "Q17: Claims by meal type and status": '''
+        SELECT Meal_Type, Status, SUM(Claim_Count) as Claim_Count
+        FROM mv_food_status
+        WHERE Listed
+        GROUP BY Meal_Type, Status
+        ORDER BY Claim_Count DESC
+    ''',
+    "Q18: Unclaimed food listings": '''
+        SELECT Food_Name, Quantity, Expiry_Date
+        FROM mv_food_claims
+        WHERE Claim_Count = 0
+    ''',
+    "Q19: Receivers per city by meal type": '''
+        SELECT r.City,
+               COUNT(DISTINCT CASE WHEN m.Meal_Type = 'Breakfast' THEN r.Receiver_ID END) as Breakfast_Receivers,
+               COUNT(DISTINCT CASE WHEN m.Meal_Type = 'Lunch' THEN r.Receiver_ID END) as Lunch_Receivers,
+               COUNT(DISTINCT CASE WHEN m.Meal_Type = 'Dinner' THEN r.Receiver_ID END) as Dinner_Receivers,
+               COUNT(DISTINCT CASE WHEN m.Meal_Type = 'Snacks' THEN r.Receiver_ID END) as Snacks_Receivers
+        FROM mv_receiver_claims m
+        JOIN receivers r ON r.Receiver_ID = m.Receiver_ID
+        WHERE m.Listed
+        GROUP BY r.City
+        ORDER BY Breakfast_Receivers DESC, Lunch_Receivers DESC, Dinner_Receivers DESC, Snacks_Receivers DESC
+    ''',
+    "Q20: Receiver type with most food": '''
+        SELECT r.Type, m.Food_Type, SUM(m.Quantity_Sum) as Total_Quantity
+        FROM mv_receiver_claims m
+        JOIN receivers r ON r.Receiver_ID = m.Receiver_ID
+        WHERE m.Listed
+        GROUP BY r.Type, m.Food_Type
+        ORDER BY Total_Quantity DESC
+        LIMIT 1
+    ''',
+    "Q21: Receivers by food and meal type": '''
+        SELECT r.Name, m.Food_Type, m.Meal_Type, SUM(m.Claim_Count) as Claim_Count
+        FROM mv_receiver_claims m
+        JOIN receivers r ON r.Receiver_ID = m.Receiver_ID
+        WHERE m.Listed
+        GROUP BY r.Receiver_ID, r.Name, m.Food_Type, m.Meal_Type
+        ORDER BY Claim_Count DESC
+    ''',
+    "Q22: Claims by city": _Q22,
+    "Q24: Percentage of quantity claimed per food type": '''
+        SELECT Food_Type,
+               SUM(Quantity * MAX(Claim_Count, 1)) as Total_Quantity,
+               SUM(Quantity * Claim_Count) * 100.0 / SUM(Quantity * MAX(Claim_Count, 1)) as Claimed_Percentage
+        FROM mv_food_claims
+        GROUP BY Food_Type
+    ''',
+    "Claim Status Distribution": _Q11,
+    "Avg Quantity Claimed per Receiver (Top 5)": _Q12 + "LIMIT 5",
+    "Claims by City (Top 10)": _Q22 + "LIMIT 10",
+    "Claims by Meal Type (Top 5)": _Q13 + "LIMIT 5",
+    "Unclaimed Food Listings by Quantity (Top 5)": '''
+        SELECT Food_Name, Quantity
+        FROM mv_food_claims
+        WHERE Claim_Count = 0
+        ORDER BY Quantity DESC, Food_ID
+        LIMIT 5
+    ''',
+    "Receivers per City by Breakfast Claims (Top 5)": '''
+        SELECT r.City, COUNT(DISTINCT CASE WHEN m.Meal_Type = 'Breakfast' THEN r.Receiver_ID END) as Breakfast_Receivers
+        FROM mv_receiver_claims m
+        JOIN receivers r ON r.Receiver_ID = m.Receiver_ID
+        WHERE m.Listed
+        GROUP BY r.City
+        ORDER BY Breakfast_Receivers DESC
+        LIMIT 5
+    ''',
+}
+
+
+def refresh(conn, full=False):
+    # Recompute the summary rows for every key in the change log since the last refresh,
+    # or everything when full=True. Returns the number of change-log entries consumed.
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        last = conn.execute("SELECT Last_Change_ID FROM mv_state WHERE Id = 1").fetchone()[0]
+        latest = conn.execute("SELECT COALESCE(MAX(Change_ID), ?) FROM mv_change_log", (last,)).fetchone()[0]
+        if latest == last and not full:
+            conn.rollback()
+            return 0
+        if full:
+            for table, _, _, _, _, populate_sql in MATERIALIZED_VIEWS:
+                conn.execute(f"DELETE FROM {table}")
+                conn.execute(populate_sql.format(filter="1"))
+        else:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS mv_affected_food (Food_ID INTEGER PRIMARY KEY)")
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS mv_affected_receiver (Receiver_ID INTEGER PRIMARY KEY)")
+            conn.execute("DELETE FROM temp.mv_affected_food")
+            conn.execute("DELETE FROM temp.mv_affected_receiver")
+            conn.execute('''
+                INSERT OR IGNORE INTO temp.mv_affected_food
+                SELECT Food_ID FROM mv_change_log WHERE Change_ID > ? AND Change_ID <= ? AND Food_ID IS NOT NULL
+            ''', (last, latest))
+            conn.execute('''
+                INSERT OR IGNORE INTO temp.mv_affected_receiver
+                SELECT Receiver_ID FROM mv_change_log WHERE Change_ID > ? AND Change_ID <= ? AND Receiver_ID IS NOT NULL
+            ''', (last, latest))
+            # A changed listing also changes the per-receiver rows of everyone who claimed it
+            conn.execute('''
+                INSERT OR IGNORE INTO temp.mv_affected_receiver
+                SELECT Receiver_ID FROM claims
+                WHERE Food_ID IN (SELECT Food_ID FROM temp.mv_affected_food) AND Receiver_ID IS NOT NULL
+            ''')
+            for table, key, source_key, key_set, _, populate_sql in MATERIALIZED_VIEWS:
+                affected = f"SELECT {key} FROM temp.mv_affected_{key_set}"
+                conn.execute(f"DELETE FROM {table} WHERE {key} IN ({affected})")
+                conn.execute(populate_sql.format(filter=f"{source_key} IN ({affected})"))
+        conn.execute("DELETE FROM mv_change_log WHERE Change_ID <= ?", (latest,))
+        conn.execute("UPDATE mv_state SET Last_Change_ID = ?, Refreshed_At = datetime('now') WHERE Id = 1", (latest,))
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return latest - last
+
+
+def staleness():
+    # When the summary tables were last refreshed (UTC) and how many changes are waiting
+    df = run_query('''
+        SELECT s.Refreshed_At, (SELECT COUNT(*) FROM mv_change_log WHERE Change_ID > s.Last_Change_ID) as Pending_Changes
+        FROM mv_state s
+        WHERE s.Id = 1
+    ''', cache=False)
+    refreshed_at = datetime.strptime(df["Refreshed_At"][0], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    return {
+        "refreshed_at": refreshed_at,
+        "age_seconds": (datetime.now(timezone.utc) - refreshed_at).total_seconds(),
+        "pending_changes": int(df["Pending_Changes"][0]),
+    }
+
+
+def refresh_now(full=False):
+    with track("write", "materialized refresh", (full,)) as call, get_pool().writer() as conn:
+        consumed = call["rows"] = refresh(conn, full)
+    if consumed or full:
+        get_cache().bump(*MV_TABLES)
+    return consumed
+
+
+def ensure_fresh(max_staleness=MAX_STALENESS_SECONDS):
+    # Refresh when changes are pending and the last refresh is older than max_staleness seconds
+    status = staleness()
+    if status["pending_changes"] and status["age_seconds"] > max_staleness:
+        refresh_now()
+        status = staleness()
+    return status
+
+
+def describe_staleness(status):
+    age = int(status["age_seconds"])
+    text = f"Materialized data refreshed {age}s ago"
+    if status["pending_changes"]:
+        text += f" · {status['pending_changes']} change(s) not yet included"
+    return text
+
+
+def has_materialized(name):
+    return name in MATERIALIZED_QUERIES
+
+
+def named_query_sql(name, mode=MATERIALIZED):
+    if mode == MATERIALIZED and name in MATERIALIZED_QUERIES:
+        return MATERIALIZED_QUERIES[name]
+    if name in ENCODED_QUERIES and normalized_storage():
+        return ENCODED_QUERIES[name]
+    return PREDEFINED_QUERIES[name] if name in PREDEFINED_QUERIES else CHART_QUERIES[name]
+
+
+def run_named_query(name, mode=MATERIALIZED):
+    # Run a predefined or chart query, from the summary tables when it has a materialized form,
+    # from the columnar snapshot in SNAPSHOT mode, or fanned out over the shards in SHARDED mode
+    if mode == SNAPSHOT and has_columnar(name):
+        return run_columnar(name)
+    if mode == SHARDED:
+        return run_sharded(name)
+    return run_query(named_query_sql(name, mode))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the materialized analytics tables.")
+    parser.add_argument("command", choices=["refresh", "status"])
+    parser.add_argument("--full", action="store_true", help="recompute every summary row")
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    if args.command == "refresh":
+        consumed = refresh(conn, args.full)
+        print(f"Refreshed materialized views ({'full' if args.full else f'{consumed} change(s)'})")
+    refreshed_at, last = conn.execute("SELECT Refreshed_At, Last_Change_ID FROM mv_state WHERE Id = 1").fetchone()
+    pending = conn.execute("SELECT COUNT(*) FROM mv_change_log WHERE Change_ID > ?", (last,)).fetchone()[0]
+    print(f"Last refresh {refreshed_at} UTC, {pending} change(s) pending")
+    conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
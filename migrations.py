@@ -0,0 +1,501 @@
+import sqlite3
+import sys
+
+from database import DB_PATH, PRIMARY_KEYS, TABLES
+
+# Saved by `normalize.py convert`; while it exists, food_listings and claims are views over encoded tables
+NORMALIZED_STORAGE_TABLE = "normalized_storage_objects"
+
+# Full-text indexed columns: (table, primary key, columns)
+FTS_TABLES = [
+    ("providers", "Provider_ID", ["Name", "Address", "City"]),
+    ("receivers", "Receiver_ID", ["Name", "City"]),
+    ("food_listings", "Food_ID", ["Food_Name", "Location", "Food_Type"]),
+]
+
+
+def fts_statements(table, pk, columns):
+    # External-content FTS5 table kept in sync with its base table by triggers
+    fts = f"{table}_fts"
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"NEW.{column}" for column in columns)
+    old_values = ", ".join(f"OLD.{column}" for column in columns)
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {column_list}, content='{table}', content_rowid='{pk}', prefix='2 3'
+        )""",
+        f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts} (rowid, {column_list}) VALUES (NEW.{pk}, {new_values});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {column_list}) VALUES ('delete', OLD.{pk}, {old_values});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{fts}_update AFTER UPDATE OF {pk}, {column_list} ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {column_list}) VALUES ('delete', OLD.{pk}, {old_values});
+            INSERT INTO {fts} (rowid, {column_list}) VALUES (NEW.{pk}, {new_values});
+        END""",
+    ]
+
+
+# Materialized aggregates behind the heavy analytics queries:
+# (table, key column, source key expression, affected-key set, DDL, populate SQL).
+# The populate SQL recomputes the rows whose source key matches {filter}; "1" recomputes everything.
+MATERIALIZED_VIEWS = [
+    ("mv_food_claims", "Food_ID", "f.Food_ID", "food", """CREATE TABLE IF NOT EXISTS mv_food_claims (
+            Food_ID INTEGER PRIMARY KEY,
+            Food_Name TEXT,
+            Quantity INTEGER,
+            Expiry_Date TEXT,
+            Provider_ID INTEGER,
+            Location TEXT,
+            Food_Type TEXT,
+            Meal_Type TEXT,
+            Claim_Count INTEGER NOT NULL
+        )""", """INSERT INTO mv_food_claims
+            SELECT f.Food_ID, f.Food_Name, f.Quantity, f.Expiry_Date, f.Provider_ID, f.Location, f.Food_Type, f.Meal_Type,
+                   COUNT(c.Claim_ID)
+            FROM food_listings f
+            LEFT JOIN claims c ON f.Food_ID = c.Food_ID
+            WHERE {filter}
+            GROUP BY f.Food_ID"""),
+    ("mv_food_status", "Food_ID", "c.Food_ID", "food", """CREATE TABLE IF NOT EXISTS mv_food_status (
+            Food_ID INTEGER,
+            Status TEXT,
+            Listed INTEGER NOT NULL,
+            Provider_ID INTEGER,
+            Location TEXT,
+            Meal_Type TEXT,
+            Claim_Count INTEGER NOT NULL
+        )""", """INSERT INTO mv_food_status
+            SELECT c.Food_ID, c.Status, f.Food_ID IS NOT NULL, f.Provider_ID, f.Location, f.Meal_Type, COUNT(c.Claim_ID)
+            FROM claims c
+            LEFT JOIN food_listings f ON c.Food_ID = f.Food_ID
+            WHERE {filter}
+            GROUP BY c.Food_ID, c.Status"""),
+    ("mv_receiver_claims", "Receiver_ID", "c.Receiver_ID", "receiver", """CREATE TABLE IF NOT EXISTS mv_receiver_claims (
+            Receiver_ID INTEGER,
+            Listed INTEGER NOT NULL,
+            Food_Type TEXT,
+            Meal_Type TEXT,
+            Claim_Count INTEGER NOT NULL,
+            Quantity_Sum INTEGER,
+            Quantity_Count INTEGER NOT NULL
+        )""", """INSERT INTO mv_receiver_claims
+            SELECT c.Receiver_ID, f.Food_ID IS NOT NULL, f.Food_Type, f.Meal_Type,
+                   COUNT(c.Claim_ID), SUM(f.Quantity), COUNT(f.Quantity)
+            FROM claims c
+            LEFT JOIN food_listings f ON c.Food_ID = f.Food_ID
+            WHERE {filter}
+            GROUP BY c.Receiver_ID, f.Food_ID IS NOT NULL, f.Food_Type, f.Meal_Type"""),
+]
+
+
+def materialized_view_statements():
+    statements = []
+    for _, _, _, _, create_sql, populate_sql in MATERIALIZED_VIEWS:
+        statements += [create_sql, populate_sql.format(filter="1")]
+    return statements + [
+        # Keys touched by writes since the last refresh
+        """CREATE TABLE IF NOT EXISTS mv_change_log (
+            Change_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+            Food_ID INTEGER,
+            Receiver_ID INTEGER
+        )""",
+        """CREATE TABLE IF NOT EXISTS mv_state (
+            Id INTEGER PRIMARY KEY CHECK (Id = 1),
+            Last_Change_ID INTEGER NOT NULL,
+            Refreshed_At TEXT NOT NULL
+        )""",
+        """INSERT OR REPLACE INTO mv_state (Id, Last_Change_ID, Refreshed_At)
+            VALUES (1, COALESCE((SELECT MAX(Change_ID) FROM mv_change_log), 0), datetime('now'))""",
+        "CREATE INDEX IF NOT EXISTS idx_mv_food_status_food ON mv_food_status (Food_ID)",
+        "CREATE INDEX IF NOT EXISTS idx_mv_receiver_claims_receiver ON mv_receiver_claims (Receiver_ID)",
+        """CREATE TRIGGER IF NOT EXISTS trg_claims_mv_insert AFTER INSERT ON claims BEGIN
+            INSERT INTO mv_change_log (Food_ID, Receiver_ID) VALUES (NEW.Food_ID, NEW.Receiver_ID);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_claims_mv_delete AFTER DELETE ON claims BEGIN
+            INSERT INTO mv_change_log (Food_ID, Receiver_ID) VALUES (OLD.Food_ID, OLD.Receiver_ID);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_claims_mv_update AFTER UPDATE ON claims BEGIN
+            INSERT INTO mv_change_log (Food_ID, Receiver_ID) VALUES (OLD.Food_ID, OLD.Receiver_ID);
+            INSERT INTO mv_change_log (Food_ID, Receiver_ID) VALUES (NEW.Food_ID, NEW.Receiver_ID);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_food_listings_mv_insert AFTER INSERT ON food_listings BEGIN
+            INSERT INTO mv_change_log (Food_ID) VALUES (NEW.Food_ID);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_food_listings_mv_delete AFTER DELETE ON food_listings BEGIN
+            INSERT INTO mv_change_log (Food_ID) VALUES (OLD.Food_ID);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_food_listings_mv_update AFTER UPDATE ON food_listings BEGIN
+            INSERT INTO mv_change_log (Food_ID) VALUES (OLD.Food_ID);
+            INSERT INTO mv_change_log (Food_ID) VALUES (NEW.Food_ID);
+        END""",
+    ]
+
+
+# Claim event rollups: (table, bucket width in seconds)
+CLAIM_ROLLUPS = [
+    ("claim_rollup_hourly", 3600),
+    ("claim_rollup_daily", 86400),
+]
+
+
+def archived_key_statements():
+    # Every key moved to the archive (see archive.py), and triggers that refuse to reuse one, whatever
+    # the insert path (CRUD form, batch upload, ingest.py, plain SQL)
+    statements = [
+        """CREATE TABLE IF NOT EXISTS archived_keys (
+            Table_Name TEXT NOT NULL,
+            Row_Key INTEGER NOT NULL,
+            PRIMARY KEY (Table_Name, Row_Key)
+        ) WITHOUT ROWID""",
+    ]
+    for table in ["claims", "food_listings"]:
+        pk = PRIMARY_KEYS[table]
+        check = f"""SELECT RAISE(ABORT, '{table}.{pk} is already used by an archived row')
+            WHERE EXISTS (SELECT 1 FROM archived_keys WHERE Table_Name = '{table}' AND Row_Key = NEW.{pk});"""
+        statements += [
+            f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_archived_key_insert BEFORE INSERT ON {table} BEGIN
+            {check}
+        END""",
+            f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_archived_key_update BEFORE UPDATE OF {pk} ON {table}
+            WHEN NEW.{pk} IS NOT OLD.{pk} BEGIN
+            {check}
+        END""",
+        ]
+    return statements
+
+
+def change_statements():
+    # A change log of (table, primary key) rows plus a version counter per table, both written by triggers.
+    # Change_ID never goes backwards (AUTOINCREMENT), so a table's version is the ID of its last change.
+    statements = [
+        """CREATE TABLE IF NOT EXISTS change_log (
+            Change_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+            Table_Name TEXT NOT NULL,
+            Row_Key INTEGER NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_change_log_table ON change_log (Table_Name, Change_ID)",
+        """CREATE TABLE IF NOT EXISTS change_counters (
+            Table_Name TEXT PRIMARY KEY,
+            Version INTEGER NOT NULL,
+            Changed_At TEXT
+        ) WITHOUT ROWID""",
+    ]
+    for table in TABLES:
+        pk = PRIMARY_KEYS[table]
+        bump = f"""UPDATE change_counters SET Version = (SELECT MAX(Change_ID) FROM change_log), Changed_At = datetime('now')
+            WHERE Table_Name = '{table}';"""
+        statements += [
+            f"INSERT OR IGNORE INTO change_counters (Table_Name, Version) VALUES ('{table}', 0)",
+            f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_change_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO change_log (Table_Name, Row_Key) VALUES ('{table}', NEW.{pk});
+            {bump}
+        END""",
+            f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_change_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO change_log (Table_Name, Row_Key) VALUES ('{table}', OLD.{pk});
+            {bump}
+        END""",
+            # A changed primary key is logged under both keys
+            f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_change_update AFTER UPDATE ON {table} BEGIN
+            INSERT INTO change_log (Table_Name, Row_Key) VALUES ('{table}', OLD.{pk});
+            INSERT INTO change_log (Table_Name, Row_Key) SELECT '{table}', NEW.{pk} WHERE NEW.{pk} IS NOT OLD.{pk};
+            {bump}
+        END""",
+        ]
+    return statements
+
+
+def claim_event_statements():
+    # Append-only log of claim status transitions with integer (UTC epoch) times, plus rollup
+    # tables counting transitions into each status per time bucket, city (listing Location) and meal type.
+    # Claim Timestamps are read as UTC; unparseable ones fall back to the time of the write.
+    listing = "(SELECT {column} FROM food_listings WHERE Food_ID = {row}.Food_ID)"
+    event_columns = "Claim_ID, Food_ID, Receiver_ID, Old_Status, New_Status, Event_Time, City, Meal_Type"
+    statements = [
+        """CREATE TABLE IF NOT EXISTS claim_events (
+            Event_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+            Claim_ID INTEGER NOT NULL,
+            Food_ID INTEGER,
+            Receiver_ID INTEGER,
+            Old_Status TEXT,
+            New_Status TEXT,
+            Event_Time INTEGER NOT NULL,
+            City TEXT,
+            Meal_Type TEXT
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_claim_events_time ON claim_events (Event_Time)",
+        "CREATE INDEX IF NOT EXISTS idx_claim_events_claim ON claim_events (Claim_ID, Event_ID)",
+        """CREATE TRIGGER IF NOT EXISTS trg_claim_events_no_update BEFORE UPDATE ON claim_events BEGIN
+            SELECT RAISE(ABORT, 'claim_events is append-only');
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_claim_events_no_delete BEFORE DELETE ON claim_events BEGIN
+            SELECT RAISE(ABORT, 'claim_events is append-only');
+        END""",
+    ]
+    for table, width in CLAIM_ROLLUPS:
+        statements += [
+            f"""CREATE TABLE IF NOT EXISTS {table} (
+                Bucket INTEGER NOT NULL,
+                City TEXT NOT NULL,
+                Status TEXT NOT NULL,
+                Meal_Type TEXT NOT NULL,
+                Event_Count INTEGER NOT NULL,
+                PRIMARY KEY (Bucket, City, Status, Meal_Type)
+            ) WITHOUT ROWID""",
+            f"""CREATE TRIGGER IF NOT EXISTS trg_claim_events_{table} AFTER INSERT ON claim_events
+            WHEN NEW.New_Status IS NOT NULL BEGIN
+                INSERT INTO {table} (Bucket, City, Status, Meal_Type, Event_Count)
+                VALUES (NEW.Event_Time - NEW.Event_Time % {width}, COALESCE(NEW.City, ''), NEW.New_Status,
+                        COALESCE(NEW.Meal_Type, ''), 1)
+                ON CONFLICT (Bucket, City, Status, Meal_Type) DO UPDATE SET Event_Count = Event_Count + 1;
+            END""",
+        ]
+    return statements + [
+        # History before this migration is unknown: one creation event per existing claim
+        f"""INSERT INTO claim_events ({event_columns})
+            SELECT c.Claim_ID, c.Food_ID, c.Receiver_ID, NULL, c.Status,
+                   COALESCE(CAST(strftime('%s', c.Timestamp) AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER)),
+                   f.Location, f.Meal_Type
+            FROM claims c
+            LEFT JOIN food_listings f ON c.Food_ID = f.Food_ID
+            ORDER BY c.Claim_ID""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_claims_events_insert AFTER INSERT ON claims BEGIN
+            INSERT INTO claim_events ({event_columns}) VALUES (
+                NEW.Claim_ID, NEW.Food_ID, NEW.Receiver_ID, NULL, NEW.Status,
+                COALESCE(CAST(strftime('%s', NEW.Timestamp) AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER)),
+                {listing.format(column="Location", row="NEW")}, {listing.format(column="Meal_Type", row="NEW")});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_claims_events_update AFTER UPDATE OF Status ON claims
+        WHEN OLD.Status IS NOT NEW.Status BEGIN
+            INSERT INTO claim_events ({event_columns}) VALUES (
+                NEW.Claim_ID, NEW.Food_ID, NEW.Receiver_ID, OLD.Status, NEW.Status, CAST(strftime('%s', 'now') AS INTEGER),
+                {listing.format(column="Location", row="NEW")}, {listing.format(column="Meal_Type", row="NEW")});
+        END""",
+        # Deletions are logged with a NULL New_Status and are not counted in the rollups
+        f"""CREATE TRIGGER IF NOT EXISTS trg_claims_events_delete AFTER DELETE ON claims BEGIN
+            INSERT INTO claim_events ({event_columns}) VALUES (
+                OLD.Claim_ID, OLD.Food_ID, OLD.Receiver_ID, OLD.Status, NULL, CAST(strftime('%s', 'now') AS INTEGER),
+                {listing.format(column="Location", row="OLD")}, {listing.format(column="Meal_Type", row="OLD")});
+        END""",
+    ]
+
+
+# Versioned schema migrations, tracked with PRAGMA user_version.
+# Each entry is (version, description, statements). Append new versions at the end;
+# never edit a migration that has already been applied to a database.
+MIGRATIONS = [
+    (1, "Secondary indexes for joins, filters and recent-claims ordering", [
+        # claims joins to food_listings (Q9, Q10, Q13, Q15, Q17, Q18, Q22, Q24) and receivers (Q5, Q12, Q16, Q19-Q21)
+        "CREATE INDEX IF NOT EXISTS idx_claims_food ON claims (Food_ID, Status, Receiver_ID)",
+        "CREATE INDEX IF NOT EXISTS idx_claims_receiver ON claims (Receiver_ID, Food_ID)",
+        "CREATE INDEX IF NOT EXISTS idx_claims_status ON claims (Status)",
+        # Statistics Dashboard "Recent Claims" (ORDER BY Timestamp DESC LIMIT 5)
+        "CREATE INDEX IF NOT EXISTS idx_claims_timestamp ON claims (Timestamp)",
+        # food_listings joins to providers (Q10, Q14, Q15, Q23) and GROUP BY columns (Q3, Q7, Q8, Q13, Q22, Q24)
+        "CREATE INDEX IF NOT EXISTS idx_food_listings_provider ON food_listings (Provider_ID, Quantity)",
+        "CREATE INDEX IF NOT EXISTS idx_food_listings_provider_type ON food_listings (Provider_Type)",
+        "CREATE INDEX IF NOT EXISTS idx_food_listings_location ON food_listings (Location)",
+        "CREATE INDEX IF NOT EXISTS idx_food_listings_food_type ON food_listings (Food_Type, Quantity)",
+        "CREATE INDEX IF NOT EXISTS idx_food_listings_meal_type ON food_listings (Meal_Type)",
+        # Covers the unclaimed-listings query (Q18) and its chart, which orders by Quantity
+        "CREATE INDEX IF NOT EXISTS idx_food_listings_quantity ON food_listings (Quantity, Food_Name, Expiry_Date)",
+        # City filters and GROUP BY City (Q1, Q2, Q4, Q19)
+        "CREATE INDEX IF NOT EXISTS idx_providers_city ON providers (City)",
+        "CREATE INDEX IF NOT EXISTS idx_receivers_city ON receivers (City)",
+        "ANALYZE",
+    ]),
+    (2, "Trigger-maintained summary tables for the Statistics Dashboard", [
+        "CREATE INDEX IF NOT EXISTS idx_food_listings_expiry ON food_listings (Expiry_Date, Quantity)",
+        """CREATE TABLE IF NOT EXISTS dashboard_summary (
+            Metric TEXT PRIMARY KEY,
+            Value INTEGER NOT NULL DEFAULT 0
+        )""",
+        """CREATE TABLE IF NOT EXISTS dashboard_daily_claims (
+            Day TEXT NOT NULL,
+            Status TEXT NOT NULL,
+            Claim_Count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (Day, Status)
+        )""",
+        # Backfill from the current data
+        """INSERT OR REPLACE INTO dashboard_summary (Metric, Value) VALUES
+            ('providers_rows', (SELECT COUNT(*) FROM providers)),
+            ('receivers_rows', (SELECT COUNT(*) FROM receivers)),
+            ('food_listings_rows', (SELECT COUNT(*) FROM food_listings)),
+            ('claims_rows', (SELECT COUNT(*) FROM claims)),
+            ('quantity_listed', (SELECT COALESCE(SUM(Quantity), 0) FROM food_listings)),
+            ('quantity_claimed', (SELECT COALESCE(SUM(f.Quantity), 0)
+                                  FROM claims c JOIN food_listings f ON c.Food_ID = f.Food_ID
+                                  WHERE c.Status = 'Completed'))""",
+        """INSERT OR REPLACE INTO dashboard_daily_claims (Day, Status, Claim_Count)
+            SELECT date(Timestamp), Status, COUNT(*) FROM claims
+            WHERE date(Timestamp) IS NOT NULL AND Status IS NOT NULL
+            GROUP BY date(Timestamp), Status""",
+        # Row counts
+        *[statement
+          for table in ["providers", "receivers", "food_listings", "claims"]
+          for statement in (
+              f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_summary_insert AFTER INSERT ON {table} BEGIN
+                  UPDATE dashboard_summary SET Value = Value + 1 WHERE Metric = '{table}_rows';
+              END""",
+              f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_summary_delete AFTER DELETE ON {table} BEGIN
+                  UPDATE dashboard_summary SET Value = Value - 1 WHERE Metric = '{table}_rows';
+              END""",
+          )],
+        # Quantity listed, and quantity claimed (listing quantity summed over Completed claims)
+        """CREATE TRIGGER IF NOT EXISTS trg_food_listings_quantity_insert AFTER INSERT ON food_listings BEGIN
+            UPDATE dashboard_summary SET Value = Value + COALESCE(NEW.Quantity, 0) WHERE Metric = 'quantity_listed';
+            UPDATE dashboard_summary SET Value = Value + COALESCE(NEW.Quantity, 0) *
+                (SELECT COUNT(*) FROM claims WHERE Food_ID = NEW.Food_ID AND Status = 'Completed')
+            WHERE Metric = 'quantity_claimed';
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_food_listings_quantity_delete AFTER DELETE ON food_listings BEGIN
+            UPDATE dashboard_summary SET Value = Value - COALESCE(OLD.Quantity, 0) WHERE Metric = 'quantity_listed';
+            UPDATE dashboard_summary SET Value = Value - COALESCE(OLD.Quantity, 0) *
+                (SELECT COUNT(*) FROM claims WHERE Food_ID = OLD.Food_ID AND Status = 'Completed')
+            WHERE Metric = 'quantity_claimed';
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_food_listings_quantity_update AFTER UPDATE OF Quantity ON food_listings BEGIN
+            UPDATE dashboard_summary SET Value = Value + COALESCE(NEW.Quantity, 0) - COALESCE(OLD.Quantity, 0)
+            WHERE Metric = 'quantity_listed';
+            UPDATE dashboard_summary SET Value = Value + (COALESCE(NEW.Quantity, 0) - COALESCE(OLD.Quantity, 0)) *
+                (SELECT COUNT(*) FROM claims WHERE Food_ID = NEW.Food_ID AND Status = 'Completed')
+            WHERE Metric = 'quantity_claimed';
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_claims_quantity_insert AFTER INSERT ON claims
+        WHEN NEW.Status = 'Completed' BEGIN
+            UPDATE dashboard_summary SET Value = Value +
+                COALESCE((SELECT Quantity FROM food_listings WHERE Food_ID = NEW.Food_ID), 0)
+            WHERE Metric = 'quantity_claimed';
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_claims_quantity_delete AFTER DELETE ON claims
+        WHEN OLD.Status = 'Completed' BEGIN
+            UPDATE dashboard_summary SET Value = Value -
+                COALESCE((SELECT Quantity FROM food_listings WHERE Food_ID = OLD.Food_ID), 0)
+            WHERE Metric = 'quantity_claimed';
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_claims_quantity_update AFTER UPDATE OF Status, Food_ID ON claims BEGIN
+            UPDATE dashboard_summary SET Value = Value
+                - CASE WHEN OLD.Status = 'Completed'
+                       THEN COALESCE((SELECT Quantity FROM food_listings WHERE Food_ID = OLD.Food_ID), 0) ELSE 0 END
+                + CASE WHEN NEW.Status = 'Completed'
+                       THEN COALESCE((SELECT Quantity FROM food_listings WHERE Food_ID = NEW.Food_ID), 0) ELSE 0 END
+            WHERE Metric = 'quantity_claimed';
+        END""",
+        # Claims per day and status
+        """CREATE TRIGGER IF NOT EXISTS trg_claims_daily_insert AFTER INSERT ON claims
+        WHEN date(NEW.Timestamp) IS NOT NULL AND NEW.Status IS NOT NULL BEGIN
+            INSERT INTO dashboard_daily_claims (Day, Status, Claim_Count) VALUES (date(NEW.Timestamp), NEW.Status, 1)
+            ON CONFLICT (Day, Status) DO UPDATE SET Claim_Count = Claim_Count + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_claims_daily_delete AFTER DELETE ON claims
+        WHEN date(OLD.Timestamp) IS NOT NULL AND OLD.Status IS NOT NULL BEGIN
+            UPDATE dashboard_daily_claims SET Claim_Count = Claim_Count - 1
+            WHERE Day = date(OLD.Timestamp) AND Status = OLD.Status;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_claims_daily_update AFTER UPDATE OF Status, Timestamp ON claims BEGIN
+            UPDATE dashboard_daily_claims SET Claim_Count = Claim_Count - 1
+            WHERE Day = date(OLD.Timestamp) AND Status = OLD.Status;
+            INSERT INTO dashboard_daily_claims (Day, Status, Claim_Count)
+            SELECT date(NEW.Timestamp), NEW.Status, 1
+            WHERE date(NEW.Timestamp) IS NOT NULL AND NEW.Status IS NOT NULL
+            ON CONFLICT (Day, Status) DO UPDATE SET Claim_Count = Claim_Count + 1;
+        END""",
+    ]),
+    (3, "FTS5 full-text indexes over providers, receivers and food listings", [
+        statement
+        for table, pk, columns in FTS_TABLES
+        for statement in fts_statements(table, pk, columns)
+    ]),
+    (4, "Materialized aggregates for the analytics queries, with a change log for incremental refresh",
+     materialized_view_statements()),
+    (5, "Append-only claim event log with hourly and daily rollups", claim_event_statements()),
+    (6, "Undo journal for batch CRUD operations", [
+        """CREATE TABLE IF NOT EXISTS undo_batches (
+            Batch_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+            Table_Name TEXT NOT NULL,
+            Action TEXT NOT NULL,
+            Row_Count INTEGER NOT NULL,
+            Created_At TEXT NOT NULL DEFAULT (datetime('now')),
+            Undone_At TEXT
+        )""",
+        # One row per touched record: its key, and its previous values as JSON (NULL for inserts)
+        """CREATE TABLE IF NOT EXISTS undo_journal (
+            Batch_ID INTEGER NOT NULL REFERENCES undo_batches (Batch_ID),
+            Row_Key INTEGER NOT NULL,
+            Old_Row TEXT,
+            PRIMARY KEY (Batch_ID, Row_Key)
+        ) WITHOUT ROWID""",
+    ]),
+    (7, "City coordinates with an R*Tree index for distance queries", [
+        """CREATE TABLE IF NOT EXISTS city_coordinates (
+            City_ID INTEGER PRIMARY KEY,
+            City TEXT NOT NULL UNIQUE,
+            Latitude REAL NOT NULL,
+            Longitude REAL NOT NULL
+        )""",
+        # One point (a zero-size box) per city, kept in step with city_coordinates by triggers
+        "CREATE VIRTUAL TABLE IF NOT EXISTS city_rtree USING rtree (City_ID, Min_Lat, Max_Lat, Min_Lon, Max_Lon)",
+        """CREATE TRIGGER IF NOT EXISTS trg_city_coordinates_insert AFTER INSERT ON city_coordinates BEGIN
+            INSERT INTO city_rtree VALUES (NEW.City_ID, NEW.Latitude, NEW.Latitude, NEW.Longitude, NEW.Longitude);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_city_coordinates_update AFTER UPDATE ON city_coordinates BEGIN
+            DELETE FROM city_rtree WHERE City_ID = OLD.City_ID;
+            INSERT INTO city_rtree VALUES (NEW.City_ID, NEW.Latitude, NEW.Latitude, NEW.Longitude, NEW.Longitude);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_city_coordinates_delete AFTER DELETE ON city_coordinates BEGIN
+            DELETE FROM city_rtree WHERE City_ID = OLD.City_ID;
+        END""",
+    ]),
+    (8, "Per-table change counters and a row change log for change notifications", change_statements()),
+    (9, "Highest archived primary key per table, so archived keys are never handed out again", [
+        # Raised by archive.py as rows move out; crud.assign_keys starts above it
+        """CREATE TABLE IF NOT EXISTS key_floors (
+            Table_Name TEXT PRIMARY KEY,
+            Max_Key INTEGER NOT NULL
+        ) WITHOUT ROWID""",
+    ]),
+    (10, "Archived primary keys, with triggers that reject inserting them again", archived_key_statements()),
+]
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(conn):
+    # Apply every pending migration in its own transaction and return the versions applied
+    pending = [version for version, _, _ in MIGRATIONS if version > current_version(conn)]
+    if pending and conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (NORMALIZED_STORAGE_TABLE,)).fetchone():
+        # Migrations add triggers and indexes to the plain tables
+        raise sqlite3.OperationalError(
+            f"the database uses normalized storage; run `python normalize.py migrate` to apply migration(s) {pending}")
+    applied = []
+    for version, description, statements in MIGRATIONS:
+        if version <= current_version(conn):
+            continue
+        try:
+            conn.execute("BEGIN")
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+if __name__ == "__main__":
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DB_PATH
+    conn = sqlite3.connect(db_path)
+    applied = apply_migrations(conn)
+    if applied:
+        for version, description, _ in MIGRATIONS:
+            if version in applied:
+                print(f"Applied migration {version}: {description}")
+    else:
+        print(f"{db_path} is up to date (version {current_version(conn)})")
+    conn.close()
@@ -0,0 +1,410 @@
+import argparse
+import functools
+import json
+import os
+import re
+import sqlite3
+import time
+
+from connection_pool import get_pool
+from database import DB_PATH, PRIMARY_KEYS
+from migrations import NORMALIZED_STORAGE_TABLE, apply_migrations
+from queries import PREDEFINED_QUERIES
+from query_cache import register_derived_table
+
+# Normalized storage: each low-cardinality text column is stored as an integer key into a lookup
+# table, in <table>_store. A view with the original name and columns decodes the keys, and INSTEAD OF
+# triggers on the view encode writes, so queries, CRUD and CSV exports keep working unchanged.
+ENCODED_COLUMNS = {
+    "food_listings": ["Provider_Type", "Location", "Food_Type", "Meal_Type"],
+    "claims": ["Status"],
+}
+STORE_SUFFIX = "_store"
+SAVED_TABLE = NORMALIZED_STORAGE_TABLE   # original table, index and trigger SQL, for restore
+DEFAULT_REPEAT = 5
+
+for _table, _columns in ENCODED_COLUMNS.items():
+    register_derived_table(f"{_table}{STORE_SUFFIX}", [_table])
+    for _column in _columns:
+        register_derived_table(f"lk_{_column.lower()}", [_table])
+
+# Forms of the GROUP BY queries that group on the integer keys and decode only the result rows.
+# The same queries through the views decode every row first.
+ENCODED_QUERIES = {
+    "Q3: Top 3 provider types by listings": '''
+        SELECT (SELECT Value FROM lk_provider_type WHERE ID = Provider_Type_ID) as Provider_Type, COUNT(*) as Listing_Count
+        FROM food_listings_store
+        GROUP BY Provider_Type_ID
+        ORDER BY Listing_Count DESC
+        LIMIT 3
+    ''',
+    "Q7: City with most listings": '''
+        SELECT (SELECT Value FROM lk_location WHERE ID = Location_ID) as Location, COUNT(*) as Listing_Count
+        FROM food_listings_store
+        GROUP BY Location_ID
+        ORDER BY Listing_Count DESC
+        LIMIT 1
+    ''',
+    "Q8: Most common food types": '''
+        SELECT (SELECT Value FROM lk_food_type WHERE ID = Food_Type_ID) as Food_Type, COUNT(*) as Listing_Count
+        FROM food_listings_store
+        GROUP BY Food_Type_ID
+        ORDER BY Listing_Count DESC
+    ''',
+    "Q13: Most claimed meal type": '''
+        SELECT (SELECT Value FROM lk_meal_type WHERE ID = f.Meal_Type_ID) as Meal_Type, COUNT(c.Claim_ID) as Claim_Count
+        FROM food_listings_store f
+        JOIN claims_store c ON f.Food_ID = c.Food_ID
+        GROUP BY f.Meal_Type_ID
+        ORDER BY Claim_Count DESC
+        LIMIT 1
+    ''',
+    "Q17: Claims by meal type and status": '''
+        SELECT (SELECT Value FROM lk_meal_type WHERE ID = f.Meal_Type_ID) as Meal_Type,
+               (SELECT Value FROM lk_status WHERE ID = c.Status_ID) as Status, COUNT(c.Claim_ID) as Claim_Count
+        FROM food_listings_store f
+        JOIN claims_store c ON f.Food_ID = c.Food_ID
+        GROUP BY f.Meal_Type_ID, c.Status_ID
+        ORDER BY Claim_Count DESC
+    ''',
+    "Q22: Claims by city": '''
+        SELECT (SELECT Value FROM lk_location WHERE ID = f.Location_ID) as Location, COUNT(c.Claim_ID) as Claim_Count
+        FROM food_listings_store f
+        JOIN claims_store c ON f.Food_ID = c.Food_ID
+        GROUP BY f.Location_ID
+        ORDER BY Claim_Count DESC
+    ''',
+}
+
+
+def lookup_table(column):
+    return f"lk_{column.lower()}"
+
+
+def store_table(table):
+    return f"{table}{STORE_SUFFIX}"
+
+
+def is_normalized(conn, table="food_listings"):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'view' AND name = ?", (table,)).fetchone() is not None
+
+
+@functools.cache
+def normalized_storage():
+    # Checked once per process: convert and restore are run offline, with the app stopped
+    with get_pool().reader() as conn:
+        return is_normalized(conn)
+
+
+def _decode(column, row):
+    return f"(SELECT Value FROM {lookup_table(column)} WHERE ID = {row}.{column}_ID)"
+
+
+def _encode(column, row):
+    return f"(SELECT ID FROM {lookup_table(column)} WHERE Value IS {row}.{column})"
+
+
+def _rename_columns(sql, columns):
+    for column in columns:
+        sql = re.sub(rf"\b{column}\b", f"{column}_ID", sql)
+    return sql
+
+
+def _rewrite_index(sql, table, columns):
+    # CREATE INDEX name ON table (...) -> the same index on the store table's key columns
+    head, tail = re.split(rf"\bON\s+{table}\b", sql, maxsplit=1)
+    return f"{head}ON {store_table(table)}{_rename_columns(tail, columns)}"
+
+
+def _rewrite_trigger(sql, table, columns):
+    # Same trigger on the store table: UPDATE OF lists name the key columns, and NEW./OLD. references
+    # to an encoded column look the value up
+    header, body = re.split(r"\bBEGIN\b", sql, maxsplit=1)
+    header = re.sub(rf"\bON\s+{table}\b", f"ON {store_table(table)}", header, count=1)
+    update_of = re.search(r"\bUPDATE\s+OF\s+(.*?)\s+ON\b", header, re.S)
+    if update_of:
+        start, end = update_of.span(1)
+        header = header[:start] + _rename_columns(update_of.group(1), columns) + header[end:]
+    sql = f"{header}BEGIN{body}"
+    for column in columns:
+        sql = re.sub(rf"\b(NEW|OLD)\.{column}\b", lambda m: _decode(column, m.group(1)), sql)
+    return sql
+
+
+def _table_info(conn, table):
+    return [(row[1], row[2], row[5]) for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _store_ddl(conn, table):
+    columns = ENCODED_COLUMNS[table]
+    definitions = []
+    for name, column_type, pk in _table_info(conn, table):
+        if name in columns:
+            definitions.append(f"{name}_ID INTEGER NOT NULL REFERENCES {lookup_table(name)}(ID)")
+        else:
+            definitions.append(f"{name} {column_type}{' PRIMARY KEY' if pk else ''}")
+    for row in conn.execute(f"PRAGMA foreign_key_list({table})"):
+        parent = store_table(row[2]) if row[2] in ENCODED_COLUMNS else row[2]
+        definitions.append(f"FOREIGN KEY ({row[3]}) REFERENCES {parent}({row[4]})")
+    return f"CREATE TABLE {store_table(table)} (\n    " + ",\n    ".join(definitions) + "\n)"
+
+
+def _view_statements(conn, table):
+    # The compatibility view and its INSTEAD OF triggers, in the original column order
+    pk = PRIMARY_KEYS[table]
+    columns = ENCODED_COLUMNS[table]
+    names = [name for name, _, _ in _table_info(conn, table)]
+    selected = [f"l{names.index(name)}.Value AS {name}" if name in columns else f"s.{name}" for name in names]
+    # LEFT JOINs keep the store table as the outer loop, so an unfiltered scan decodes each row with
+    # primary-key lookups in rowid order; a filter on a decoded column still turns the join around
+    # and uses the lookup table's unique index, then the store's index on the key column
+    joins = [f"LEFT JOIN {lookup_table(name)} l{names.index(name)} ON l{names.index(name)}.ID = s.{name}_ID"
+             for name in names if name in columns]
+    stored = [f"{name}_ID" if name in columns else name for name in names]
+    values = [_encode(name, "NEW") if name in columns else f"NEW.{name}" for name in names]
+    add_lookups = "\n".join(
+        f"    INSERT INTO {lookup_table(name)} (Value) SELECT NEW.{name}\n"
+        f"    WHERE NOT EXISTS (SELECT 1 FROM {lookup_table(name)} WHERE Value IS NEW.{name});"
+        for name in columns)
+    store = store_table(table)
+    return [
+        f"CREATE VIEW {table} AS\nSELECT {', '.join(selected)}\nFROM {store} s\n" + "\n".join(joins),
+        f"CREATE TRIGGER trg_{table}_view_insert INSTEAD OF INSERT ON {table} BEGIN\n{add_lookups}\n"
+        f"    INSERT INTO {store} ({', '.join(stored)}) VALUES ({', '.join(values)});\nEND",
+        f"CREATE TRIGGER trg_{table}_view_update INSTEAD OF UPDATE ON {table} BEGIN\n{add_lookups}\n"
+        f"    UPDATE {store} SET {', '.join(f'{name} = {value}' for name, value in zip(stored, values))}\n"
+        f"    WHERE {pk} = OLD.{pk};\nEND",
+        f"CREATE TRIGGER trg_{table}_view_delete INSTEAD OF DELETE ON {table} BEGIN\n"
+        f"    DELETE FROM {store} WHERE {pk} = OLD.{pk};\nEND",
+    ]
+
+
+def _dependents(conn, table):
+    return conn.execute(
+        "SELECT type, name, sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+        (table,)).fetchall()
+
+
+def convert(conn):
+    # Switch an up-to-date database to normalized storage in one transaction. Returns the lookup sizes.
+    if is_normalized(conn):
+        raise ValueError("the database already uses normalized storage")
+    apply_migrations(conn)
+    sizes = {}
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(f"""CREATE TABLE {SAVED_TABLE} (
+            Position INTEGER PRIMARY KEY,
+            Type TEXT NOT NULL,
+            Name TEXT NOT NULL,
+            Table_Name TEXT NOT NULL,
+            Sql TEXT NOT NULL
+        )""")
+        for table, columns in ENCODED_COLUMNS.items():
+            table_sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+            dependents = _dependents(conn, table)
+            conn.executemany(f"INSERT INTO {SAVED_TABLE} (Type, Name, Table_Name, Sql) VALUES (?, ?, ?, ?)",
+                             [("table", table, table, table_sql)] + [(kind, name, table, sql) for kind, name, sql in dependents])
+            for column in columns:
+                lookup = lookup_table(column)
+                conn.execute(f"CREATE TABLE {lookup} (ID INTEGER PRIMARY KEY, Value TEXT UNIQUE)")
+                conn.execute(f"INSERT INTO {lookup} (Value) SELECT DISTINCT {column} FROM {table} ORDER BY 1")
+                sizes[f"{table}.{column}"] = conn.execute(f"SELECT COUNT(*) FROM {lookup}").fetchone()[0]
+            view_statements = _view_statements(conn, table)
+            names = [name for name, _, _ in _table_info(conn, table)]
+            conn.execute(_store_ddl(conn, table))
+            conn.execute(
+                f"INSERT INTO {store_table(table)} SELECT "
+                + ", ".join(_encode(name, "t") if name in columns else f"t.{name}" for name in names)
+                + f" FROM {table} t")
+            conn.execute(f"DROP TABLE {table}")
+            for statement in view_statements:
+                conn.execute(statement)
+            for kind, _, sql in dependents:
+                conn.execute(_rewrite_index(sql, table, columns) if kind == "index" else _rewrite_trigger(sql, table, columns))
+        conn.execute("ANALYZE")
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    conn.execute("VACUUM")
+    return sizes
+
+
+def restore(conn):
+    # Back to plain tables, with the original indexes and triggers
+    if not is_normalized(conn):
+        raise ValueError("the database does not use normalized storage")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        saved = conn.execute(f"SELECT Type, Name, Table_Name, Sql FROM {SAVED_TABLE} ORDER BY Position").fetchall()
+        for table, columns in ENCODED_COLUMNS.items():
+            conn.execute(f"CREATE TEMP TABLE restore_{table} AS SELECT * FROM {table}")
+            conn.execute(f"DROP VIEW {table}")
+            conn.execute(f"DROP TABLE {store_table(table)}")
+            conn.execute(next(sql for kind, name, _, sql in saved if kind == "table" and name == table))
+            conn.execute(f"INSERT INTO {table} SELECT * FROM temp.restore_{table}")
+            conn.execute(f"DROP TABLE temp.restore_{table}")
+            for column in columns:
+                conn.execute(f"DROP TABLE {lookup_table(column)}")
+        for kind, _, _, sql in saved:
+            if kind != "table":
+                conn.execute(sql)
+        conn.execute(f"DROP TABLE {SAVED_TABLE}")
+        conn.execute("ANALYZE")
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    conn.execute("VACUUM")
+
+
+def migrate(conn):
+    # Migrations target the plain tables, so a normalized database is restored, migrated and converted
+    # again. Returns the versions applied.
+    if not is_normalized(conn):
+        return apply_migrations(conn)
+    restore(conn)
+    applied = apply_migrations(conn)
+    convert(conn)
+    return applied
+
+
+def copy_database(source, target):
+    # Consistent copy through the backup API, safe while the app is running
+    if os.path.exists(target):
+        raise ValueError(f"{target} already exists")
+    src, dst = sqlite3.connect(source), sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+# Report
+def used_bytes(path):
+    # File size without free pages, so a database that was never vacuumed is compared fairly
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    page_size, page_count, free = (conn.execute(f"PRAGMA {name}").fetchone()[0]
+                                   for name in ("page_size", "page_count", "freelist_count"))
+    conn.close()
+    return (page_count - free) * page_size
+
+
+def table_bytes(path):
+    # Bytes per table or index, grouping a normalized table with its store and lookup tables
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").fetchall()
+        tables = dict(conn.execute("SELECT name, tbl_name FROM sqlite_master WHERE type IN ('table', 'index')").fetchall())
+    except sqlite3.OperationalError:
+        return {}   # SQLite built without the dbstat table
+    finally:
+        conn.close()
+    lookups = {lookup_table(column): table for table, columns in ENCODED_COLUMNS.items() for column in columns}
+    sizes = {}
+    for name, size in rows:
+        owner = tables.get(name, name)
+        owner = lookups.get(owner, owner[:-len(STORE_SUFFIX)] if owner.endswith(STORE_SUFFIX) else owner)
+        if owner in ENCODED_COLUMNS:
+            sizes[owner] = sizes.get(owner, 0) + size
+    return sizes
+
+
+def time_queries(path, queries, repeat=DEFAULT_REPEAT):
+    # Best of `repeat` runs per query in ms, after one warm-up run
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    timings = {}
+    for name, sql in queries.items():
+        conn.execute(sql).fetchall()
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            conn.execute(sql).fetchall()
+            runs.append((time.perf_counter() - started) * 1000)
+        timings[name] = min(runs)
+    conn.close()
+    return timings
+
+
+def report(original, normalized, repeat=DEFAULT_REPEAT):
+    # Sizes, and each query timed on the original tables, through the views and in its encoded form
+    live = {name: PREDEFINED_QUERIES[name] for name in ENCODED_QUERIES}
+    before = time_queries(original, live, repeat)
+    views = time_queries(normalized, live, repeat)
+    encoded = time_queries(normalized, ENCODED_QUERIES, repeat)
+    return {
+        "bytes": {"original": used_bytes(original), "normalized": used_bytes(normalized)},
+        "table_bytes": {"original": table_bytes(original), "normalized": table_bytes(normalized)},
+        "queries": {name: {"original_ms": round(before[name], 3), "view_ms": round(views[name], 3),
+                           "encoded_ms": round(encoded[name], 3)} for name in live},
+    }
+
+
+def _print_report(result):
+    def change(old, new):
+        return f"{(new - old) / old:+.0%}" if old else "n/a"
+    for label, values in [("Database", result["bytes"])] + [
+            (table, {"original": result["table_bytes"]["original"].get(table, 0),
+                     "normalized": result["table_bytes"]["normalized"].get(table, 0)})
+            for table in ENCODED_COLUMNS if result["table_bytes"]["original"]]:
+        print(f"{label:<40} {values['original'] / 1024:>10.0f} KiB -> {values['normalized'] / 1024:>10.0f} KiB"
+              f"  {change(values['original'], values['normalized'])}")
+    print(f"{'Query (ms)':<40} {'original':>10} {'view':>10} {'encoded':>10}")
+    for name, timing in result["queries"].items():
+        print(f"{name:<40} {timing['original_ms']:>10.3f} {timing['view_ms']:>10.3f} {timing['encoded_ms']:>10.3f}"
+              f"  {change(timing['original_ms'], timing['encoded_ms'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dictionary-encoded storage for low-cardinality text columns")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert_parser = sub.add_parser("convert", help="switch a database to normalized storage")
+    convert_parser.add_argument("db", nargs="?", default=DB_PATH)
+    convert_parser.add_argument("--output", help="convert a copy written here and leave the database untouched")
+    restore_parser = sub.add_parser("restore", help="switch a normalized database back to plain tables")
+    restore_parser.add_argument("db", nargs="?", default=DB_PATH)
+    migrate_parser = sub.add_parser("migrate", help="apply pending migrations to a normalized database")
+    migrate_parser.add_argument("db", nargs="?", default=DB_PATH)
+    status_parser = sub.add_parser("status", help="show the storage mode")
+    status_parser.add_argument("db", nargs="?", default=DB_PATH)
+    report_parser = sub.add_parser("report", help="compare size and query times of a database and its normalized copy")
+    report_parser.add_argument("original")
+    report_parser.add_argument("normalized")
+    report_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    report_parser.add_argument("--report", help="also write the comparison to this JSON file")
+    args = parser.parse_args()
+
+    if args.command == "report":
+        result = report(args.original, args.normalized, args.repeat)
+        _print_report(result)
+        if args.report:
+            with open(args.report, "w") as f:
+                json.dump(result, f, indent=2)
+        return
+    path = args.db
+    try:
+        if args.command == "convert" and args.output:
+            copy_database(path, args.output)
+            path = args.output
+        conn = sqlite3.connect(path, isolation_level=None)
+        if args.command == "status":
+            print(f"{path}: {'normalized' if is_normalized(conn) else 'plain'} storage")
+        elif args.command == "convert":
+            for column, size in convert(conn).items():
+                print(f"{column:<28} {size:>6} distinct values")
+            print(f"{path} now uses normalized storage")
+        elif args.command == "migrate":
+            applied = migrate(conn)
+            print(f"Applied migration(s) {applied} to {path}" if applied else f"{path} is up to date")
+        else:
+            restore(conn)
+            print(f"{path} uses plain tables again")
+        conn.close()
+    except (sqlite3.Error, ValueError) as e:
+        parser.exit(1, f"{e}\n")
+
+
+if __name__ == "__main__":
+    main()
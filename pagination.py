@@ -0,0 +1,180 @@
+import sqlite3
+
+import pandas as pd
+import streamlit as st
+
+from change_notifications import current_version, delta, refresh_every
+from crud import rows_by_key, run_query
+from dashboard import summary_metrics
+from database import PRIMARY_KEYS
+from query_builder import Eq, where_clause
+
+PAGE_SIZE = 50
+PAGE_SIZES = [25, 50, 100, 250]
+
+# Columns a table can be sorted by. Each one has a single-column index (migration 1),
+# so (column, primary key) is index order and keyset paging never sorts the table.
+SORTABLE_COLUMNS = {
+    "providers": ["Provider_ID", "City"],
+    "receivers": ["Receiver_ID", "City"],
+    "food_listings": ["Food_ID", "Location", "Meal_Type", "Provider_Type"],
+    "claims": ["Claim_ID", "Timestamp", "Status"],
+}
+
+
+def fetch_page(table, page_size=PAGE_SIZE, sort_column=None, descending=False, after=None,
+               columns=None, predicates=()):
+    # Return (rows, next_cursor) for the page that follows the (sort value, primary key) cursor `after`.
+    # next_cursor is None on the last page. Rows with a NULL sort value are not reachable by the cursor.
+    if table not in SORTABLE_COLUMNS:
+        raise ValueError(f"Unknown table: {table}")
+    pk = PRIMARY_KEYS[table]
+    sort_column = sort_column or pk
+    if sort_column not in SORTABLE_COLUMNS[table]:
+        raise ValueError(f"{table} cannot be sorted by {sort_column}")
+    selected = _selected(table, sort_column, columns)
+    order = "DESC" if descending else "ASC"
+    op = "<" if descending else ">"
+    where, params = where_clause(table, predicates)
+    conditions = [where] if where else []
+    if after is not None:
+        if sort_column == pk:
+            conditions.append(f"{pk} {op} ?")
+            params.append(after[1])
+        else:
+            conditions.append(f"({sort_column}, {pk}) {op} (?, ?)")
+            params.extend(after)
+    query = f"SELECT {selected} FROM {table}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    order_by = f"{pk} {order}" if sort_column == pk else f"{sort_column} {order}, {pk} {order}"
+    query += f" ORDER BY {order_by} LIMIT ?"
+    params.append(page_size + 1)
+    df = run_query(query, params)
+    if len(df) <= page_size:
+        return df, None
+    df = df.iloc[:page_size]
+    last = df.iloc[-1]
+    return df, (_plain(last[sort_column]), _plain(last[pk]))
+
+
+def _selected(table, sort_column, columns):
+    pk = PRIMARY_KEYS[table]
+    return ", ".join(dict.fromkeys([pk, sort_column or pk, *columns])) if columns else "*"
+
+
+def refresh_page(table, df, keys, sort_column=None, descending=False, after=None, next_cursor=None,
+                 columns=None, predicates=()):
+    # Apply the rows changed since a page was read (keys: their primary keys) to that page. Returns
+    # the patched rows, or None when a row moved into, out of or within the page and it must be read again.
+    # Keyset pages start after a cursor, so changes to rows outside the page never shift it.
+    pk = PRIMARY_KEYS[table]
+    sort_column = sort_column or pk
+    changed = rows_by_key(table, keys, _selected(table, sort_column, columns), predicates)
+    shown = set(df[pk]) & set(keys)
+    if shown - set(changed[pk]):
+        return None
+
+    def position(row):
+        return (row[sort_column], row[pk]) if sort_column != pk else (row[pk],)
+
+    def on_page(row):
+        # Between the cursor the page was read after and its last row (unbounded on the last page)
+        value = position(row)
+        lower = after if sort_column != pk or after is None else (after[1],)
+        upper = position(df.iloc[-1]) if next_cursor is not None and len(df) else None
+        if descending:
+            return (lower is None or value < lower) and (upper is None or value >= upper)
+        return (lower is None or value > lower) and (upper is None or value <= upper)
+
+    try:
+        for _, row in changed.iterrows():
+            if row[pk] in shown:
+                # Still on the page as long as its sort value is unchanged
+                if row[sort_column] != df.loc[df[pk] == row[pk], sort_column].iloc[0]:
+                    return None
+            elif on_page(row):
+                return None
+    except TypeError:
+        # NULL or mixed-type sort values
+        return None
+    changed = changed[changed[pk].isin(shown)].set_index(pk)
+    patched = df.set_index(pk)
+    patched.loc[changed.index, changed.columns] = changed
+    return patched.reset_index()[df.columns]
+
+
+def _plain(value):
+    # numpy scalars cannot be bound as SQLite parameters
+    return value.item() if hasattr(value, "item") else value
+
+
+def estimated_count(table, filter_columns=()):
+    # Row count from the trigger-maintained summary table, narrowed by the planner's
+    # per-index statistics (sqlite_stat1) when equality filters are applied
+    estimate = int(summary_metrics().get(f"{table}_rows", 0))
+    for column in filter_columns:
+        stats = run_query('''
+            SELECT s.stat
+            FROM sqlite_stat1 s
+            WHERE s.tbl = ? AND (SELECT COUNT(*) FROM pragma_index_info(s.idx)) = 1
+              AND (SELECT name FROM pragma_index_info(s.idx)) = ?
+        ''', (table, column))
+        if not stats.empty:
+            per_value = int(stats["stat"][0].split()[1])
+            estimate = min(estimate, per_value)
+    return estimate
+
+
+@st.fragment(run_every=refresh_every())
+def show_table_page(table, key, columns=None, predicates=()):
+    # Paged, sortable table view; the cursor stack for each view lives in session state. Runs as a
+    # fragment, so paging re-runs only this table, and it refreshes itself when the table changes.
+    sort_col, order_col, size_col = st.columns(3)
+    sort_column = sort_col.selectbox("Sort by", SORTABLE_COLUMNS[table], key=f"{key}_sort")
+    descending = order_col.selectbox("Order", ["Ascending", "Descending"], key=f"{key}_order") == "Descending"
+    page_size = size_col.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(PAGE_SIZE), key=f"{key}_size")
+
+    try:
+        where, params = where_clause(table, predicates)
+    except ValueError as e:
+        st.error(f"Error reading {table}: {e}")
+        return
+    signature = (sort_column, descending, page_size, where, tuple(params))
+    if st.session_state.get(f"{key}_signature") != signature:
+        st.session_state[f"{key}_signature"] = signature
+        st.session_state[f"{key}_cursors"] = [None]
+    cursors = st.session_state[f"{key}_cursors"]
+
+    # The page shown last time is kept with the table version it was read at. When the table has
+    # changed since, only the changed rows are fetched and patched in; the page is read again only
+    # when rows moved across its boundaries.
+    page = st.session_state.get(f"{key}_page")
+    try:
+        if page is None or page["signature"] != signature or page["after"] != cursors[-1]:
+            version, df = current_version(table), None
+        else:
+            version, keys = delta(table, page["version"])
+            df, next_cursor = page["rows"], page["next_cursor"]
+            if keys:
+                df = refresh_page(table, df, keys, sort_column, descending, cursors[-1], next_cursor,
+                                  columns, predicates)
+            elif keys is None:
+                df = None
+        if df is None:
+            df, next_cursor = fetch_page(table, page_size, sort_column, descending, cursors[-1],
+                                         columns=columns, predicates=predicates)
+    except (sqlite3.Error, pd.errors.DatabaseError, ValueError) as e:
+        st.error(f"Error reading {table}: {e}")
+        return
+    st.session_state[f"{key}_page"] = {"signature": signature, "after": cursors[-1], "version": version,
+                                       "rows": df, "next_cursor": next_cursor}
+    st.dataframe(df[columns] if columns else df, hide_index=True, use_container_width=True)
+
+    prev_col, next_col, info_col = st.columns([1, 1, 4])
+    prev_col.button("Previous", key=f"{key}_prev", disabled=len(cursors) == 1, on_click=cursors.pop)
+    next_col.button("Next", key=f"{key}_next", disabled=next_cursor is None,
+                    on_click=cursors.append, args=(next_cursor,))
+    estimate = estimated_count(table, [predicate.column for predicate in predicates if isinstance(predicate, Eq)])
+    prefix = "≈" if where else ""
+    info_col.caption(f"Page {len(cursors)} · {prefix}{estimate} rows")
@@ -0,0 +1,73 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from connection_pool import READ_POOL_SIZE
+from crud import read_deadline
+from instrumentation import current_page, on_page
+
+MAX_PARALLEL_QUERIES = 4   # reads in flight at once, across all sessions; each holds one pooled read-only connection
+QUERY_TIMEOUT = 30.0       # seconds per query, enforced inside SQLite
+
+
+class QueryTimeout(sqlite3.OperationalError):
+    pass
+
+
+class ParallelQueries:
+    # Fans independent read tasks out over a thread pool. Each task runs on a worker thread that checks
+    # out its own read-only connection from the pool, so the queries run concurrently in SQLite
+    # (which releases the GIL while it works). Results come back in completion order.
+
+    def __init__(self, max_workers=MAX_PARALLEL_QUERIES, timeout=QUERY_TIMEOUT):
+        self.max_workers = max(1, min(max_workers, READ_POOL_SIZE))
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="parallel-query")
+
+    @staticmethod
+    def _call(function, timeout, page):
+        with on_page(page), read_deadline(timeout):
+            try:
+                return function()
+            except (sqlite3.OperationalError, pd.errors.DatabaseError) as e:
+                if "interrupted" in str(e):
+                    raise QueryTimeout(f"query stopped after the {timeout:g}s timeout") from e
+                raise
+
+    def run(self, tasks, timeout=None):
+        # tasks: {name: function taking no arguments}, e.g. functools.partial(run_query, sql).
+        # Yields (name, result, error) as each finishes; error is the exception or None.
+        # The per-query timeout starts when a worker picks the task up.
+        timeout = timeout or self.timeout
+        page = current_page()
+        futures = {self._executor.submit(self._call, function, timeout, page): name for name, function in tasks.items()}
+        try:
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], None, e
+        finally:
+            # The page stopped reading (e.g. a rerun): drop the tasks that have not started
+            for future in futures:
+                future.cancel()
+
+    def run_all(self, tasks, timeout=None):
+        # Wait for every task; {name: result}, raising the first error
+        results = {}
+        for name, result, error in self.run(tasks, timeout):
+            if error is not None:
+                raise error
+            results[name] = result
+        return results
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_parallel = ParallelQueries()
+
+
+def get_parallel_queries():
+    return _parallel
@@ -0,0 +1,266 @@
+# Predefined SQL used by the app pages and by the query-plan checker
+
+PREDEFINED_QUERIES = {
+    "Q1: Providers per city": '''
+        SELECT City, COUNT(*) as Provider_Count
+        FROM providers
+        GROUP BY City
+        ORDER BY Provider_Count DESC
+    ''',
+    "Q2: Receivers per city": '''
+        SELECT City, COUNT(*) as Receiver_Count
+        FROM receivers
+        GROUP BY City
+        ORDER BY Receiver_Count DESC
+    ''',
+    "Q3: Top 3 provider types by listings": '''
+        SELECT Provider_Type, COUNT(*) as Listing_Count
+        FROM food_listings
+        GROUP BY Provider_Type
+        ORDER BY Listing_Count DESC
+        LIMIT 3
+    ''',
+    "Q4_1: Providers in New Jessica": '''
+        SELECT Name, Contact, Address
+        FROM providers
+        WHERE City = 'New Jessica'
+    ''',
+    "Q4_2: Providers in Mendezmouth": '''
+        SELECT Name, Contact, Address
+        FROM providers
+        WHERE City = 'Mendezmouth'
+    ''',
+    "Q5: Top 8 receivers by claims": '''
+        SELECT r.Name, COUNT(c.Claim_ID) as Claim_Count
+        FROM receivers r
+        JOIN claims c ON r.Receiver_ID = c.Receiver_ID
+        GROUP BY r.Receiver_ID, r.Name
+        ORDER BY Claim_Count DESC
+        LIMIT 8
+    ''',
+    "Q6: Total food quantity": '''
+        SELECT SUM(Quantity) as Total_Quantity
+        FROM food_listings
+    ''',
+    "Q7: City with most listings": '''
+        SELECT Location, COUNT(*) as Listing_Count
+        FROM food_listings
+        GROUP BY Location
+        ORDER BY Listing_Count DESC
+        LIMIT 1
+    ''',
+    "Q8: Most common food types": '''
+        SELECT Food_Type, COUNT(*) as Listing_Count
+        FROM food_listings
+        GROUP BY Food_Type
+        ORDER BY Listing_Count DESC
+    ''',
+    "Q9: Claims per food item": '''
+        SELECT f.Food_Name, COUNT(c.Claim_ID) as Claim_Count
+        FROM food_listings f
+        LEFT JOIN claims c ON f.Food_ID = c.Food_ID
+        GROUP BY f.Food_ID, f.Food_Name
+        ORDER BY Claim_Count DESC
+    ''',
+    "Q10: Top provider by completed claims": '''
+        SELECT p.Name, COUNT(c.Claim_ID) as Completed_Claims
+        FROM providers p
+        JOIN food_listings f ON p.Provider_ID = f.Provider_ID
+        JOIN claims c ON f.Food_ID = c.Food_ID
+        WHERE c.Status = 'Completed'
+        GROUP BY p.Provider_ID, p.Name
+        ORDER BY Completed_Claims DESC
+        LIMIT 1
+    ''',
+    "Q11: Claim status percentages": '''
+        SELECT Status, COUNT(*) as Claim_Count, (COUNT(*) * 100.0 / (SELECT COUNT(*) FROM claims)) as Percentage
+        FROM claims
+        GROUP BY Status
+        ORDER BY Claim_Count DESC
+    ''',
+    "Q12: Avg quantity claimed per receiver": '''
+        SELECT r.Name, AVG(f.Quantity) as Avg_Quantity_Claimed
+        FROM receivers r
+        JOIN claims c ON r.Receiver_ID = c.Receiver_ID
+        JOIN food_listings f ON c.Food_ID = f.Food_ID
+        GROUP BY r.Receiver_ID, r.Name
+        ORDER BY Avg_Quantity_Claimed DESC
+    ''',
+    "Q13: Most claimed meal type": '''
+        SELECT f.Meal_Type, COUNT(c.Claim_ID) as Claim_Count
+        FROM food_listings f
+        JOIN claims c ON f.Food_ID = c.Food_ID
+        GROUP BY f.Meal_Type
+        ORDER BY Claim_Count DESC
+        LIMIT 1
+    ''',
+    "Q14: Total quantity donated by provider": '''
+        SELECT p.Name, SUM(f.Quantity) as Total_Donated
+        FROM providers p
+        JOIN food_listings f ON p.Provider_ID = f.Provider_ID
+        GROUP BY p.Provider_ID, p.Name
+        ORDER BY Total_Donated DESC
+    ''',
+    "Q15: Providers with no claims": '''
+        SELECT p.Name
+        FROM providers p
+        JOIN food_listings f ON p.Provider_ID = f.Provider_ID
+        LEFT JOIN claims c ON f.Food_ID = c.Food_ID
+        WHERE c.Claim_ID IS NULL
+        GROUP BY p.Provider_ID, p.Name
+    ''',
+    "Q16: Receivers with no claims": '''
+        SELECT Name
+        FROM receivers
+        WHERE Receiver_ID NOT IN (SELECT Receiver_ID FROM claims)
+    ''',
+    "Q17: Claims by meal type and status": '''
+        SELECT f.Meal_Type, c.Status, COUNT(c.Claim_ID) as Claim_Count
+        FROM food_listings f
+        JOIN claims c ON f.Food_ID = c.Food_ID
+        GROUP BY f.Meal_Type, c.Status
+        ORDER BY Claim_Count DESC
+    ''',
+    "Q18: Unclaimed food listings": '''
+        SELECT f.Food_Name, f.Quantity, f.Expiry_Date
+        FROM food_listings f
+        LEFT JOIN claims c ON f.Food_ID = c.Food_ID
+        WHERE c.Claim_ID IS NULL
+    ''',
+    "Q19: Receivers per city by meal type": '''
+        SELECT r.City, 
+               COUNT(DISTINCT CASE WHEN f.Meal_Type = 'Breakfast' THEN r.Receiver_ID END) as Breakfast_Receivers,
+               COUNT(DISTINCT CASE WHEN f.Meal_Type = 'Lunch' THEN r.Receiver_ID END) as Lunch_Receivers,
+               COUNT(DISTINCT CASE WHEN f.Meal_Type = 'Dinner' THEN r.Receiver_ID END) as Dinner_Receivers,
+               COUNT(DISTINCT CASE WHEN f.Meal_Type = 'Snacks' THEN r.Receiver_ID END) as Snacks_Receivers
+        FROM receivers r
+        JOIN claims c ON r.Receiver_ID = c.Receiver_ID
+        JOIN food_listings f ON c.Food_ID = f.Food_ID
+        GROUP BY r.City
+        ORDER BY Breakfast_Receivers DESC, Lunch_Receivers DESC, Dinner_Receivers DESC, Snacks_Receivers DESC
+    ''',
+    "Q20: Receiver type with most food": '''
+        SELECT r.Type, f.Food_Type, SUM(f.Quantity) as Total_Quantity
+        FROM receivers r
+        JOIN claims c ON r.Receiver_ID = c.Receiver_ID
+        JOIN food_listings f ON c.Food_ID = f.Food_ID
+        GROUP BY r.Type, f.Food_Type
+        ORDER BY Total_Quantity DESC
+        LIMIT 1
+    ''',
+    "Q21: Receivers by food and meal type": '''
+        SELECT r.Name, f.Food_Type, f.Meal_Type, COUNT(c.Claim_ID) as Claim_Count
+        FROM receivers r
+        JOIN claims c ON r.Receiver_ID = c.Receiver_ID
+        JOIN food_listings f ON c.Food_ID = f.Food_ID
+        GROUP BY r.Receiver_ID, r.Name, f.Food_Type, f.Meal_Type
+        ORDER BY Claim_Count DESC
+    ''',
+    "Q22: Claims by city": '''
+        SELECT f.Location, COUNT(c.Claim_ID) as Claim_Count
+        FROM food_listings f
+        JOIN claims c ON f.Food_ID = c.Food_ID
+        GROUP BY f.Location
+        ORDER BY Claim_Count DESC
+    ''',
+    "Q23: Providers with highest avg quantity": '''
+        SELECT p.Name, AVG(f.Quantity) as Avg_Quantity
+        FROM providers p
+        JOIN food_listings f ON p.Provider_ID = f.Provider_ID
+        GROUP BY p.Provider_ID, p.Name
+        ORDER BY Avg_Quantity DESC
+        LIMIT 5
+    ''',
+    "Q24: Percentage of quantity claimed per food type": '''
+        SELECT f.Food_Type,
+               SUM(f.Quantity) as Total_Quantity,
+               SUM(CASE WHEN c.Claim_ID IS NOT NULL THEN f.Quantity ELSE 0 END) * 100.0 / SUM(f.Quantity) as Claimed_Percentage
+        FROM food_listings f
+        LEFT JOIN claims c ON f.Food_ID = c.Food_ID
+        GROUP BY f.Food_Type
+    '''
+}
+
+# Aggregate queries behind the charts on the "Visualization" page
+CHART_QUERIES = {
+    "Providers per City (Top 10)": '''
+        SELECT City, COUNT(*) as Provider_Count
+        FROM providers
+        GROUP BY City
+        ORDER BY Provider_Count DESC
+    ''',
+    "Claim Status Distribution": '''
+        SELECT Status, COUNT(*) as Claim_Count, (COUNT(*) * 100.0 / (SELECT COUNT(*) FROM claims)) as Percentage
+        FROM claims
+        GROUP BY Status
+        ORDER BY Claim_Count DESC
+    ''',
+    "Total Quantity Donated by Provider (Top 5)": '''
+        SELECT p.Name, SUM(f.Quantity) as Total_Donated
+        FROM providers p
+        JOIN food_listings f ON p.Provider_ID = f.Provider_ID
+        GROUP BY p.Provider_ID, p.Name
+        ORDER BY Total_Donated DESC
+        LIMIT 5
+    ''',
+    "Avg Quantity Claimed per Receiver (Top 5)": '''
+        SELECT r.Name, AVG(f.Quantity) as Avg_Quantity_Claimed
+        FROM receivers r
+        JOIN claims c ON r.Receiver_ID = c.Receiver_ID
+        JOIN food_listings f ON c.Food_ID = f.Food_ID
+        GROUP BY r.Receiver_ID, r.Name
+        ORDER BY Avg_Quantity_Claimed DESC
+        LIMIT 5
+    ''',
+    "Claims by City (Top 10)": '''
+        SELECT f.Location, COUNT(c.Claim_ID) as Claim_Count
+        FROM food_listings f
+        JOIN claims c ON f.Food_ID = c.Food_ID
+        GROUP BY f.Location
+        ORDER BY Claim_Count DESC
+        LIMIT 10
+    ''',
+    "Most Common Food Types (Top 5)": '''
+        SELECT Food_Type, COUNT(*) as Listing_Count
+        FROM food_listings
+        GROUP BY Food_Type
+        ORDER BY Listing_Count DESC
+        LIMIT 5
+    ''',
+    "Providers with Highest Avg Quantity (Top 5)": '''
+        SELECT p.Name, AVG(f.Quantity) as Avg_Quantity
+        FROM providers p
+        JOIN food_listings f ON p.Provider_ID = f.Provider_ID
+        GROUP BY p.Provider_ID, p.Name
+        ORDER BY Avg_Quantity DESC
+        LIMIT 5
+    ''',
+    "Claims by Meal Type (Top 5)": '''
+        SELECT f.Meal_Type, COUNT(c.Claim_ID) as Claim_Count
+        FROM food_listings f
+        JOIN claims c ON f.Food_ID = c.Food_ID
+        GROUP BY f.Meal_Type
+        ORDER BY Claim_Count DESC
+        LIMIT 5
+    ''',
+    "Unclaimed Food Listings by Quantity (Top 5)": '''
+        SELECT f.Food_Name, f.Quantity
+        FROM food_listings f
+        LEFT JOIN claims c ON f.Food_ID = c.Food_ID
+        WHERE c.Claim_ID IS NULL
+        ORDER BY f.Quantity DESC, f.Food_ID
+        LIMIT 5
+    ''',
+    "Receivers per City by Breakfast Claims (Top 5)": '''
+        SELECT r.City, COUNT(DISTINCT CASE WHEN f.Meal_Type = 'Breakfast' THEN r.Receiver_ID END) as Breakfast_Receivers
+        FROM receivers r
+        JOIN claims c ON r.Receiver_ID = c.Receiver_ID
+        JOIN food_listings f ON c.Food_ID = f.Food_ID
+        GROUP BY r.City
+        ORDER BY Breakfast_Receivers DESC
+        LIMIT 5
+    '''
+}
+
+RECENT_CLAIMS_LIMIT = 5
+RECENT_CLAIMS_QUERY = f"SELECT * FROM claims ORDER BY Timestamp DESC LIMIT {RECENT_CLAIMS_LIMIT}"
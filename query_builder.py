@@ -0,0 +1,160 @@
+import threading
+
+from connection_pool import get_pool
+from database import TABLES
+
+# Typed filter predicates that compile to bound parameters.
+# The SQL text depends only on the shape of the filter (columns and operators), never on the
+# values, so repeated filters reuse the same prepared statement from the connection's cache.
+
+_columns = {}
+_columns_lock = threading.Lock()
+
+
+def table_columns(table):
+    if table not in TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    with _columns_lock:
+        if table not in _columns:
+            with get_pool().reader() as conn:
+                _columns[table] = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        return _columns[table]
+
+
+def check_columns(table, columns):
+    known = table_columns(table)
+    for column in columns:
+        if column not in known:
+            raise ValueError(f"{table} has no column {column!r}")
+
+
+class Predicate:
+    def __init__(self, column):
+        self.column = column
+
+    def sql(self):
+        raise NotImplementedError
+
+    def params(self):
+        raise NotImplementedError
+
+
+class Eq(Predicate):
+    def __init__(self, column, value):
+        super().__init__(column)
+        self.value = value
+
+    def sql(self):
+        return f"{self.column} = ?"
+
+    def params(self):
+        return [self.value]
+
+
+class In(Predicate):
+    # The list is padded to the next power of two by repeating its last value,
+    # so lists of similar length share one statement
+    def __init__(self, column, values):
+        super().__init__(column)
+        self.values = list(values)
+
+    def _padded(self):
+        size = 1
+        while size < len(self.values):
+            size *= 2
+        return self.values + [self.values[-1]] * (size - len(self.values))
+
+    def sql(self):
+        if not self.values:
+            return "0"
+        return f"{self.column} IN ({', '.join('?' * len(self._padded()))})"
+
+    def params(self):
+        return self._padded() if self.values else []
+
+
+class Range(Predicate):
+    # low <= column <= high; either bound may be None
+    def __init__(self, column, low=None, high=None):
+        super().__init__(column)
+        self.low = low
+        self.high = high
+
+    def sql(self):
+        parts = []
+        if self.low is not None:
+            parts.append(f"{self.column} >= ?")
+        if self.high is not None:
+            parts.append(f"{self.column} <= ?")
+        return " AND ".join(parts) or "1"
+
+    def params(self):
+        return [bound for bound in (self.low, self.high) if bound is not None]
+
+
+class Prefix(Predicate):
+    # Case-sensitive prefix match written as a range, so an index on the column is used
+    def __init__(self, column, prefix):
+        super().__init__(column)
+        self.prefix = prefix
+
+    def _upper(self):
+        # The first string after every match: the prefix with its last character incremented. A trailing
+        # U+10FFFF cannot be, so it is dropped; None when nothing is left (no upper bound).
+        stem = self.prefix.rstrip("\U0010ffff")
+        return stem[:-1] + chr(ord(stem[-1]) + 1) if stem else None
+
+    def sql(self):
+        if self._upper() is None:
+            return f"{self.column} >= ?"
+        return f"{self.column} >= ? AND {self.column} < ?"
+
+    def params(self):
+        upper = self._upper()
+        return [self.prefix] if upper is None else [self.prefix, upper]
+
+
+class Contains(Predicate):
+    # Case-insensitive substring match (LIKE '%text%'); always scans, prefer Prefix where possible
+    def __init__(self, column, text):
+        super().__init__(column)
+        self.text = text
+
+    def sql(self):
+        return f"{self.column} LIKE ? ESCAPE '\\'"
+
+    def params(self):
+        escaped = self.text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return [f"%{escaped}%"]
+
+
+class FullText(Predicate):
+    # Match through a table's FTS5 index (migration 3) instead of scanning with LIKE.
+    # column is the table's primary key; the FTS query is built by search.fts_query.
+    def __init__(self, column, fts_table, match):
+        super().__init__(column)
+        self.fts_table = fts_table
+        self.match = match
+
+    def sql(self):
+        return f"{self.column} IN (SELECT rowid FROM {self.fts_table} WHERE {self.fts_table} MATCH ?)"
+
+    def params(self):
+        return [self.match]
+
+
+def applicable(table, predicates):
+    # Drop the predicates whose column the table does not have
+    known = table_columns(table)
+    return [predicate for predicate in predicates if predicate.column in known]
+
+
+def where_clause(table, predicates):
+    # Return (sql, params) for the predicates ANDed together; sql is "" when there are none
+    predicates = list(predicates or [])
+    check_columns(table, [predicate.column for predicate in predicates])
+    if not predicates:
+        return "", []
+    sql = " AND ".join(f"({predicate.sql()})" for predicate in predicates)
+    params = [param for predicate in predicates for param in predicate.params()]
+    return sql, params
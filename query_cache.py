@@ -0,0 +1,119 @@
+import re
+import threading
+from collections import OrderedDict
+
+from database import TABLES
+
+MAX_ENTRIES = 256
+MAX_BYTES = 64 * 1024 * 1024
+
+
+def normalize_sql(query):
+    # Collapse whitespace and drop a trailing semicolon so formatting differences share one entry
+    return re.sub(r"\s+", " ", query).strip().rstrip(";").strip()
+
+
+# Tables kept up to date from base tables (by triggers or refresh jobs), mapped to their source tables
+DERIVED_TABLES = {}
+
+
+def register_derived_table(table, sources):
+    DERIVED_TABLES[table.lower()] = frozenset(sources)
+
+
+def referenced_tables(query):
+    words = {word.lower() for word in re.findall(r"\b(?:FROM|JOIN)\s+(\w+)", query, re.IGNORECASE)}
+    tables = {table for table in TABLES if table in words}
+    for word in words & DERIVED_TABLES.keys():
+        tables |= DERIVED_TABLES[word]
+    return frozenset(tables)
+
+
+def frame_size(df):
+    try:
+        return int(df.memory_usage(index=True, deep=True).sum())
+    except AttributeError:
+        return 0
+
+
+class QueryCache:
+    # LRU cache of query results keyed by normalized SQL and parameters.
+    # Each table carries a version counter; bumping a table evicts only the entries that read it.
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._versions = {table: 0 for table in TABLES}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def make_key(query, params=None):
+        return normalize_sql(query), tuple(params) if params else ()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def versions(self, tables):
+        with self._lock:
+            return {table: self._versions.get(table, 0) for table in tables}
+
+    def put(self, key, result, versions):
+        # versions is the snapshot taken before the query ran; a write in between makes the result stale
+        tables = frozenset(versions)
+        size = frame_size(result)
+        with self._lock:
+            if any(self._versions.get(table, 0) != version for table, version in versions.items()):
+                return
+            if size > self.max_bytes:
+                return
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[2]
+            self._entries[key] = (result, tables, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+
+    def bump(self, *tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+            stale = [key for key, (_, entry_tables, _) in self._entries.items() if entry_tables & set(tables)]
+            for key in stale:
+                self._bytes -= self._entries.pop(key)[2]
+            self._stats["invalidations"] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+            stats["max_entries"] = self.max_entries
+            stats["max_bytes"] = self.max_bytes
+            stats["table_versions"] = dict(self._versions)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_cache = QueryCache()
+
+
+def get_cache():
+    return _cache
@@ -0,0 +1,131 @@
+import os
+import sqlite3
+import threading
+import time
+from urllib.request import pathname2url
+
+import pandas as pd
+import streamlit as st
+
+from archive import attach_archive
+from check_query_plans import LARGE_TABLES, full_scans
+from connection_pool import PROGRESS_STEPS
+from database import DB_PATH
+from instrumentation import current_page, record, result_size
+from query_cache import normalize_sql
+
+# Limits for ad-hoc queries from the "New Query" page
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_ROW_CAP = 10000
+MAX_ROW_CAP = 200000
+FETCH_CHUNK = 1000
+
+
+def open_read_only(db_path=DB_PATH):
+    # A connection of its own, outside the shared pool, that cannot write
+    uri = f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    attach_archive(conn)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def explain(sql, db_path=DB_PATH):
+    # Return (plan lines, warnings about full scans of large tables) without running the query
+    conn = open_read_only(db_path)
+    try:
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+        warnings = [f"Full scan of {table}: {detail}" for table, detail in full_scans(conn, sql, set(LARGE_TABLES))]
+    finally:
+        conn.close()
+    return plan, warnings
+
+
+class GuardedQuery(threading.Thread):
+    # Runs one query on its own read-only connection with a wall-clock timeout, a row cap
+    # and a cancel flag, fetching in chunks. The outcome is left in .result / .error.
+
+    def __init__(self, sql, timeout=DEFAULT_TIMEOUT, row_cap=DEFAULT_ROW_CAP, chunk_size=FETCH_CHUNK, db_path=DB_PATH):
+        super().__init__(daemon=True)
+        self.sql = sql
+        self.timeout = timeout
+        self.row_cap = row_cap
+        self.chunk_size = chunk_size
+        self.db_path = db_path
+        self.cancelled = threading.Event()
+        self.rows_fetched = 0
+        self.result = None
+        self.truncated = False
+        self.timed_out = False
+        self.error = None
+        self.elapsed = 0.0
+        self.page = current_page()  # run() is on another thread, so remember the calling page now
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        started = time.perf_counter()
+        deadline = started + self.timeout
+
+        def check():
+            # A non-zero return value makes SQLite abort the statement
+            if self.cancelled.is_set():
+                return 1
+            if time.perf_counter() > deadline:
+                self.timed_out = True
+                return 1
+            return 0
+
+        try:
+            conn = open_read_only(self.db_path)
+        except sqlite3.Error as e:
+            self.error = e
+            return
+        conn.set_progress_handler(check, PROGRESS_STEPS)
+        try:
+            cursor = conn.execute(self.sql)
+            columns = [column[0] for column in cursor.description or []]
+            rows = []
+            while len(rows) < self.row_cap:
+                chunk = cursor.fetchmany(min(self.chunk_size, self.row_cap - len(rows)))
+                if not chunk:
+                    break
+                rows.extend(chunk)
+                self.rows_fetched = len(rows)
+            else:
+                self.truncated = cursor.fetchone() is not None
+            self.result = pd.DataFrame.from_records(rows, columns=columns)
+        except sqlite3.Error as e:
+            self.error = e
+        finally:
+            self.elapsed = time.perf_counter() - started
+            conn.close()
+            rows, nbytes = result_size(self.result)
+            record("custom", normalize_sql(self.sql), self.elapsed, rows, nbytes, page=self.page,
+                   error=type(self.error).__name__ if self.error else None)
+
+
+def run_with_cancel(sql, timeout=DEFAULT_TIMEOUT, row_cap=DEFAULT_ROW_CAP):
+    # Run a GuardedQuery while showing progress and a Cancel button.
+    # Pressing Cancel (or leaving the page) reruns the script, which stops this loop;
+    # the finally block then aborts the query through the progress handler.
+    previous = st.session_state.get("guarded_query")
+    if previous is not None:
+        previous.cancel()
+    query = GuardedQuery(sql, timeout, row_cap)
+    st.session_state["guarded_query"] = query
+    st.button("Cancel", key="cancel_guarded_query")
+    status = st.empty()
+    started = time.perf_counter()
+    query.start()
+    try:
+        while query.is_alive():
+            status.caption(f"Running… {time.perf_counter() - started:.1f}s, {query.rows_fetched} rows fetched")
+            query.join(0.1)
+    finally:
+        if query.is_alive():
+            query.cancel()
+    status.empty()
+    return query
+
@@ -0,0 +1,109 @@
+import argparse
+import re
+import sqlite3
+import sys
+
+from crud import run_query
+from database import DB_PATH
+from migrations import FTS_TABLES
+from query_cache import register_derived_table
+
+for _table, _, _ in FTS_TABLES:
+    register_derived_table(f"{_table}_fts", [_table])
+
+SEARCH_LIMIT = 20
+
+# One ranked sub-search per FTS table; each is limited on its own so no branch reads more than it returns
+_SEARCH_BRANCHES = {
+    "providers": '''
+        SELECT * FROM (
+            SELECT 'Provider' as Kind, p.Provider_ID as ID, p.Name as Title,
+                   p.Type || ' · ' || p.City as Detail, providers_fts.rank as Rank
+            FROM providers_fts JOIN providers p ON p.Provider_ID = providers_fts.rowid
+            WHERE providers_fts MATCH ? ORDER BY providers_fts.rank LIMIT ?
+        )''',
+    "receivers": '''
+        SELECT * FROM (
+            SELECT 'Receiver' as Kind, r.Receiver_ID as ID, r.Name as Title,
+                   r.Type || ' · ' || r.City as Detail, receivers_fts.rank as Rank
+            FROM receivers_fts JOIN receivers r ON r.Receiver_ID = receivers_fts.rowid
+            WHERE receivers_fts MATCH ? ORDER BY receivers_fts.rank LIMIT ?
+        )''',
+    "food_listings": '''
+        SELECT * FROM (
+            SELECT 'Food Listing' as Kind, f.Food_ID as ID, f.Food_Name as Title,
+                   f.Food_Type || ' · ' || f.Location || ' · expires ' || f.Expiry_Date as Detail,
+                   food_listings_fts.rank as Rank
+            FROM food_listings_fts JOIN food_listings f ON f.Food_ID = food_listings_fts.rowid
+            WHERE food_listings_fts MATCH ? ORDER BY food_listings_fts.rank LIMIT ?
+        )''',
+}
+
+
+def fts_query(text, columns=None):
+    # Turn free text into an FTS5 query: every word must match, each as a prefix.
+    # Words are quoted, so FTS5 operators and punctuation in the input are never interpreted.
+    words = re.findall(r"\w+", text or "")
+    if not words:
+        return None
+    query = " ".join(f'"{word}"*' for word in words)
+    if columns:
+        query = f"{{{' '.join(columns)}}} : ({query})"
+    return query
+
+
+def search_sql(tables=None):
+    tables = tables or list(_SEARCH_BRANCHES)
+    branches = [_SEARCH_BRANCHES[table] for table in tables]
+    return " UNION ALL ".join(branches) + " ORDER BY Rank LIMIT ?"
+
+
+def search_params(match, limit, tables=None):
+    tables = tables or list(_SEARCH_BRANCHES)
+    return [value for _ in tables for value in (match, limit)] + [limit]
+
+
+def search(text, limit=SEARCH_LIMIT, tables=None):
+    # Ranked, prefix-matching search across providers, receivers and food listings
+    match = fts_query(text)
+    if match is None:
+        return None
+    return run_query(search_sql(tables), search_params(match, limit, tables))
+
+
+def rebuild(conn, optimize=True):
+    # Re-index every FTS table from its base table, e.g. after loading rows with triggers disabled
+    for table, _, _ in FTS_TABLES:
+        fts = f"{table}_fts"
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+        if optimize:
+            conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('optimize')")
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text search maintenance.")
+    parser.add_argument("command", choices=["rebuild", "query"])
+    parser.add_argument("text", nargs="?", help="search text for the query command")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--limit", type=int, default=SEARCH_LIMIT)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    if args.command == "rebuild":
+        rebuild(conn)
+        for table, _, _ in FTS_TABLES:
+            count = conn.execute(f"SELECT COUNT(*) FROM {table}_fts").fetchone()[0]
+            print(f"{table}_fts: {count} rows indexed")
+    else:
+        match = fts_query(args.text)
+        if match is None:
+            parser.error("query needs search text")
+        for row in conn.execute(search_sql(), search_params(match, args.limit)):
+            print(" | ".join(str(value) for value in row))
+    conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
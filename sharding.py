@@ -0,0 +1,907 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+from urllib.request import pathname2url
+
+import pandas as pd
+
+from database import DB_PATH, PRIMARY_KEYS, SHARD_DIR, TABLES, create_schema
+from instrumentation import track
+from migrations import apply_migrations
+from parallel_queries import ParallelQueries
+from queries import CHART_QUERIES, PREDEFINED_QUERIES
+
+# Sharded layout: providers and receivers are split by City and food_listings by Location into one
+# SQLite file per region, and each claim lives with the listing it claims. routing.db maps every city
+# to its shard and hands out primary keys, so IDs stay unique across shards. Every shard is a full
+# app database (migrations applied) with its own writer lock. In the app the shards are a read replica:
+# writes commit to the single-file database, and its change log (migration 8) is applied to the shards.
+ROUTING_FILE = "routing.db"
+DEFAULT_SHARDS = 4
+MAX_SHARDS = 8            # one fan-out worker per shard; open_union attaches them all (SQLite allows 10)
+BUSY_TIMEOUT = 5          # seconds
+FAN_OUT_TIMEOUT = 30.0    # seconds per shard
+DEFAULT_REPEAT = 5
+SYNC_SECONDS = 2.0        # between catch-ups from the single-file database in the app process
+ROUTING_COLUMNS = {"providers": "City", "receivers": "City", "food_listings": "Location"}
+
+ROUTING_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS shards (
+        Shard INTEGER PRIMARY KEY,
+        File TEXT NOT NULL
+    )""",
+    # NULL cities are routed as ''
+    """CREATE TABLE IF NOT EXISTS shard_routes (
+        City TEXT PRIMARY KEY,
+        Shard INTEGER NOT NULL REFERENCES shards (Shard)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS shard_sequences (
+        Table_Name TEXT PRIMARY KEY,
+        Last_ID INTEGER NOT NULL
+    ) WITHOUT ROWID""",
+    # The source database's change_log position the shards hold every change up to
+    """CREATE TABLE IF NOT EXISTS shard_sync (
+        Id INTEGER PRIMARY KEY CHECK (Id = 1),
+        Source TEXT NOT NULL,
+        Change_ID INTEGER NOT NULL,
+        Synced_At TEXT
+    )""",
+]
+
+
+def _shard_of(column):
+    return f"(SELECT Shard FROM routing.shard_routes WHERE City = COALESCE({column}, ''))"
+
+
+# Rows of the source database that belong to shard ?; claims without a listing go with their receiver
+COPY_SQL = {
+    "providers": f"SELECT t.* FROM src.providers t WHERE {_shard_of('t.City')} = ?",
+    "receivers": f"SELECT t.* FROM src.receivers t WHERE {_shard_of('t.City')} = ?",
+    "food_listings": f"SELECT t.* FROM src.food_listings t WHERE {_shard_of('t.Location')} = ?",
+    "claims": f"""SELECT c.* FROM src.claims c
+        LEFT JOIN src.food_listings f ON f.Food_ID = c.Food_ID
+        LEFT JOIN src.receivers r ON r.Receiver_ID = c.Receiver_ID
+        WHERE CASE WHEN f.Food_ID IS NOT NULL THEN {_shard_of('f.Location')}
+                   ELSE COALESCE({_shard_of('r.City')}, 0) END = ?""",
+}
+
+
+def _uri(path, read_only=True):
+    return f"file:{pathname2url(os.path.abspath(path))}" + ("?mode=ro" if read_only else "")
+
+
+def _connect(path, read_only=False):
+    return sqlite3.connect(_uri(path, read_only), uri=True, timeout=BUSY_TIMEOUT, check_same_thread=False)
+
+
+def routing_path(shard_dir=SHARD_DIR):
+    return os.path.join(shard_dir, ROUTING_FILE)
+
+
+def is_sharded(shard_dir=SHARD_DIR):
+    return bool(shard_dir) and os.path.exists(routing_path(shard_dir))
+
+
+def last_change(conn):
+    # The newest change_log entry of a single-file database; 0 before any, None when it is not migrated
+    try:
+        return conn.execute("SELECT COALESCE(MAX(Change_ID), 0) FROM change_log").fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+
+
+def shard_files(shard_dir=SHARD_DIR):
+    conn = _connect(routing_path(shard_dir), read_only=True)
+    try:
+        return {shard: os.path.join(shard_dir, name) for shard, name in conn.execute("SELECT Shard, File FROM shards ORDER BY Shard")}
+    finally:
+        conn.close()
+
+
+# Re-sharding
+
+def city_weights(conn):
+    # Rows per city over the four tables, claims counted with their listing's city
+    return dict(conn.execute('''
+        SELECT City, SUM(Row_Count) FROM (
+            SELECT COALESCE(City, '') as City, COUNT(*) as Row_Count FROM providers GROUP BY 1
+            UNION ALL SELECT COALESCE(City, ''), COUNT(*) FROM receivers GROUP BY 1
+            UNION ALL SELECT COALESCE(Location, ''), COUNT(*) FROM food_listings GROUP BY 1
+            UNION ALL SELECT COALESCE(f.Location, ''), COUNT(*) FROM claims c JOIN food_listings f ON f.Food_ID = c.Food_ID GROUP BY 1
+        )
+        GROUP BY City
+    ''').fetchall())
+
+
+def assign_cities(weights, shards):
+    # Heaviest city first, each to the lightest shard so far. Returns ({city: shard}, rows per shard).
+    loads = [0] * shards
+    routes = {}
+    for city, weight in sorted(weights.items(), key=lambda item: (-item[1], item[0])):
+        shard = loads.index(min(loads))
+        routes[city] = shard
+        loads[shard] += weight
+    return routes, loads
+
+
+def _finish_shard(conn):
+    apply_migrations(conn)
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA journal_mode = WAL")
+
+
+def reshard(source=DB_PATH, shard_dir=SHARD_DIR, shards=DEFAULT_SHARDS, log=print):
+    # Split a single-file database into `shards` files under shard_dir. The source is only read.
+    if not shard_dir:
+        raise ValueError("no shard directory given (set FOOD_WASTAGE_SHARDS or pass one)")
+    if not 1 <= shards <= MAX_SHARDS:
+        raise ValueError(f"the number of shards must be between 1 and {MAX_SHARDS}")
+    if os.path.exists(routing_path(shard_dir)):
+        raise ValueError(f"{shard_dir} already holds a sharded layout")
+    started = time.perf_counter()
+    src = _connect(source, read_only=True)
+    try:
+        routes, loads = assign_cities(city_weights(src), shards)
+        last_ids = {table: src.execute(f"SELECT COALESCE(MAX({pk}), 0) FROM {table}").fetchone()[0]
+                    for table, pk in PRIMARY_KEYS.items()}
+        # Before the copy: a change made while it runs is applied again by the first catch-up
+        position = last_change(src) or 0
+    finally:
+        src.close()
+    os.makedirs(shard_dir, exist_ok=True)
+    for shard in range(shards):
+        path = os.path.join(shard_dir, f"shard_{shard:02d}.db")
+        if os.path.exists(path):
+            raise ValueError(f"{path} already exists")
+    # Shards first and routing.db last, so a failed run leaves no layout behind that looks complete
+    routing = sqlite3.connect(":memory:")
+    for statement in ROUTING_SCHEMA:
+        routing.execute(statement)
+    routing.executemany("INSERT INTO shards VALUES (?, ?)", [(shard, f"shard_{shard:02d}.db") for shard in range(shards)])
+    routing.executemany("INSERT INTO shard_routes VALUES (?, ?)", routes.items())
+    routing.executemany("INSERT INTO shard_sequences VALUES (?, ?)", last_ids.items())
+    routing.execute("INSERT INTO shard_sync VALUES (1, ?, ?, datetime('now'))", (os.path.abspath(source), position))
+    routing.commit()
+    staged = os.path.join(shard_dir, f"{ROUTING_FILE}.{os.getpid()}.tmp")
+    target = sqlite3.connect(staged)
+    routing.backup(target)
+    target.close()
+    routing.close()
+    try:
+        for shard in range(shards):
+            path = os.path.join(shard_dir, f"shard_{shard:02d}.db")
+            conn = _connect(path)
+            create_schema(conn)
+            conn.execute("ATTACH DATABASE ? AS src", (_uri(source),))
+            conn.execute("ATTACH DATABASE ? AS routing", (_uri(staged),))
+            with conn:
+                counts = {table: conn.execute(f"INSERT INTO main.{table} {COPY_SQL[table]}", (shard,)).rowcount
+                          for table in TABLES}
+            conn.execute("DETACH DATABASE src")
+            conn.execute("DETACH DATABASE routing")
+            _finish_shard(conn)
+            conn.close()
+            cities = sum(1 for city in routes.values() if city == shard)
+            log(f"shard {shard}: {cities:>4} cities  " + "  ".join(f"{table} {count}" for table, count in counts.items()))
+        os.replace(staged, routing_path(shard_dir))
+    finally:
+        if os.path.exists(staged):
+            os.remove(staged)
+    log(f"{len(routes)} cities in {shards} shards ({min(loads)}-{max(loads)} rows each) in {time.perf_counter() - started:.2f}s")
+    return routes
+
+
+def unshard(shard_dir=SHARD_DIR, target=DB_PATH, log=print):
+    # Merge a sharded layout back into one new database file
+    if os.path.exists(target):
+        raise ValueError(f"{target} already exists")
+    started = time.perf_counter()
+    conn = sqlite3.connect(target)
+    create_schema(conn)
+    for shard, path in shard_files(shard_dir).items():
+        conn.execute("ATTACH DATABASE ? AS src", (path,))
+        with conn:
+            for table in TABLES:
+                conn.execute(f"INSERT INTO main.{table} SELECT * FROM src.{table}")
+        conn.execute("DETACH DATABASE src")
+    apply_migrations(conn)
+    conn.execute("ANALYZE")
+    conn.close()
+    log(f"{target} written from {shard_dir} in {time.perf_counter() - started:.2f}s")
+
+
+# Routed reads and writes
+
+class ShardedStore:
+    # CRUD against a sharded layout. Writes go to the shard that owns the row, each shard behind its
+    # own writer lock, so writes for different regions never wait for each other. Rows are found by
+    # primary key with one indexed lookup per shard.
+
+    def __init__(self, shard_dir=SHARD_DIR):
+        if not is_sharded(shard_dir):
+            raise ValueError(f"{shard_dir} is not a sharded layout; create one with `python sharding.py reshard`")
+        self.shard_dir = shard_dir
+        self.files = shard_files(shard_dir)
+        self._routing = _connect(routing_path(shard_dir))
+        with self._routing:
+            # Layouts made before shard_sync existed have no position yet; their first catch-up resyncs
+            for statement in ROUTING_SCHEMA:
+                self._routing.execute(statement)
+        self._routing_lock = threading.Lock()
+        self._writers = {}
+        self._write_locks = {shard: threading.Lock() for shard in self.files}
+        self._readers = {}
+        self._read_locks = {shard: threading.Lock() for shard in self.files}
+        self._sync_lock = threading.Lock()
+        self.sync_error = None
+
+    def _writer(self, shard):
+        if shard not in self._writers:
+            conn = _connect(self.files[shard])
+            conn.execute("PRAGMA journal_mode = WAL")
+            self._writers[shard] = conn
+        return self._writers[shard]
+
+    @contextmanager
+    def reader(self, shard):
+        # The shard's read-only connection, one user at a time
+        with self._read_locks[shard]:
+            if shard not in self._readers:
+                self._readers[shard] = _connect(self.files[shard], read_only=True)
+            yield self._readers[shard]
+
+    def _read(self, shard, sql, params=()):
+        with self.reader(shard) as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def _read_rows(self, shard, sql, params=()):
+        with self.reader(shard) as conn:
+            cursor = conn.execute(sql, params)
+            columns = [d[0] for d in cursor.description]
+            return [dict(zip(columns, values)) for values in cursor.fetchall()]
+
+    def read_frame(self, shard, sql, params=(), timeout=FAN_OUT_TIMEOUT):
+        with self.reader(shard) as conn, track("read", sql, params) as call:
+            deadline = time.perf_counter() + timeout
+            conn.set_progress_handler(lambda: int(time.perf_counter() > deadline), 10000)
+            try:
+                call["result"] = pd.read_sql_query(sql, conn, params=params)
+            finally:
+                conn.set_progress_handler(None, 0)
+            return call["result"]
+
+    def route(self, city, create=False):
+        # The shard of a city; a new city goes to the shard with the fewest cities
+        with self._routing_lock:
+            row = self._routing.execute("SELECT Shard FROM shard_routes WHERE City = ?", (city or "",)).fetchone()
+            if row is None and create:
+                with self._routing:
+                    shard = self._routing.execute('''
+                        SELECT s.Shard FROM shards s
+                        LEFT JOIN shard_routes r ON r.Shard = s.Shard
+                        GROUP BY s.Shard
+                        ORDER BY COUNT(r.City), s.Shard
+                        LIMIT 1
+                    ''').fetchone()[0]
+                    self._routing.execute("INSERT INTO shard_routes VALUES (?, ?)", (city or "", shard))
+                row = (shard,)
+        return row[0] if row else None
+
+    def check_columns(self, table, columns):
+        known = {row[1] for row in self._read(min(self.files), f"PRAGMA table_info({table})")}
+        for column in columns:
+            if column not in known:
+                raise ValueError(f"{table} has no column {column!r}")
+
+    def owner(self, table, key):
+        pk = PRIMARY_KEYS[table]
+        for shard in self.files:
+            if self._read(shard, f"SELECT 1 FROM {table} WHERE {pk} = ?", (key,)):
+                return shard
+        return None
+
+    def shard_for(self, table, row):
+        if table != "claims":
+            return self.route(row.get(ROUTING_COLUMNS[table]), create=True)
+        # With the listing it claims, else with its receiver
+        for parent, column in (("food_listings", "Food_ID"), ("receivers", "Receiver_ID")):
+            shard = self.owner(parent, row.get(column)) if row.get(column) is not None else None
+            if shard is not None:
+                return shard
+        return min(self.files)
+
+    def _next_id(self, table, at_least=None):
+        with self._routing_lock, self._routing:
+            if at_least is not None:
+                self._routing.execute("UPDATE shard_sequences SET Last_ID = MAX(Last_ID, ?) WHERE Table_Name = ?",
+                                      (at_least, table))
+                return at_least
+            return self._routing.execute(
+                "UPDATE shard_sequences SET Last_ID = Last_ID + 1 WHERE Table_Name = ? RETURNING Last_ID", (table,)).fetchone()[0]
+
+    def _insert(self, conn, table, rows):
+        columns = list(rows[0])
+        conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                         [[row[column] for column in columns] for row in rows])
+
+    def read(self, table, key):
+        shard = self.owner(table, key)
+        if shard is None:
+            return None
+        rows = self._read_rows(shard, f"SELECT * FROM {table} WHERE {PRIMARY_KEYS[table]} = ?", (key,))
+        return rows[0] if rows else None
+
+    def create(self, table, row):
+        # Returns the new row's primary key, assigned from routing.db when the row has none
+        self.check_columns(table, row)
+        row = dict(row)
+        pk = PRIMARY_KEYS[table]
+        if row.get(pk) is None:
+            row[pk] = self._next_id(table)
+        elif self.owner(table, row[pk]) is not None:
+            raise ValueError(f"{table} already has {pk} {row[pk]}")
+        else:
+            self._next_id(table, at_least=row[pk])
+        shard = self.shard_for(table, row)
+        with track("write", f"sharded insert {table}") as call, self._write_locks[shard]:
+            conn = self._writer(shard)
+            with conn:
+                self._insert(conn, table, [row])
+            call["rows"] = 1
+        return row[pk]
+
+    def update(self, table, key, changes):
+        # Returns the number of rows updated (0 or 1). A change to the routing column moves the row,
+        # and a listing's claims with it, to the new city's shard.
+        self.check_columns(table, changes)
+        pk = PRIMARY_KEYS[table]
+        if pk in changes:
+            raise ValueError(f"{pk} cannot be changed")
+        source = self.owner(table, key)
+        if source is None:
+            return 0
+        moved = {**(self.read(table, key) or {}), **changes}
+        target = self.shard_for(table, moved) if set(changes) & {ROUTING_COLUMNS.get(table), "Food_ID", "Receiver_ID"} else source
+        if target != source:
+            self._move(table, key, moved, source, target)
+            return 1
+        assignments = ", ".join(f"{column} = ?" for column in changes)
+        with track("write", f"sharded update {table}") as call, self._write_locks[source]:
+            conn = self._writer(source)
+            with conn:
+                call["rows"] = conn.execute(f"UPDATE {table} SET {assignments} WHERE {pk} = ?",
+                                            [*changes.values(), key]).rowcount
+        return call["rows"]
+
+    def _move(self, table, key, row, source, target):
+        # Insert on the target shard first, then delete on the source: a crash in between leaves the
+        # row on both shards (owner() finds the source copy first), never on neither
+        claims = self._read_rows(source, "SELECT * FROM claims WHERE Food_ID = ?", (key,)) if table == "food_listings" else []
+        first, second = sorted([source, target])
+        with track("write", f"sharded move {table}") as call, self._write_locks[first], self._write_locks[second]:
+            conn = self._writer(target)
+            with conn:
+                # Upserts, so a move that crashed half way can be applied again
+                self._upsert(conn, table, [row])
+                if claims:
+                    self._upsert(conn, "claims", claims)
+            conn = self._writer(source)
+            with conn:
+                if claims:
+                    conn.execute("DELETE FROM claims WHERE Food_ID = ?", (key,))
+                conn.execute(f"DELETE FROM {table} WHERE {PRIMARY_KEYS[table]} = ?", (key,))
+            call["rows"] = 1 + len(claims)
+
+    def _upsert(self, conn, table, rows):
+        pk = PRIMARY_KEYS[table]
+        columns = list(rows[0])
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column != pk)
+        conn.executemany(f"""INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})
+            ON CONFLICT ({pk}) DO UPDATE SET {updates}""", [[row[column] for column in columns] for row in rows])
+
+    def apply(self, table, action, rows):
+        # Bring the shards in line with rows already written to the single-file database (see
+        # catch_up): whole rows are upserted on the shard that owns them, and moved when their city
+        # changed; deletes go by key. One transaction per shard.
+        pk = PRIMARY_KEYS[table]
+        by_shard = {}
+        for row in rows:
+            source = self.owner(table, row[pk])
+            if action == "delete":
+                if source is not None:
+                    by_shard.setdefault(source, []).append(row)
+                continue
+            target = self.shard_for(table, row)
+            if source is not None and source != target:
+                self._move(table, row[pk], row, source, target)
+            else:
+                by_shard.setdefault(target, []).append(row)
+        if action != "delete" and rows:
+            self._next_id(table, at_least=max(row[pk] for row in rows))
+        for shard, shard_rows in by_shard.items():
+            with track("write", f"sharded {action} {table}") as call, self._write_locks[shard]:
+                conn = self._writer(shard)
+                with conn:
+                    if action == "delete":
+                        conn.executemany(f"DELETE FROM {table} WHERE {pk} = ?", [(row[pk],) for row in shard_rows])
+                    else:
+                        self._upsert(conn, table, shard_rows)
+                call["rows"] = len(shard_rows)
+
+    def delete(self, table, key):
+        shard = self.owner(table, key)
+        if shard is None:
+            return 0
+        with track("write", f"sharded delete {table}") as call, self._write_locks[shard]:
+            conn = self._writer(shard)
+            with conn:
+                call["rows"] = conn.execute(f"DELETE FROM {table} WHERE {PRIMARY_KEYS[table]} = ?", (key,)).rowcount
+        return call["rows"]
+
+    def _apply_current(self, src, table, keys):
+        # The source's current rows for these keys; a key with no row there was deleted
+        pk = PRIMARY_KEYS[table]
+        for start in range(0, len(keys), LOOKUP_CHUNK):
+            chunk = keys[start:start + LOOKUP_CHUNK]
+            cursor = src.execute(f"SELECT * FROM {table} WHERE {pk} IN ({', '.join('?' * len(chunk))})", chunk)
+            columns = [d[0] for d in cursor.description]
+            rows = [dict(zip(columns, values)) for values in cursor.fetchall()]
+            found = {row[pk] for row in rows}
+            if rows:
+                self.apply(table, "upsert", rows)
+            gone = [{pk: key} for key in chunk if key not in found]
+            if gone:
+                self.apply(table, "delete", gone)
+
+    def _synced(self):
+        with self._routing_lock:
+            return self._routing.execute("SELECT Source, Change_ID, Synced_At FROM shard_sync").fetchone()
+
+    def _set_synced(self, source, position):
+        with self._routing_lock, self._routing:
+            self._routing.execute("INSERT OR REPLACE INTO shard_sync VALUES (1, ?, ?, datetime('now'))", (source, position))
+
+    def catch_up(self, source=DB_PATH):
+        # Apply every change the single-file database logged since the last catch-up, from one read
+        # snapshot of it, parents before claims so each claim finds its listing's shard. A layout that
+        # fell behind the pruned log (or was made from another file) is rebuilt with resync().
+        # Returns the number of changes applied.
+        source = os.path.abspath(source)
+        with self._sync_lock:
+            src = _connect(source, read_only=True)
+            try:
+                src.execute("BEGIN")
+                synced = self._synced()
+                newest = last_change(src)
+                if newest is None:
+                    raise ValueError(f"{source} has no change log; run its migrations first")
+                oldest = src.execute("SELECT MIN(Change_ID) FROM change_log").fetchone()[0]
+                if (synced is None or synced[0] != source or synced[1] > newest
+                        or (oldest is not None and oldest > synced[1] + 1)):
+                    src.execute("COMMIT")
+                    return self._resync(source)
+                keys = {}
+                for table, key in src.execute("SELECT DISTINCT Table_Name, Row_Key FROM change_log WHERE Change_ID > ?",
+                                              (synced[1],)):
+                    keys.setdefault(table, []).append(key)
+                for table in TABLES:
+                    if table in keys:
+                        self._apply_current(src, table, sorted(keys[table]))
+                src.execute("COMMIT")
+            finally:
+                src.close()
+            self._set_synced(source, newest)
+            return newest - synced[1]
+
+    def resync(self, source=DB_PATH):
+        # Rebuild every shard's rows from the single-file database, keeping the routes; new cities are
+        # routed first. For a layout too far behind to catch up.
+        with self._sync_lock:
+            return self._resync(os.path.abspath(source))
+
+    def _resync(self, source):
+        src = _connect(source, read_only=True)
+        try:
+            position = last_change(src) or 0
+            cities = {city for table, column in ROUTING_COLUMNS.items()
+                      for (city,) in src.execute(f"SELECT DISTINCT {column} FROM {table}")}
+            last_ids = {table: src.execute(f"SELECT COALESCE(MAX({pk}), 0) FROM {table}").fetchone()[0]
+                        for table, pk in PRIMARY_KEYS.items()}
+        finally:
+            src.close()
+        for city in cities:
+            self.route(city, create=True)
+        for table, last_id in last_ids.items():
+            self._next_id(table, at_least=last_id)
+        for shard in self.files:
+            with track("write", "sharded resync") as call, self._write_locks[shard]:
+                conn = self._writer(shard)
+                conn.execute("ATTACH DATABASE ? AS src", (_uri(source),))
+                conn.execute("ATTACH DATABASE ? AS routing", (_uri(routing_path(self.shard_dir)),))
+                try:
+                    with conn:
+                        for table in reversed(TABLES):
+                            conn.execute(f"DELETE FROM main.{table}")
+                        call["rows"] = sum(conn.execute(f"INSERT INTO main.{table} {COPY_SQL[table]}", (shard,)).rowcount
+                                           for table in TABLES)
+                        # The shard's own log only feeds its change counters (see version)
+                        conn.execute("DELETE FROM main.change_log")
+                finally:
+                    conn.execute("DETACH DATABASE src")
+                    conn.execute("DETACH DATABASE routing")
+        self._set_synced(source, position)
+        return position
+
+    def sync_status(self, source=DB_PATH):
+        # (source, position, changes not applied yet, last sync time)
+        synced = self._synced()
+        src = _connect(source, read_only=True)
+        try:
+            position = synced[1] if synced else 0
+            behind = src.execute("SELECT COUNT(*) FROM change_log WHERE Change_ID > ?", (position,)).fetchone()[0]
+        finally:
+            src.close()
+        return {"Source": synced[0] if synced else None, "Change_ID": position, "Behind": behind,
+                "Synced_At": synced[2] if synced else None}
+
+    def version(self):
+        # Changes to the layout so far: the sum of every shard's change counters (migration 8)
+        return sum(self._read(shard, "SELECT COALESCE(SUM(Version), 0) FROM change_counters")[0][0]
+                   for shard in self.files)
+
+    def close(self):
+        for conn in [self._routing, *self._writers.values(), *self._readers.values()]:
+            conn.close()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(shard_dir=SHARD_DIR):
+    with _stores_lock:
+        if shard_dir not in _stores:
+            _stores[shard_dir] = ShardedStore(shard_dir)
+        return _stores[shard_dir]
+
+
+def _sync_loop(source, shard_dir):
+    store = get_store(shard_dir)
+    while True:
+        try:
+            store.catch_up(source)
+            store.sync_error = None
+        except (sqlite3.Error, ValueError) as e:
+            # Locked or mid-migration; the next round tries again, and the Sharded mode caption shows it
+            store.sync_error = str(e)
+        time.sleep(SYNC_SECONDS)
+
+
+_syncing = set()
+
+
+def start_shard_sync(source=DB_PATH, shard_dir=SHARD_DIR):
+    # Called once by the app: a background thread applies every change committed to the single-file
+    # database to the shards, whoever made it (the app, ingest.py, archive.py, another process)
+    if is_sharded(shard_dir) and shard_dir not in _syncing:
+        _syncing.add(shard_dir)
+        threading.Thread(target=_sync_loop, args=(source, shard_dir), daemon=True, name="shard-sync").start()
+
+
+# Fan-out analytics: a partial aggregate of the shard's own rows runs on every shard at once, and the
+# partials are merged here. Names and cities of providers and receivers, which may live in another
+# region, are looked up by primary key after the merge, and only for the rows that made the cut.
+LOOKUP_CHUNK = 500        # primary keys per IN (...) lookup
+
+
+def _top(df, order, limit=None, tie_break=None):
+    # tie_break: a key column that orders tied rows (ascending) like the SQL's ORDER BY; dropped after
+    if tie_break:
+        df = df.sort_values([order, tie_break], ascending=[False, True], kind="stable").drop(columns=tie_break)
+    else:
+        df = df.sort_values(order, ascending=False, kind="stable")
+    return (df.head(limit) if limit else df).reset_index(drop=True)
+
+
+def _sum_by(keys, sums, order, limit=None):
+    def merge(df, lookup):
+        merged = df.groupby(keys, as_index=False, dropna=False, sort=True)[sums].sum(min_count=1)
+        return _top(merged, order, limit)
+    return merge
+
+
+def _named_top(key, table, output, limit, average=False):
+    # Top `limit` of a per-ID total (or Quantity_Sum / Quantity_Count average), shown by Name. Like
+    # the single-file join, IDs missing from `table` are skipped, so candidates are looked up in chunks
+    # until `limit` have been found.
+    def merge(df, lookup):
+        if average:
+            merged = df.groupby(key, as_index=False, sort=True)[["Quantity_Sum", "Quantity_Count"]].sum()
+            merged[output] = merged["Quantity_Sum"] / merged["Quantity_Count"]
+        else:
+            merged = df.groupby(key, as_index=False, sort=True)[[output]].sum(min_count=1)
+        merged = _top(merged[[key, output]], output)
+        found = []
+        for start in range(0, len(merged), limit * 4):
+            candidates = merged.iloc[start:start + limit * 4]
+            found.append(candidates.merge(lookup(table, [key, "Name"], candidates[key]), on=key))
+            if sum(len(frame) for frame in found) >= limit:
+                break
+        if not found:
+            return pd.DataFrame(columns=["Name", output])
+        return pd.concat(found, ignore_index=True).head(limit)[["Name", output]]
+    return merge
+
+
+def _status_share(df, lookup):
+    merged = df.groupby("Status", as_index=False, dropna=False, sort=True)["Claim_Count"].sum()
+    merged["Percentage"] = merged["Claim_Count"] * 100.0 / merged["Claim_Count"].sum()
+    return _top(merged, "Claim_Count")
+
+
+def _breakfast_receivers(df, lookup):
+    # COUNT(DISTINCT ...) does not add up across shards: partials flag each receiver, and the flags
+    # are counted per receiver city once merged
+    receivers = df.groupby("Receiver_ID", as_index=False)["Breakfast"].max()
+    receivers = receivers.merge(lookup("receivers", ["Receiver_ID", "City"]), on="Receiver_ID")
+    merged = receivers.groupby("City", as_index=False, dropna=False, sort=True)["Breakfast"].sum()
+    return _top(merged.rename(columns={"Breakfast": "Breakfast_Receivers"}), "Breakfast_Receivers", 5)
+
+
+_PROVIDERS_PER_CITY = "SELECT City, COUNT(*) as Provider_Count FROM providers GROUP BY City"
+# Claims live on their listing's shard, so the claim-listing joins below are all local
+_CLAIMS_PER_CITY = '''
+    SELECT f.Location, COUNT(c.Claim_ID) as Claim_Count
+    FROM food_listings f
+    JOIN claims c ON f.Food_ID = c.Food_ID
+    GROUP BY f.Location
+'''
+_PROVIDER_QUANTITIES = '''
+    SELECT Provider_ID, SUM(Quantity) as Total_Donated, SUM(Quantity) as Quantity_Sum, COUNT(Quantity) as Quantity_Count
+    FROM food_listings
+    WHERE Provider_ID IS NOT NULL
+    GROUP BY Provider_ID
+'''
+
+# Query name -> (partial SQL run on every shard, merge(concatenated partials, lookup))
+FAN_OUT_QUERIES = {
+    "Q1: Providers per city": (_PROVIDERS_PER_CITY, _sum_by(["City"], ["Provider_Count"], "Provider_Count")),
+    "Q2: Receivers per city": ("SELECT City, COUNT(*) as Receiver_Count FROM receivers GROUP BY City",
+                               _sum_by(["City"], ["Receiver_Count"], "Receiver_Count")),
+    "Q7: City with most listings": ("SELECT Location, COUNT(*) as Listing_Count FROM food_listings GROUP BY Location",
+                                    _sum_by(["Location"], ["Listing_Count"], "Listing_Count", 1)),
+    "Q22: Claims by city": (_CLAIMS_PER_CITY, _sum_by(["Location"], ["Claim_Count"], "Claim_Count")),
+    "Providers per City (Top 10)": (_PROVIDERS_PER_CITY, _sum_by(["City"], ["Provider_Count"], "Provider_Count")),
+    "Claim Status Distribution": ("SELECT Status, COUNT(*) as Claim_Count FROM claims GROUP BY Status", _status_share),
+    "Total Quantity Donated by Provider (Top 5)": (
+        _PROVIDER_QUANTITIES, _named_top("Provider_ID", "providers", "Total_Donated", 5)),
+    "Avg Quantity Claimed per Receiver (Top 5)": ('''
+        SELECT c.Receiver_ID, SUM(f.Quantity) as Quantity_Sum, COUNT(f.Quantity) as Quantity_Count
+        FROM claims c
+        JOIN food_listings f ON c.Food_ID = f.Food_ID
+        WHERE c.Receiver_ID IS NOT NULL
+        GROUP BY c.Receiver_ID
+    ''', _named_top("Receiver_ID", "receivers", "Avg_Quantity_Claimed", 5, average=True)),
+    "Claims by City (Top 10)": (_CLAIMS_PER_CITY, _sum_by(["Location"], ["Claim_Count"], "Claim_Count", 10)),
+    "Most Common Food Types (Top 5)": ("SELECT Food_Type, COUNT(*) as Listing_Count FROM food_listings GROUP BY Food_Type",
+                                       _sum_by(["Food_Type"], ["Listing_Count"], "Listing_Count", 5)),
+    "Providers with Highest Avg Quantity (Top 5)": (
+        _PROVIDER_QUANTITIES, _named_top("Provider_ID", "providers", "Avg_Quantity", 5, average=True)),
+    "Claims by Meal Type (Top 5)": ('''
+        SELECT f.Meal_Type, COUNT(c.Claim_ID) as Claim_Count
+        FROM food_listings f
+        JOIN claims c ON f.Food_ID = c.Food_ID
+        GROUP BY f.Meal_Type
+    ''', _sum_by(["Meal_Type"], ["Claim_Count"], "Claim_Count", 5)),
+    # "No claims" is decided on the listing's own shard, so each shard sends its top 5
+    "Unclaimed Food Listings by Quantity (Top 5)": ('''
+        SELECT f.Food_ID, f.Food_Name, f.Quantity
+        FROM food_listings f
+        LEFT JOIN claims c ON f.Food_ID = c.Food_ID
+        WHERE c.Claim_ID IS NULL
+        ORDER BY f.Quantity DESC, f.Food_ID
+        LIMIT 5
+    ''', lambda df, lookup: _top(df, "Quantity", 5, tie_break="Food_ID")),
+    "Receivers per City by Breakfast Claims (Top 5)": ('''
+        SELECT c.Receiver_ID, MAX(f.Meal_Type = 'Breakfast') as Breakfast
+        FROM claims c
+        JOIN food_listings f ON c.Food_ID = f.Food_ID
+        WHERE c.Receiver_ID IS NOT NULL
+        GROUP BY c.Receiver_ID
+    ''', _breakfast_receivers),
+}
+
+
+def has_fan_out(name):
+    return name in FAN_OUT_QUERIES
+
+
+def open_union(shard_dir=SHARD_DIR):
+    # One connection that sees the whole layout: temp views named after the four tables union every
+    # shard, so any read query runs unchanged (on one thread)
+    files = shard_files(shard_dir)
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    for shard, path in files.items():
+        conn.execute("ATTACH DATABASE ? AS ?", (_uri(path), f"shard_{shard}"))
+    for table in TABLES:
+        union = " UNION ALL ".join(f"SELECT * FROM shard_{shard}.{table}" for shard in files)
+        conn.execute(f"CREATE TEMP VIEW {table} AS {union}")
+    return conn
+
+
+_parallel = ParallelQueries(max_workers=MAX_SHARDS, timeout=FAN_OUT_TIMEOUT)
+
+
+def _on_every_shard(store, statements, timeout):
+    # statements: [(sql, params)], each run on every shard in parallel (SQLite releases the GIL while
+    # it works); one DataFrame of all the results
+    tasks = {(shard, i): partial(store.read_frame, shard, sql, params, timeout)
+             for i, (sql, params) in enumerate(statements) for shard in store.files}
+    return pd.concat(_parallel.run_all(tasks, timeout).values(), ignore_index=True)
+
+
+def fan_out(name, shard_dir=SHARD_DIR, timeout=FAN_OUT_TIMEOUT):
+    store = get_store(shard_dir)
+
+    def lookup(table, columns, keys=None):
+        # Rows of `table` from whichever shard holds them: all of them, or those with these primary keys
+        select = f"SELECT {', '.join(columns)} FROM {table}"
+        if keys is None:
+            return _on_every_shard(store, [(select, ())], timeout)
+        keys = [int(key) for key in keys]
+        if not keys:
+            return pd.DataFrame(columns=columns)
+        chunks = [keys[i:i + LOOKUP_CHUNK] for i in range(0, len(keys), LOOKUP_CHUNK)]
+        return _on_every_shard(store, [(f"{select} WHERE {PRIMARY_KEYS[table]} IN ({', '.join('?' * len(chunk))})", chunk)
+                                       for chunk in chunks], timeout)
+
+    sql, merge = FAN_OUT_QUERIES[name]
+    return merge(_on_every_shard(store, [(sql, ())], timeout), lookup)
+
+
+def run_sharded(name, shard_dir=SHARD_DIR):
+    # A predefined or chart query over the sharded layout: fanned out when it has a partial form,
+    # otherwise run as written over the union of the shards
+    if has_fan_out(name):
+        return fan_out(name, shard_dir)
+    sql = PREDEFINED_QUERIES[name] if name in PREDEFINED_QUERIES else CHART_QUERIES[name]
+    conn = open_union(shard_dir)
+    try:
+        with track("read", sql) as call:
+            call["result"] = pd.read_sql_query(sql, conn)
+            return call["result"]
+    finally:
+        conn.close()
+
+
+def describe_shards(shard_dir=SHARD_DIR):
+    store = get_store(shard_dir)
+    text = (f"Read replica of the database, fanned out over {len(store.files)} shards in {shard_dir}; "
+            f"queries without a partial form read the union of the shards")
+    try:
+        sync = store.sync_status()
+        text += (f" · synced at {sync['Synced_At']} UTC, " +
+                 (f"{sync['Behind']} change(s) behind" if sync["Behind"] else "up to date"))
+    except sqlite3.Error as e:
+        text += f" · sync state unknown: {e}"
+    if store.sync_error:
+        text += f" · last catch-up failed: {store.sync_error} (`python sharding.py sync --full` rebuilds the shards)"
+    return text
+
+
+def _same(a, b):
+    # Equal up to row order and float rounding
+    def canonical(df):
+        df = df.round(6).astype(str)
+        return df.sort_values(list(df.columns)).reset_index(drop=True)
+    return list(a.columns) == list(b.columns) and canonical(a).equals(canonical(b))
+
+
+def compare(source=DB_PATH, shard_dir=SHARD_DIR, repeat=DEFAULT_REPEAT):
+    # Time every fanned-out query on the single file and on the shards, and check the results agree
+    # (top-N results can differ only in which of several tied rows made the cut)
+    results = []
+    single = _connect(source, read_only=True)
+    try:
+        for name in FAN_OUT_QUERIES:
+            sql = PREDEFINED_QUERIES[name] if name in PREDEFINED_QUERIES else CHART_QUERIES[name]
+            timings = {}
+            for mode, run in [("single", lambda: pd.read_sql_query(sql, single)), ("sharded", lambda: fan_out(name, shard_dir))]:
+                best = None
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    frame = run()
+                    best = min(best or float("inf"), time.perf_counter() - started)
+                timings[mode] = (best, frame)
+            results.append({"Query": name, "Single_ms": timings["single"][0] * 1000,
+                            "Sharded_ms": timings["sharded"][0] * 1000,
+                            "Same": _same(timings["single"][1], timings["sharded"][1])})
+    finally:
+        single.close()
+    return pd.DataFrame(results)
+
+
+def status(shard_dir=SHARD_DIR):
+    rows = []
+    routing = _connect(routing_path(shard_dir), read_only=True)
+    try:
+        cities = dict(routing.execute("SELECT Shard, COUNT(*) FROM shard_routes GROUP BY Shard").fetchall())
+    finally:
+        routing.close()
+    for shard, path in shard_files(shard_dir).items():
+        conn = _connect(path, read_only=True)
+        try:
+            row = {"Shard": shard, "File": os.path.basename(path), "Cities": cities.get(shard, 0),
+                   "MiB": round(os.path.getsize(path) / 2 ** 20, 1)}
+            row.update({table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLES})
+            rows.append(row)
+        finally:
+            conn.close()
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-region sharded layout with fan-out analytics")
+    sub = parser.add_subparsers(dest="command", required=True)
+    reshard_parser = sub.add_parser("reshard", help="split a single-file database into per-region shards")
+    reshard_parser.add_argument("source", nargs="?", default=DB_PATH)
+    reshard_parser.add_argument("shard_dir", nargs="?", default=SHARD_DIR)
+    reshard_parser.add_argument("--shards", type=int, default=DEFAULT_SHARDS)
+    unshard_parser = sub.add_parser("unshard", help="merge the shards back into one new database file")
+    unshard_parser.add_argument("shard_dir")
+    unshard_parser.add_argument("target")
+    status_parser = sub.add_parser("status", help="show the cities and rows in each shard")
+    status_parser.add_argument("shard_dir", nargs="?", default=SHARD_DIR)
+    sync_parser = sub.add_parser("sync", help="apply the single-file database's changes to the shards")
+    sync_parser.add_argument("source", nargs="?", default=DB_PATH)
+    sync_parser.add_argument("shard_dir", nargs="?", default=SHARD_DIR)
+    sync_parser.add_argument("--full", action="store_true", help="rebuild every shard from the source instead")
+    query_parser = sub.add_parser("query", help="run a predefined or chart query over the shards, e.g. Q22")
+    query_parser.add_argument("name")
+    query_parser.add_argument("shard_dir", nargs="?", default=SHARD_DIR)
+    compare_parser = sub.add_parser("compare", help="time the fanned-out queries against the single file")
+    compare_parser.add_argument("source")
+    compare_parser.add_argument("shard_dir", nargs="?", default=SHARD_DIR)
+    compare_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    args = parser.parse_args()
+
+    try:
+        if args.command == "reshard":
+            reshard(args.source, args.shard_dir, args.shards)
+        elif args.command == "unshard":
+            unshard(args.shard_dir, args.target)
+        elif not is_sharded(args.shard_dir):
+            raise ValueError(f"{args.shard_dir} is not a sharded layout")
+        elif args.command == "status":
+            print(status(args.shard_dir).to_string(index=False))
+        elif args.command == "sync":
+            store = get_store(args.shard_dir)
+            started = time.perf_counter()
+            if args.full:
+                store.resync(args.source)
+                print(f"shards rebuilt from {args.source} in {time.perf_counter() - started:.2f}s")
+            else:
+                print(f"{store.catch_up(args.source)} change(s) applied in {time.perf_counter() - started:.2f}s")
+        elif args.command == "query":
+            names = [name for name in [*PREDEFINED_QUERIES, *CHART_QUERIES]
+                     if name.split(":")[0] == args.name or name == args.name]
+            if not names:
+                raise ValueError(f"no predefined or chart query {args.name}")
+            started = time.perf_counter()
+            result = run_sharded(names[0], args.shard_dir)
+            print(result.to_string(index=False))
+            print(f"{len(result)} rows in {time.perf_counter() - started:.3f}s "
+                  f"({'fan-out' if has_fan_out(names[0]) else 'union of the shards'})")
+        else:
+            result = compare(args.source, args.shard_dir, args.repeat)
+            print(result.to_string(index=False, float_format="%.1f"))
+    except (sqlite3.Error, ValueError) as e:
+        parser.exit(1, f"{e}\n")
+
+
+if __name__ == "__main__":
+    main()
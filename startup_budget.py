@@ -0,0 +1,118 @@
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+from app_pages import PAGES
+
+APP_SCRIPT = "Local Food Wastage Management app.py"
+DEFAULT_REPEAT = 3
+DEFAULT_TOP = 8
+MARKER = "--- page ---"
+
+# Import-time budgets in milliseconds, each measured in a fresh interpreter. "entry point" is every
+# module the app script imports; a page is the extra time its module takes to import after that.
+ENTRY_BUDGET_MS = 800
+PAGE_BUDGET_MS = {
+    "Project Introduction": 20,
+    "View Tables": 800,
+    "CRUD Operations": 800,
+    "SQL Queries": 900,
+    "New Query": 800,
+    "Food Matching": 800,
+    "Visualization": 1500,
+    "User Introduction": 20,
+    "Statistics Dashboard": 800,
+    "Admin": 50,
+}
+
+
+def entry_modules(script=APP_SCRIPT):
+    # Top-level modules imported by the app script, in order
+    with open(script, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            names = [node.module]
+        else:
+            continue
+        modules += [name for name in names if name not in modules]
+    return modules
+
+
+def _parse(lines):
+    # -X importtime lines: "import time: self [us] | cumulative | imported package", nesting shown by indent
+    entries = []
+    for line in lines:
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append(dict(module=name.strip(), top_level=not name[1:].startswith(" "),
+                            self_ms=int(self_us) / 1000, cumulative_ms=int(cumulative_us) / 1000))
+    return entries
+
+
+def _summary(entries, top):
+    modules = sorted(entries, key=lambda entry: entry["self_ms"], reverse=True)[:top]
+    return {
+        "ms": round(sum(entry["cumulative_ms"] for entry in entries if entry["top_level"]), 3),
+        "modules": [(entry["module"], round(entry["self_ms"], 3)) for entry in modules],
+    }
+
+
+def measure(modules, page_module=None, top=DEFAULT_TOP):
+    # One fresh interpreter: import the entry modules, then (optionally) one page module
+    code = f"import {', '.join(modules)}\nimport sys\nsys.stderr.write({MARKER!r} + '\\n')\n"
+    if page_module:
+        code += f"import {page_module}\n"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    lines = result.stderr.splitlines()
+    split = lines.index(MARKER)
+    return _summary(_parse(lines[:split]), top), _summary(_parse(lines[split + 1:]), top)
+
+
+def run_budget(repeat=DEFAULT_REPEAT, top=DEFAULT_TOP):
+    # Best of `repeat` runs per target, so one slow run (cold disk cache) does not fail the check
+    modules = entry_modules()
+    targets = {"entry point": min((measure(modules, top=top)[0] for _ in range(repeat)), key=lambda s: s["ms"])}
+    for title, module in PAGES.items():
+        targets[title] = min((measure(modules, f"app_pages.{module}", top)[1] for _ in range(repeat)),
+                             key=lambda s: s["ms"])
+    for title, summary in targets.items():
+        summary["budget_ms"] = ENTRY_BUDGET_MS if title == "entry point" else PAGE_BUDGET_MS[title]
+        summary["over"] = summary["ms"] > summary["budget_ms"]
+    return targets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the app's import-time budget per entry point and page")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="slowest modules listed per target")
+    parser.add_argument("--report", help="write the measurements to this JSON file")
+    args = parser.parse_args()
+
+    targets = run_budget(args.repeat, args.top)
+    for title, summary in targets.items():
+        status = "OVER" if summary["over"] else "ok"
+        print(f"{title:<22} {summary['ms']:>9.1f} ms / {summary['budget_ms']:>6} ms budget  {status}")
+        for module, self_ms in summary["modules"]:
+            print(f"    {module:<40} {self_ms:>8.1f} ms")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(targets, f, indent=2)
+    over = [title for title, summary in targets.items() if summary["over"]]
+    if over:
+        print(f"Over budget: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()